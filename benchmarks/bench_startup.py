@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Startup time benchmark for the myDRE desktop tools.
+
+Each run starts a fresh process. In ``import`` mode (the default, no display
+needed) the process only imports a tool's GUI module; in ``window`` mode it
+starts the tool with ``--startup-time=FILE``, which quits as soon as the
+window is drawn. ``--command`` runs a frozen executable from ``build.py``
+instead of the sources::
+
+    python benchmarks/bench_startup.py --repeat 10
+    python benchmarks/bench_startup.py --mode window --tools uploader
+    python benchmarks/bench_startup.py --mode window --tools uploader --command dist/mydre-uploader
+
+Reports the median and fastest wall time per tool, and which heavy libraries
+(requests, azure, cryptography, ...) were already imported. Exits with 1 if a
+heavy library was imported or the median is above ``--max-seconds``, so it
+can gate a build.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SRC = os.path.abspath(os.path.join(HERE, "..", "src"))
+
+# GUI module and entry script of each tool
+TOOLS = {
+    "uploader": ("mydre_uploader.gui", os.path.join(SRC, "main_uploader.py")),
+    "encrypter": ("mydre_config_encrypter.gui", os.path.join(SRC, "main_encrypter.py")),
+}
+IMPORT_CODE = (
+    "import mydre_uploader.startup as startup\n"
+    "import {module}\n"
+    "import json, time\n"
+    "print(json.dumps({{'seconds': {{'imports': time.perf_counter() - startup.STARTED}},\n"
+    "                  'heavy_modules': startup.heavy_modules_loaded()}}))\n"
+)
+
+
+def run_once(tool, mode, command=None):
+    """Start one process and return its startup report with the measured ``wall`` time added."""
+    module, script = TOOLS[tool]
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [SRC, os.environ.get("PYTHONPATH")])))
+    with tempfile.TemporaryDirectory() as scratch:
+        report_path = os.path.join(scratch, "startup.json")
+        if mode == "import":
+            arguments = [sys.executable, "-c", IMPORT_CODE.format(module=module)]
+        else:
+            arguments = (command or [sys.executable, script]) + [f"--startup-time={report_path}"]
+        started = time.perf_counter()
+        completed = subprocess.run(arguments, env=env, capture_output=True, text=True, timeout=120)
+        wall = time.perf_counter() - started
+        if completed.returncode != 0:
+            raise RuntimeError(f"{tool} exited with {completed.returncode}: {completed.stderr.strip()}")
+        if mode == "import":
+            line = completed.stdout.strip().splitlines()[-1]
+        else:
+            with open(report_path, encoding="utf-8") as report_file:
+                line = report_file.read().strip().splitlines()[-1]
+    report = json.loads(line)
+    report["wall"] = wall
+    return report
+
+
+def run_tool(tool, mode, repeat, command=None):
+    reports = [run_once(tool, mode, command) for _ in range(repeat)]
+    walls = [report["wall"] for report in reports]
+    phases = sorted({name for report in reports for name in report["seconds"]})
+    heavy = sorted({name for report in reports for name in report["heavy_modules"]})
+    return {
+        "tool": tool,
+        "mode": mode,
+        "runs": repeat,
+        "median": statistics.median(walls),
+        "fastest": min(walls),
+        "phases": {name: statistics.median(report["seconds"][name] for report in reports
+                                           if name in report["seconds"])
+                   for name in phases},
+        "heavy_modules": heavy,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure how fast the myDRE desktop tools start.")
+    parser.add_argument("--tools", default=",".join(TOOLS),
+                        help="comma-separated tools to measure (default: %(default)s)")
+    parser.add_argument("--mode", choices=("import", "window"), default="import",
+                        help="import the GUI module only, or start the tool until its window "
+                             "is drawn (needs a display) (default: %(default)s)")
+    parser.add_argument("--command", nargs="+", metavar="ARG",
+                        help="start this (e.g. a frozen executable) instead of the entry script; "
+                             "implies --mode window and needs exactly one tool")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per tool (default: %(default)s)")
+    parser.add_argument("--max-seconds", type=float,
+                        help="fail if a tool's median wall time is above this")
+    parser.add_argument("-o", "--output", help="write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    tools = [tool.strip() for tool in args.tools.split(",") if tool.strip()]
+    unknown = [tool for tool in tools if tool not in TOOLS]
+    if unknown:
+        parser.error(f"unknown tool(s): {', '.join(unknown)}; choose from {', '.join(TOOLS)}")
+    if args.command:
+        if len(tools) != 1:
+            parser.error("--command needs exactly one tool in --tools")
+        args.mode = "window"
+
+    results = []
+    failed = False
+    for tool in tools:
+        try:
+            result = run_tool(tool, args.mode, args.repeat, args.command)
+        except (OSError, RuntimeError, subprocess.TimeoutExpired) as e:
+            print(f"{tool}: could not start: {e}")
+            return 1
+        results.append(result)
+        phases = ", ".join(f"{name} {seconds:.3f}s" for name, seconds in result["phases"].items())
+        print(f"{tool:>10}: median {result['median']:.3f}s, fastest {result['fastest']:.3f}s "
+              f"({phases})")
+        if result["heavy_modules"]:
+            print(f"{'':>10}  heavy libraries imported at startup: {', '.join(result['heavy_modules'])}")
+            failed = True
+        if args.max_seconds is not None and result["median"] > args.max_seconds:
+            print(f"{'':>10}  slower than --max-seconds {args.max_seconds}")
+            failed = True
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output_file:
+            json.dump(results, output_file, indent=2)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Upload throughput benchmark for ``Upload``.
+
+Runs ``create_workspace_container``, ``upload_many`` and
+``commit_workspace_container`` against the local stand-in
+(``benchmarks/standin.py``) for a matrix of file counts and sizes. Each case
+runs in a fresh process so its peak RSS is its own. Reports MB/s, files/s,
+p50/p99 per-file latency and peak RSS, and saves the results as JSON::
+
+    python benchmarks/bench_upload.py --files 1,100 --sizes 64K,8M --latency 0.01 -o base.json
+    # ... change something ...
+    python benchmarks/bench_upload.py --files 1,100 --sizes 64K,8M --latency 0.01 -o new.json
+    python benchmarks/bench_upload.py --compare base.json new.json
+
+``--throttling`` runs every case twice against a stand-in that answers 503
+ServerBusy beyond ``--capacity`` (default 4) requests at once: with a fixed
+number of workers and with adaptive concurrency::
+
+    python benchmarks/bench_upload.py --throttling --files 100 --sizes 256K --latency 0.02 -j 16
+
+Per-file latency is the duration recorded in the upload history.
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "src"))
+sys.path.insert(0, HERE)
+
+from standin import parse_size  # noqa: E402
+
+DEFAULT_FILES = "1,10,1000"
+DEFAULT_SIZES = "4K,1M,64M"
+DEFAULT_MAX_TOTAL = "1G"
+DEFAULT_THROTTLING_CAPACITY = 4
+# Metrics shown by --compare, and whether a higher value is better
+METRICS = (("mb_per_s", True), ("files_per_s", True), ("p50", False), ("p99", False),
+           ("peak_rss_mb", False))
+
+
+def format_size(size):
+    for suffix, factor in (("G", 1024 ** 3), ("M", 1024 ** 2), ("K", 1024)):
+        if size >= factor and size % factor == 0:
+            return f"{size // factor}{suffix}"
+    return str(size)
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))]
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def make_files(directory, count, size, data):
+    """Write ``count`` files of ``size`` bytes; random data does not compress, text does."""
+    if data == "text":
+        pattern = b"".join(f"{i},sample_{i % 97},{i * 3.14159:.3f}\n".encode() for i in range(40000))
+    else:
+        pattern = os.urandom(1024 * 1024)
+    paths = []
+    for index in range(count):
+        path = os.path.join(directory, f"file{index:06d}.bin")
+        with open(path, "wb") as file_to_write:
+            remaining = size
+            while remaining:
+                chunk = pattern[:remaining]
+                file_to_write.write(chunk)
+                remaining -= len(chunk)
+        paths.append(path)
+    return paths
+
+
+def run_case(case):
+    """Run one benchmark case in this process and return its result dict."""
+    with tempfile.TemporaryDirectory(prefix="mydre-bench-") as directory:
+        # Keep journals and the history of benchmark runs out of the user's data directory
+        os.environ["MYDRE_HOME"] = directory
+        from mydre_uploader.bandwidth import BandwidthLimiter
+        from mydre_uploader.concurrency import AIMDController
+        from mydre_uploader.history import UploadHistory
+        from mydre_uploader.uploader import Upload
+
+        paths = make_files(directory, case["files"], case["size"], case["data"])
+        history = UploadHistory(os.path.join(directory, "bench-history.sqlite3"))
+        uploader = Upload("bench", "benchmark", "key", "tenant", "bench",
+                          max_workers=case["workers"], history=history,
+                          compression="auto" if case["compress"] else None,
+                          bundle_threshold=case["bundle_small"] * 1024 if case["bundle_small"] else None,
+                          concurrency_controller=AIMDController(1, case["adaptive"])
+                          if case["adaptive"] else None,
+                          bandwidth_limiter=BandwidthLimiter(case["limit_rate"])
+                          if case["limit_rate"] else None)
+        uploader.BASE_URL = case["base_url"]
+        started = time.perf_counter()
+        with uploader:
+            uploader.create_workspace_container()
+            results = uploader.upload_many(paths)
+            uploader.commit_workspace_container()
+        elapsed = time.perf_counter() - started
+        durations = [record["duration"] for record in history.query(limit=len(paths))]
+        history.close()
+
+    total = case["files"] * case["size"]
+    failed = sum(1 for result in results if not result["success"])
+    return {
+        "files": case["files"],
+        "size": case["size"],
+        "seconds": elapsed,
+        "mb_per_s": total / 1e6 / elapsed,
+        "files_per_s": case["files"] / elapsed,
+        "p50": percentile(durations, 0.50),
+        "p99": percentile(durations, 0.99),
+        "peak_rss_mb": peak_rss_mb(),
+        "failed": failed,
+    }
+
+
+def start_standin(latency, bandwidth, capacity):
+    command = [sys.executable, os.path.join(HERE, "standin.py"), "--latency", str(latency)]
+    if bandwidth:
+        command += ["--bandwidth", str(bandwidth)]
+    if capacity:
+        command += ["--capacity", str(capacity)]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    port = int(process.stdout.readline().split()[-1])
+    return process, f"http://127.0.0.1:{port}/v1"
+
+
+def run_matrix(args):
+    counts = [int(count) for count in args.files.split(",")]
+    sizes = [parse_size(size) for size in args.sizes.split(",")]
+    max_total = parse_size(args.max_total)
+    if args.throttling:
+        args.capacity = args.capacity or DEFAULT_THROTTLING_CAPACITY
+        # Each case with fixed workers, then adaptive up to --adaptive (default: the workers)
+        modes = [None, args.adaptive or args.workers]
+    else:
+        modes = [args.adaptive]
+    process, base_url = start_standin(args.latency, args.bandwidth, args.capacity)
+    cases = []
+    try:
+        for count in counts:
+            for size in sizes:
+                if count * size > max_total:
+                    print(f"skip {count} x {format_size(size)}: more than --max-total", file=sys.stderr)
+                    continue
+                for adaptive in modes:
+                    case = {"files": count, "size": size, "workers": args.workers, "data": args.data,
+                            "compress": args.compress, "bundle_small": args.bundle_small,
+                            "adaptive": adaptive, "limit_rate": args.limit_rate,
+                            "base_url": base_url}
+                    runs = []
+                    for _ in range(args.repeat):
+                        output = subprocess.run([sys.executable, __file__, "--run-case",
+                                                 json.dumps(case)],
+                                                check=True, stdout=subprocess.PIPE, text=True).stdout
+                        runs.append(json.loads(output))
+                    # Report the fastest run; slower ones are mostly noise from other processes
+                    result = max(runs, key=lambda run: run["mb_per_s"])
+                    if args.throttling:
+                        result["adaptive"] = adaptive
+                    cases.append(result)
+                    label = ("  adaptive" if adaptive else "  fixed   ") if args.throttling else ""
+                    print(f"{count:>6} x {format_size(size):>5}{label}  {result['mb_per_s']:8.1f} MB/s  "
+                          f"{result['files_per_s']:8.1f} files/s  p50 {result['p50'] * 1000:7.1f} ms  "
+                          f"p99 {result['p99'] * 1000:7.1f} ms  "
+                          f"rss {result['peak_rss_mb'] or 0:6.1f} MB"
+                          + (f"  {result['failed']} FAILED" if result["failed"] else ""),
+                          file=sys.stderr)
+    finally:
+        process.terminate()
+        process.wait()
+    return {
+        "meta": {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "commit": _git_commit(),
+            "settings": {"latency": args.latency, "bandwidth": args.bandwidth,
+                         "capacity": args.capacity, "workers": args.workers, "data": args.data,
+                         "compress": args.compress, "bundle_small": args.bundle_small,
+                         "adaptive": args.adaptive, "limit_rate": args.limit_rate,
+                         "throttling": args.throttling},
+        },
+        "cases": cases,
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE, check=True,
+                              stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                              text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(base_path, new_path):
+    """Print the change of every metric between two result files."""
+    with open(base_path, encoding="utf-8") as base_file, open(new_path, encoding="utf-8") as new_file:
+        base, new = json.load(base_file), json.load(new_file)
+    if base["meta"]["settings"] != new["meta"]["settings"]:
+        print("Warning: the runs used different settings:", base["meta"]["settings"],
+              new["meta"]["settings"])
+    base_cases = {(case["files"], case["size"], case.get("adaptive")): case
+                  for case in base["cases"]}
+    print(f"{'case':>23}  " + "  ".join(f"{name:>20}" for name, _ in METRICS))
+    for case in new["cases"]:
+        old = base_cases.get((case["files"], case["size"], case.get("adaptive")))
+        if old is None:
+            continue
+        cells = []
+        for name, higher_is_better in METRICS:
+            if not old[name] or case[name] is None:
+                cells.append(f"{'-':>20}")
+                continue
+            change = (case[name] - old[name]) / old[name] * 100
+            better = change > 0 if higher_is_better else change < 0
+            # Mark changes of 5% or more as better (+) or worse (-)
+            mark = " " if abs(change) < 5 else "+" if better else "-"
+            cells.append(f"{case[name]:>11.3f} {change:+6.1f}% {mark}")
+        label = " adaptive" if case.get("adaptive") else " " * 9
+        print(f"{case['files']:>6} x {format_size(case['size']):>5}{label}  " + "  ".join(cells))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark Upload against a local stand-in.")
+    parser.add_argument("--files", default=DEFAULT_FILES, help="file counts (default: %(default)s)")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="file sizes (default: %(default)s)")
+    parser.add_argument("--max-total", default=DEFAULT_MAX_TOTAL,
+                        help="skip cases that upload more than this (default: %(default)s)")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every request")
+    parser.add_argument("--bandwidth", type=parse_size, help="stand-in bandwidth in bytes/s, e.g. 100M")
+    parser.add_argument("--capacity", type=int,
+                        help="stand-in answers 503 ServerBusy beyond this many requests at once")
+    parser.add_argument("-j", "--workers", type=int, default=8, help="files uploaded in parallel")
+    parser.add_argument("--data", choices=("random", "text"), default="random",
+                        help="file content; text compresses well (default: %(default)s)")
+    parser.add_argument("--compress", action="store_true", help="upload with compression='auto'")
+    parser.add_argument("--bundle-small", type=int, metavar="KIB", help="bundle files below KIB KiB")
+    parser.add_argument("--adaptive", type=int, metavar="MAX",
+                        help="use adaptive concurrency with at most MAX requests in flight")
+    parser.add_argument("--throttling", action="store_true",
+                        help="run every case with fixed workers and with adaptive concurrency "
+                             f"against a throttling stand-in (--capacity, default "
+                             f"{DEFAULT_THROTTLING_CAPACITY})")
+    parser.add_argument("--limit-rate", type=parse_size, metavar="RATE",
+                        help="cap the upload rate with a BandwidthLimiter, e.g. 20M")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per case; the fastest is kept")
+    parser.add_argument("-o", "--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "NEW"),
+                        help="compare two result files instead of running")
+    parser.add_argument("--run-case", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.run_case:
+        print(json.dumps(run_case(json.loads(args.run_case))))
+        return 0
+    if args.compare:
+        compare(*args.compare)
+        return 0
+    results = run_matrix(args)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output_file:
+            json.dump(results, output_file, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Local stand-in for the myDRE API and the Azure blob endpoint.
+
+Implements just enough of both for ``Upload``: creating and committing
+containers, and putting blobs, blocks and block lists. Uploaded data is
+counted and thrown away. Every request waits ``latency`` seconds, and
+request bodies share a simulated link of ``bandwidth`` bytes per second.
+With a ``capacity``, requests beyond that many at once get 503 ServerBusy,
+like a throttling storage account. Bodies sent with a Content-MD5 header
+are checked against it, and blob metadata is kept.
+Run it on its own to upload to it by hand::
+
+    python benchmarks/standin.py --port 8765 --latency 0.02 --bandwidth 50M
+
+and point ``Upload.BASE_URL`` at ``http://127.0.0.1:8765/v1``.
+``GET /_stats`` returns the request and byte counters as JSON.
+"""
+
+import argparse
+import base64
+import hashlib
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+from xml.etree import ElementTree
+
+READ_CHUNK_SIZE = 256 * 1024
+_SUFFIXES = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+
+
+def parse_size(text):
+    """Parse ``'64K'``, ``'10M'`` or ``'1G'`` (powers of 1024) into bytes."""
+    text = text.strip().upper().rstrip("B")
+    if text and text[-1] in _SUFFIXES:
+        return int(float(text[:-1]) * _SUFFIXES[text[-1]])
+    return int(text)
+
+
+class Link:
+    """A shared link of fixed bandwidth: transfers queue behind each other."""
+
+    def __init__(self, bandwidth=None):
+        self.bandwidth = bandwidth
+        self._free_at = 0.0
+        self._lock = threading.Lock()
+
+    def transfer(self, size):
+        if not self.bandwidth:
+            return
+        with self._lock:
+            start = max(time.monotonic(), self._free_at)
+            self._free_at = start + size / self.bandwidth
+            done_at = self._free_at
+        time.sleep(max(done_at - time.monotonic(), 0))
+
+
+class StandinServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port=0, latency=0.0, bandwidth=None, capacity=None):
+        super().__init__(("127.0.0.1", port), _Handler)
+        self.latency = latency
+        self.link = Link(bandwidth)
+        self.capacity = capacity
+        self.active = 0
+        self.lock = threading.Lock()
+        # id -> {"committed": bool, "blobs": {name: size}, "blocks": {name: {id: size}},
+        #        "metadata": {name: {key: value}}}
+        self.containers = {}
+        self.stats = {"requests": 0, "bytes_received": 0, "blobs": 0, "containers_committed": 0,
+                      "throttled": 0, "max_active": 0}
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+    def start(self):
+        """Serve from a daemon thread; returns self."""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _read_body(self):
+        """Read and discard the body through the simulated link.
+
+        Returns its size, and whether it matches the Content-MD5 header if one was sent.
+        """
+        remaining = size = int(self.headers.get("Content-Length") or 0)
+        md5 = hashlib.md5() if self.headers.get("Content-MD5") else None
+        while remaining:
+            chunk = self.rfile.read(min(remaining, READ_CHUNK_SIZE))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            if md5 is not None:
+                md5.update(chunk)
+            self.server.link.transfer(len(chunk))
+        valid = md5 is None or base64.b64encode(md5.digest()).decode() == self.headers["Content-MD5"]
+        return size, valid
+
+    def _reply(self, code, body=b"", headers=None):
+        self.send_response(code)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+    def _route(self, method):
+        server = self.server
+        with server.lock:
+            server.active += 1
+            server.stats["max_active"] = max(server.stats["max_active"], server.active)
+            throttle = server.capacity is not None and server.active > server.capacity
+        try:
+            if throttle:
+                self._read_body()
+                with server.lock:
+                    server.stats["throttled"] += 1
+                return self._reply(503, headers={"x-ms-error-code": "ServerBusy"})
+            return self._handle(method)
+        finally:
+            with server.lock:
+                server.active -= 1
+
+    def _handle(self, method):
+        server = self.server
+        time.sleep(server.latency)
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        parts = [unquote(part) for part in url.path.strip("/").split("/")]
+        if method == "GET" and parts == ["_stats"]:
+            with server.lock:
+                return self._reply(200, json.dumps(server.stats).encode(),
+                                   {"Content-Type": "application/json"})
+        # The block list is XML and must be kept; everything else is discarded
+        comp = query.get("comp", [None])[0]
+        if comp == "blocklist" and method == "PUT":
+            body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            size, valid = len(body), True
+        else:
+            body = None
+            size, valid = self._read_body()
+        with server.lock:
+            server.stats["requests"] += 1
+            server.stats["bytes_received"] += size
+        if not valid:
+            return self._reply(400, headers={"x-ms-error-code": "Md5Mismatch"})
+
+        if parts[:2] == ["v1", "api"]:
+            if method == "POST" and parts[-1] == "containers":
+                container_id = uuid.uuid4().hex
+                with server.lock:
+                    server.containers[container_id] = {"committed": False, "blobs": {}, "blocks": {},
+                                                       "metadata": {}}
+                location = f"http://{self.headers['Host']}/devstoreaccount1/{container_id}?sv=standin"
+                return self._reply(201, headers={"Location": location})
+            if method == "PATCH" and parts[-1] in server.containers:
+                with server.lock:
+                    server.containers[parts[-1]]["committed"] = True
+                    server.stats["containers_committed"] += 1
+                return self._reply(200)
+            return self._reply(404)
+
+        container = server.containers.get(parts[1]) if len(parts) > 2 else None
+        if container is None:
+            return self._reply(404)
+        blob = "/".join(parts[2:])
+        metadata = {name[len("x-ms-meta-"):]: value for name, value in self.headers.items()
+                    if name.lower().startswith("x-ms-meta-")}
+        headers = {"ETag": '"0x1"', "Last-Modified": "Mon, 01 Jan 2024 00:00:00 GMT",
+                   "x-ms-request-server-encrypted": "true"}
+        if method == "PUT" and comp == "block":
+            with server.lock:
+                container["blocks"].setdefault(blob, {})[query["blockid"][0]] = size
+            return self._reply(201, headers=headers)
+        if method == "PUT" and comp == "blocklist":
+            block_ids = [element.text for element in ElementTree.fromstring(body)]
+            with server.lock:
+                staged = container["blocks"].pop(blob, {})
+                container["blobs"][blob] = sum(staged[block_id] for block_id in block_ids)
+                container["metadata"][blob] = metadata
+                server.stats["blobs"] += 1
+            return self._reply(201, headers=headers)
+        if method == "PUT":
+            with server.lock:
+                container["blobs"][blob] = size
+                container["metadata"][blob] = metadata
+                server.stats["blobs"] += 1
+            return self._reply(201, headers=headers)
+        if method == "GET" and comp == "blocklist":
+            with server.lock:
+                staged = dict(container["blocks"].get(blob, {}))
+            xml = ('<?xml version="1.0" encoding="utf-8"?><BlockList><CommittedBlocks/><UncommittedBlocks>'
+                   + "".join(f"<Block><Name>{block_id}</Name><Size>{block_size}</Size></Block>"
+                             for block_id, block_size in staged.items())
+                   + "</UncommittedBlocks></BlockList>")
+            return self._reply(200, xml.encode(), {"Content-Type": "application/xml"})
+        return self._reply(404)
+
+    def do_POST(self):
+        self._route("POST")
+
+    def do_PATCH(self):
+        self._route("PATCH")
+
+    def do_PUT(self):
+        self._route("PUT")
+
+    def do_GET(self):
+        self._route("GET")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local stand-in for the myDRE API and blob endpoint.")
+    parser.add_argument("--port", type=int, default=0, help="port to listen on (default: any free port)")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every request")
+    parser.add_argument("--bandwidth", type=parse_size, help="upload bandwidth in bytes/s, e.g. 50M")
+    parser.add_argument("--capacity", type=int,
+                        help="answer 503 ServerBusy to requests beyond this many at once")
+    args = parser.parse_args(argv)
+    server = StandinServer(args.port, args.latency, args.bandwidth, args.capacity)
+    # The benchmark reads the port from this line
+    print(f"listening on {server.server_address[1]}", flush=True)
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -29,18 +29,22 @@ setup(
         'cryptography>=35.0.0',
         'Pillow>=8.0.0',
         'requests>=2.25.0',
-        'azure-storage-blob>=12.0.0',
+        'azure-storage-blob>=12.14.0',
         'tk>=0.1.0',
     ],
     extras_require={
         'mydre_uploader': read_requirements("mydre_uploader.txt"),
         'mydre_config_encrypter': read_requirements("mydre_config_encrypter.txt"),
+        'async': read_requirements("mydre_uploader.txt") + read_requirements("mydre_uploader_async.txt"),
         'all': read_requirements("mydre_uploader.txt") + read_requirements("mydre_config_encrypter.txt")
     },
     entry_points={
         'console_scripts': [
             'mydre-uploader=mydre_uploader.gui:main',
+            'mydre-upload=mydre_uploader.cli:main',
+            'mydre-agent=mydre_uploader.agent:main',
             'mydre-config-encrypter=mydre_config_encrypter.gui:main',
+            'mydre-config-batch=mydre_config_encrypter.cli:main',
         ],
     },
     package_data={
@@ -3,7 +3,6 @@
 Main entry point for myDRE Config Encrypter
 """
 
-import tkinter as tk
 import sys
 import os
 
@@ -11,12 +10,13 @@ import os
 if os.path.dirname(__file__) not in sys.path:
     sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from mydre_config_encrypter.gui import EncrypterForm
-
-def main():
-    root = tk.Tk()
-    app = EncrypterForm(root)
-    root.mainloop()
+# Starts the startup timer's clock before the GUI's imports; the encrypter also
+# runs without the uploader package, as its GUI module allows
+try:
+    import mydre_uploader.startup  # noqa: F401
+except ImportError:
+    pass
+from mydre_config_encrypter.gui import main
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
\ No newline at end of file
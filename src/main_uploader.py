@@ -3,7 +3,6 @@
 Main entry point for myDRE Uploader
 """
 
-import tkinter as tk
 import sys
 import os
 
@@ -11,12 +10,9 @@ import os
 if os.path.dirname(__file__) not in sys.path:
     sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from mydre_uploader.gui import UploadForm
-
-def main():
-    root = tk.Tk()
-    app = UploadForm(root)
-    root.mainloop()
+# Starts the startup timer's clock before the GUI's imports
+import mydre_uploader.startup
+from mydre_uploader.gui import main
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
\ No newline at end of file
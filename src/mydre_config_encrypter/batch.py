@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Batch generation of myDRE configuration files.
+
+A spec lists one configuration per row, as CSV with a header or as a JSON
+list of objects, with the fields of ``ConfigEncrypter.save_config``.
+``generate_configs`` checks every row first, then derives the key of each
+distinct PIN only once: rows are grouped by PIN and each group is derived
+and encrypted in a worker process, so the slow key derivations of many PINs
+run on all cores. Files are written atomically by the calling process.
+"""
+
+import csv
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+# Handle both package import and direct script execution
+try:
+    from .encrypter import FORMAT_VERSION, MIN_PIN_LENGTH, ConfigEncrypter, write_config
+except ImportError:
+    from encrypter import FORMAT_VERSION, MIN_PIN_LENGTH, ConfigEncrypter, write_config
+
+CONFIG_FIELDS = ("ws_name", "ws_description", "ws_key", "tenant_key", "user_name")
+SPEC_FIELDS = ("pin",) + CONFIG_FIELDS + ("filename",)
+# Other accepted column names, e.g. the keys of a configuration file
+FIELD_ALIASES = {
+    "workspace_name": "ws_name",
+    "workspace_description": "ws_description",
+    "workspace_key": "ws_key",
+    "subscription_key": "tenant_key",
+}
+
+
+def load_spec(path):
+    """Read a ``.csv`` or ``.json`` spec and return its rows as dicts with ``SPEC_FIELDS`` keys.
+
+    Column names are case-insensitive and may use the aliases in
+    ``FIELD_ALIASES``; unknown columns raise ``ValueError``. Missing fields
+    are empty strings.
+    """
+    if path.lower().endswith(".json"):
+        with open(path, "r", encoding="utf-8") as f:
+            raw_rows = json.load(f)
+        if not isinstance(raw_rows, list) or not all(isinstance(row, dict) for row in raw_rows):
+            raise ValueError(f"{path}: expected a JSON list of objects")
+    else:
+        # utf-8-sig drops the byte order mark spreadsheet programs write
+        with open(path, "r", encoding="utf-8-sig", newline="") as f:
+            raw_rows = list(csv.DictReader(f))
+
+    rows = []
+    for raw_row in raw_rows:
+        row = dict.fromkeys(SPEC_FIELDS, "")
+        for name, value in raw_row.items():
+            field = (name or "").strip().lower()
+            field = FIELD_ALIASES.get(field, field)
+            if field not in row:
+                raise ValueError(f"{path}: unknown column {name!r}; expected {', '.join(SPEC_FIELDS)}")
+            row[field] = "" if value is None else str(value).strip()
+        rows.append(row)
+    return rows
+
+
+def default_filename(row):
+    """Name a config after its user and workspace, keeping only characters safe in file names."""
+    return re.sub(r"[^\w.-]+", "_", f"{row['user_name']}_{row['ws_name']}").strip("._") or "config"
+
+
+def _encrypt_group(pin, kdf, rows, format_version):
+    """Derive the key of one PIN and encrypt all rows that use it; runs in a worker process."""
+    encrypter = ConfigEncrypter()
+    key = encrypter.derive_key(pin, kdf)
+    return [encrypter.encrypt_config(key, kdf, format_version=format_version,
+                                     **{field: row[field] for field in CONFIG_FIELDS})
+            for row in rows]
+
+
+def generate_configs(rows, output_dir=".", default_pin=None, max_workers=None, overwrite=False,
+                     format_version=FORMAT_VERSION):
+    """Write one encrypted configuration file per spec row.
+
+    Rows without a PIN use ``default_pin``. Returns one dict per row, in
+    order, with ``row`` (1-based), ``filename``, ``user_name``, ``ws_name``
+    and ``error`` (None on success). A row that is incomplete, has a short
+    PIN, repeats another row's file name or would overwrite an existing file
+    (unless ``overwrite``) gets an error and is not written; the other rows
+    are still written. ``max_workers`` limits the worker processes; with 1,
+    or a single distinct PIN, everything runs in this process.
+
+    In format version 2, the files of one PIN share a random salt, so its
+    key is still derived once; files with different PINs never share one.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    results = []
+    groups = {}  # pin -> indexes of the rows that use it
+    seen = set()
+    for index, row in enumerate(rows):
+        pin = row.get("pin") or default_pin or ""
+        filename = row.get("filename") or default_filename(row)
+        if not filename.lower().endswith(".json"):
+            filename += ".json"
+        path = os.path.join(output_dir, filename)
+        result = {"row": index + 1, "filename": path, "user_name": row.get("user_name", ""),
+                  "ws_name": row.get("ws_name", ""), "error": None}
+        results.append(result)
+
+        missing = [field for field in CONFIG_FIELDS if not row.get(field)]
+        if missing:
+            result["error"] = f"missing {', '.join(missing)}"
+        elif not pin:
+            result["error"] = "no PIN"
+        elif len(pin) < MIN_PIN_LENGTH:
+            result["error"] = f"PIN must be at least {MIN_PIN_LENGTH} characters long"
+        elif os.path.normcase(os.path.abspath(path)) in seen:
+            result["error"] = "same file name as an earlier row"
+        elif not overwrite and os.path.exists(path):
+            result["error"] = "file exists (use overwrite to replace it)"
+        else:
+            seen.add(os.path.normcase(os.path.abspath(path)))
+            groups.setdefault(pin, []).append(index)
+
+    # The derivation cost is measured once, before the workers compete for the CPU
+    encrypter = ConfigEncrypter()
+    work = [(pin, encrypter.new_kdf_params(format_version), indexes, [rows[index] for index in indexes])
+            for pin, indexes in groups.items()]
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    max_workers = min(max_workers, len(work))
+    if max_workers > 1:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = [(indexes, executor.submit(_encrypt_group, pin, kdf, group_rows, format_version))
+                       for pin, kdf, indexes, group_rows in work]
+            encrypted = [(indexes, future.result()) for indexes, future in futures]
+    else:
+        encrypted = [(indexes, _encrypt_group(pin, kdf, group_rows, format_version))
+                     for pin, kdf, indexes, group_rows in work]
+
+    for indexes, configs in encrypted:
+        for index, data in zip(indexes, configs):
+            try:
+                write_config(results[index]["filename"], data, overwrite=overwrite)
+            except FileExistsError:
+                results[index]["error"] = "file exists (use overwrite to replace it)"
+            except OSError as e:
+                results[index]["error"] = f"failed to save file: {e}"
+    return results
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Command line interface for myDRE Config Encrypter.
+
+Generates encrypted configuration files for many users and workspaces from
+one spec, without the GUI::
+
+    mydre-config-batch users.csv --output-dir configs
+
+The spec is CSV with a header, or a JSON list of objects, with the columns
+``pin``, ``ws_name``, ``ws_description``, ``ws_key``, ``tenant_key``,
+``user_name`` and optionally ``filename``. Rows without a PIN use the PIN
+from the ``MYDRE_PIN`` environment variable, or from standard input when that
+variable is not set. The files of one PIN share a salt, so that its key is
+derived only once. Exits with 0 when every file was written, 1 when any
+row failed and 2 on usage or spec errors. This module does not import
+tkinter.
+"""
+
+import argparse
+import getpass
+import multiprocessing
+import os
+import sys
+
+# Handle both package import and direct script execution
+try:
+    from .batch import generate_configs, load_spec
+except ImportError:
+    from batch import generate_configs, load_spec
+
+PIN_ENV_VAR = "MYDRE_PIN"
+
+
+def read_pin():
+    """Return the PIN from the environment, a terminal prompt or the first line of stdin."""
+    pin = os.environ.get(PIN_ENV_VAR)
+    if pin:
+        return pin
+    if sys.stdin.isatty():
+        return getpass.getpass("PIN for rows without one: ")
+    return sys.stdin.readline().rstrip("\r\n")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="mydre-config-batch",
+        description="Generate encrypted myDRE configuration files from a CSV or JSON spec.",
+        epilog=f"Rows without a PIN use ${PIN_ENV_VAR}, or a PIN read from stdin when it is not set.")
+    parser.add_argument("spec", help="CSV file with a header row, or a JSON list of objects")
+    parser.add_argument("-o", "--output-dir", default=".",
+                        help="directory for the configuration files (default: current directory)")
+    parser.add_argument("-j", "--workers", type=int,
+                        help="worker processes for key derivation (default: number of CPUs)")
+    parser.add_argument("--overwrite", action="store_true",
+                        help="replace configuration files that already exist")
+    parser.add_argument("--format-version", type=int, choices=(1, 2), default=2,
+                        help="configuration format; 1 for uploaders older than format 2 "
+                             "(default: %(default)s)")
+    parser.add_argument("-q", "--quiet", action="store_true",
+                        help="only print the summary and errors")
+    return parser
+
+
+def main(argv=None):
+    # Worker processes of a frozen executable start through this entry point
+    multiprocessing.freeze_support()
+    args = build_parser().parse_args(argv)
+    if args.workers is not None and args.workers < 1:
+        print("Error: --workers must be at least 1", file=sys.stderr)
+        return 2
+
+    try:
+        rows = load_spec(args.spec)
+    except (OSError, ValueError) as e:
+        print(f"Error: failed to load spec: {e}", file=sys.stderr)
+        return 2
+    if not rows:
+        print(f"Error: {args.spec} has no rows", file=sys.stderr)
+        return 2
+    default_pin = read_pin() if any(not row["pin"] for row in rows) else None
+
+    results = generate_configs(rows, output_dir=args.output_dir, default_pin=default_pin,
+                               max_workers=args.workers, overwrite=args.overwrite,
+                               format_version=args.format_version)
+    failed = [result for result in results if result["error"]]
+    for result in results:
+        if result["error"]:
+            print(f"FAILED  row {result['row']} ({result['user_name']} / {result['ws_name']}): "
+                  f"{result['error']}", file=sys.stderr)
+        elif not args.quiet:
+            print(f"ok      {result['filename']}")
+    print(f"Wrote {len(results) - len(failed)} configuration file(s), {len(failed)} failed")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
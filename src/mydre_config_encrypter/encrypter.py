@@ -2,62 +2,171 @@
 # -*- coding: utf-8 -*-
 """
 Encryption functionality for myDRE configuration files.
+
+New files use format version 2: a ``KDF`` header with a random salt and a
+key derivation cost measured on this machine, and all fields in one
+encrypted ``PAYLOAD``. Version 1, with every field encrypted separately
+under a fixed salt and cost, can still be written for uploaders older than
+the format.
 """
 
-from cryptography.fernet import Fernet
-from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 import base64
 import json
+import os
+import tempfile
+import time
+
+MIN_PIN_LENGTH = 6
+FORMAT_VERSION = 2
+KDF_ALGORITHM = "pbkdf2-sha256"
+SALT_BYTES = 16
+# Version 2 derivations are tuned to take about this long here ...
+KDF_TARGET_SECONDS = 0.25
+# ... but never use fewer iterations than version 1 did
+MIN_KDF_ITERATIONS = 100000
+V1_KDF = {"algorithm": KDF_ALGORITHM, "salt": base64.b64encode(b'static_salt').decode(),
+          "iterations": 100000, "length": 32}
+
+
+def calibrate_iterations(target_seconds=KDF_TARGET_SECONDS):
+    """Return the PBKDF2 iterations that take about ``target_seconds`` on this machine."""
+    from cryptography.hazmat.primitives import hashes
+    from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+
+    sample = 50000
+    # The fastest of a few runs, so a busy moment does not weaken the result
+    elapsed = float("inf")
+    for _ in range(3):
+        kdf = PBKDF2HMAC(algorithm=hashes.SHA256(), length=32, salt=os.urandom(SALT_BYTES),
+                         iterations=sample)
+        started = time.perf_counter()
+        kdf.derive(b"calibration")
+        elapsed = min(elapsed, time.perf_counter() - started)
+    elapsed = max(elapsed, 1e-6)
+    iterations = int(sample * target_seconds / elapsed) // 10000 * 10000
+    return max(MIN_KDF_ITERATIONS, iterations)
+
+
+def new_kdf_params(iterations):
+    """Return version 2 key derivation parameters with a fresh random salt."""
+    return {"algorithm": KDF_ALGORITHM, "salt": base64.b64encode(os.urandom(SALT_BYTES)).decode(),
+            "iterations": iterations, "length": 32}
+
 
 class ConfigEncrypter:
     """Handles encryption of myDRE configuration files."""
 
     def __init__(self):
         """Initialize the ConfigEncrypter."""
-        self._salt = b'static_salt'  # In production, use a secure random salt
-        self._min_pin_length = 6
+        self._min_pin_length = MIN_PIN_LENGTH
+        self._iterations = None  # calibrated on first use
+
+    def kdf_iterations(self) -> int:
+        """Return the iterations for new version 2 files, measuring them the first time."""
+        if self._iterations is None:
+            self._iterations = calibrate_iterations()
+        return self._iterations
 
-    def derive_key(self, pin: str) -> bytes:
-        """Derive an encryption key from a PIN."""
+    def new_kdf_params(self, format_version: int = FORMAT_VERSION) -> dict:
+        """Return key derivation parameters for a new file of ``format_version``."""
+        if format_version == 1:
+            return dict(V1_KDF)
+        return new_kdf_params(self.kdf_iterations())
+
+    def derive_key(self, pin: str, kdf: dict = None) -> bytes:
+        """Derive an encryption key from a PIN with the parameters ``kdf`` (default: version 1)."""
         if len(pin) < self._min_pin_length:
             raise ValueError(f"PIN must be at least {self._min_pin_length} characters long")
+        kdf = V1_KDF if kdf is None else kdf
+
+        # Imported here so that the window does not wait for cryptography
+        from cryptography.hazmat.primitives import hashes
+        from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 
         kdf = PBKDF2HMAC(
             algorithm=hashes.SHA256(),
-            length=32,
-            salt=self._salt,
-            iterations=100000,
+            length=kdf["length"],
+            salt=base64.b64decode(kdf["salt"]),
+            iterations=kdf["iterations"],
         )
         return base64.urlsafe_b64encode(kdf.derive(pin.encode()))
 
     def encrypt_data(self, data: str, key: bytes) -> str:
         """Encrypt data using the provided key."""
+        from cryptography.fernet import Fernet
+
         f = Fernet(key)
         return f.encrypt(data.encode()).decode()
 
+    def encrypt_config(self, key: bytes, kdf: dict, ws_name: str, ws_description: str,
+                       ws_key: str, tenant_key: str, user_name: str,
+                       format_version: int = FORMAT_VERSION) -> dict:
+        """Return the contents of a configuration file, encrypted with a key derived with ``kdf``."""
+        fields = {
+            "WORKSPACE_NAME": ws_name,
+            "WORKSPACE_DESCRIPTION": ws_description,
+            "WORKSPACE_KEY": ws_key,
+            "SUBSCRIPTION_KEY": tenant_key,
+            "USER_NAME": user_name
+        }
+        if format_version == 1:
+            return {name: value if name == "WORKSPACE_NAME" else self.encrypt_data(value, key)
+                    for name, value in fields.items()}
+        # The name stays readable so uploaders can show it before the PIN is entered
+        return {
+            "FORMAT_VERSION": format_version,
+            "WORKSPACE_NAME": ws_name,
+            "KDF": kdf,
+            "PAYLOAD": self.encrypt_data(json.dumps(fields), key)
+        }
+
     def save_config(self, pin: str, ws_name: str, ws_description: str,
                    ws_key: str, tenant_key: str, user_name: str,
-                   filename: str) -> None:
+                   filename: str, format_version: int = FORMAT_VERSION) -> None:
         """Create and save an encrypted configuration file."""
         if not all([pin, ws_name, ws_description, ws_key, tenant_key, user_name, filename]):
             raise ValueError("All fields must be filled")
 
-        encryption_key = self.derive_key(pin)
-        
-        encrypted_data = {
-            "WORKSPACE_NAME": ws_name,
-            "WORKSPACE_DESCRIPTION": self.encrypt_data(ws_description, encryption_key),
-            "WORKSPACE_KEY": self.encrypt_data(ws_key, encryption_key),
-            "SUBSCRIPTION_KEY": self.encrypt_data(tenant_key, encryption_key),
-            "USER_NAME": self.encrypt_data(user_name, encryption_key)
-        }
+        kdf = self.new_kdf_params(format_version)
+        encryption_key = self.derive_key(pin, kdf)
+        encrypted_data = self.encrypt_config(encryption_key, kdf, ws_name, ws_description,
+                                             ws_key, tenant_key, user_name, format_version)
 
         if not filename.lower().endswith('.json'):
             filename += '.json'
 
         try:
-            with open(filename, "w") as f:
-                json.dump(encrypted_data, f, indent=4)
+            write_config(filename, encrypted_data)
         except Exception as e:
-            raise IOError(f"Failed to save file: {str(e)}")
\ No newline at end of file
+            raise IOError(f"Failed to save file: {str(e)}")
+
+
+def write_config(filename: str, data: dict, overwrite: bool = True) -> None:
+    """Write a configuration file atomically, so a reader never sees half of it.
+
+    The file is written under a temporary name in the same directory and
+    renamed into place. Without ``overwrite``, an existing file raises
+    ``FileExistsError`` and is left alone; where the file system has no
+    hard links, a reader may briefly see an empty file instead.
+    """
+    directory = os.path.dirname(os.path.abspath(filename))
+    descriptor, temporary_path = tempfile.mkstemp(prefix=".config-", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(descriptor, "w") as f:
+            json.dump(data, f, indent=4)
+        if overwrite:
+            os.replace(temporary_path, filename)
+        else:
+            try:
+                # A hard link fails if the name is taken, even by a concurrent writer
+                os.link(temporary_path, filename)
+            except FileExistsError:
+                raise
+            except (AttributeError, NotImplementedError, OSError):
+                # No hard links here (FAT, exFAT, some network shares): claim the name
+                # exclusively, then move the finished file over the empty claim
+                os.close(os.open(filename, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                os.replace(temporary_path, filename)
+    finally:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
@@ -4,6 +4,12 @@
 GUI implementation for myDRE Config Encrypter.
 """
 
+# Imported first, so that the startup timer's clock includes the imports below
+try:
+    from mydre_uploader.startup import startup_timer
+except ImportError:
+    startup_timer = None
+
 import tkinter as tk
 from tkinter import messagebox
 import os
@@ -199,9 +205,13 @@ class EncrypterForm:
         widget.bind('<Enter>', show_tooltip)
         widget.bind('<Leave>', hide_tooltip)
 
-def main():
+def main(argv=None):
+    """Start the encrypter GUI; ``--startup-time[=FILE]`` reports the startup time and quits."""
+    timer = startup_timer("mydre-config-encrypter", argv) if startup_timer is not None else None
     root = tk.Tk()
     app = EncrypterForm(root)
+    if timer is not None:
+        timer.watch(root)
     root.mainloop()
 
 if __name__ == "__main__":
@@ -213,6 +223,4 @@ if __name__ == "__main__":
     if os.path.dirname(__file__) not in sys.path:
         sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
     
-    root = tk.Tk()
-    app = EncrypterForm(root)
-    root.mainloop()
\ No newline at end of file
+    main()
\ No newline at end of file
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Local credential agent for myDRE Uploader.
+
+Deriving the key of a config from its PIN is slow on purpose, which adds up
+when scheduled jobs start many small uploads. The agent is a small process
+of the current user that keeps decrypted configs in memory: unlock a config
+once with ``mydre-agent add -c keys.json`` and ``mydre-upload`` takes the
+workspace keys from the agent instead of asking for the PIN and deriving
+the key again::
+
+    MYDRE_PIN=... mydre-agent add -c keys.json --idle-timeout 3600
+    mydre-upload -c keys.json /data/export   # no PIN, no key derivation
+    mydre-agent stop
+
+The agent listens on a Unix socket (``agent.sock`` in ``~/.mydre``, or
+``$MYDRE_AGENT_SOCKET``) that only its owner may open, refuses connections
+from other users where the system reports them, and quits, forgetting
+everything, after ``idle_timeout`` seconds without requests. Configs are
+known by a hash of the encrypted file's content, so a changed file has to
+be unlocked again. Forgetting is best effort: Python may keep copies of
+the keys in memory until the process ends. Not available on Windows.
+"""
+
+import argparse
+import getpass
+import hashlib
+import json
+import os
+import socket
+import struct
+import subprocess
+import sys
+import time
+
+# Handle both package import and direct script execution
+try:
+    from .paths import get_data_dir
+except ImportError:
+    from paths import get_data_dir
+
+SOCKET_ENV_VAR = "MYDRE_AGENT_SOCKET"
+PIN_ENV_VAR = "MYDRE_PIN"
+DEFAULT_IDLE_TIMEOUT = 15 * 60
+# Seconds a client may take to send its request, so one stuck client cannot block the agent
+REQUEST_TIMEOUT = 5
+START_TIMEOUT = 5
+MAX_REQUEST_BYTES = 1024 * 1024
+
+
+def agent_supported():
+    return hasattr(socket, "AF_UNIX")
+
+
+def default_socket_path():
+    return os.environ.get(SOCKET_ENV_VAR) or os.path.join(get_data_dir(), "agent.sock")
+
+
+def config_id(keys_data):
+    """Return the name the agent knows a loaded (still encrypted) config by."""
+    return hashlib.sha256(json.dumps(keys_data, sort_keys=True).encode()).hexdigest()
+
+
+def request(message, socket_path=None, timeout=REQUEST_TIMEOUT):
+    """Send one request to the agent and return its reply.
+
+    Raises ``OSError`` if no agent is listening and ``RuntimeError`` if the
+    agent refused the request.
+    """
+    if not agent_supported():
+        raise OSError("the credential agent needs Unix sockets")
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        connection.settimeout(timeout)
+        connection.connect(socket_path or default_socket_path())
+        connection.sendall(json.dumps(message).encode() + b"\n")
+        reply = json.loads(_read_line(connection) or b"{}")
+    if not reply.get("ok"):
+        raise RuntimeError(reply.get("error", "no reply from the agent"))
+    return reply
+
+
+def get_config(keys_data, socket_path=None):
+    """Return the decrypted config for ``keys_data`` from the agent, or None.
+
+    None means no agent is running or it does not hold this config; the
+    caller then falls back to the PIN.
+    """
+    try:
+        return request({"op": "get", "id": config_id(keys_data)}, socket_path)["config"]
+    except (OSError, RuntimeError, ValueError):
+        return None
+
+
+def start_agent(socket_path=None, idle_timeout=DEFAULT_IDLE_TIMEOUT):
+    """Start an agent in the background unless one is running; returns when it answers."""
+    socket_path = socket_path or default_socket_path()
+    try:
+        request({"op": "list"}, socket_path)
+        return
+    except (OSError, RuntimeError):
+        pass
+    subprocess.Popen([sys.executable, os.path.abspath(__file__), "--socket", socket_path, "serve",
+                      "--idle-timeout", str(idle_timeout)],
+                     stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                     start_new_session=True, close_fds=True)
+    deadline = time.monotonic() + START_TIMEOUT
+    while True:
+        try:
+            request({"op": "list"}, socket_path)
+            return
+        except (OSError, RuntimeError):
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"the agent did not start listening on {socket_path}")
+            time.sleep(0.05)
+
+
+def _read_line(connection):
+    data = b""
+    while not data.endswith(b"\n"):
+        chunk = connection.recv(65536)
+        if not chunk:
+            break
+        data += chunk
+        if len(data) > MAX_REQUEST_BYTES:
+            raise ValueError("request too large")
+    return data
+
+
+def _peer_uid(connection):
+    """Return the user id of the process on the other end, or None where the system does not say."""
+    if not hasattr(socket, "SO_PEERCRED"):
+        return None
+    credentials = connection.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i"))
+    return struct.unpack("3i", credentials)[1]
+
+
+class CredentialAgent:
+    """Holds decrypted configs and answers requests on a Unix socket until it is idle too long."""
+
+    def __init__(self, socket_path=None, idle_timeout=DEFAULT_IDLE_TIMEOUT):
+        self.socket_path = socket_path or default_socket_path()
+        self.idle_timeout = idle_timeout
+        self.configs = {}  # config id -> decrypted config
+        self._running = False
+
+    def serve(self):
+        """Listen until idle for ``idle_timeout`` seconds or asked to stop; blocks."""
+        listener = self._listen()
+        self._running = True
+        try:
+            listener.settimeout(self.idle_timeout)
+            while self._running:
+                try:
+                    connection, _ = listener.accept()
+                except socket.timeout:
+                    break
+                with connection:
+                    self._handle(connection)
+        finally:
+            self.configs.clear()
+            listener.close()
+            try:
+                os.unlink(self.socket_path)
+            except OSError:
+                pass
+
+    def _listen(self):
+        try:
+            request({"op": "list"}, self.socket_path)
+        except (OSError, RuntimeError):
+            pass
+        else:
+            raise RuntimeError(f"an agent is already listening on {self.socket_path}")
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)  # left behind by an agent that did not exit cleanly
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        # The socket is created owner-only, so no other user can connect even for a moment
+        old_umask = os.umask(0o177)
+        try:
+            listener.bind(self.socket_path)
+        finally:
+            os.umask(old_umask)
+        os.chmod(self.socket_path, 0o600)
+        listener.listen()
+        return listener
+
+    def _handle(self, connection):
+        connection.settimeout(REQUEST_TIMEOUT)
+        try:
+            peer = _peer_uid(connection)
+            if peer is not None and peer != os.getuid():
+                reply = {"ok": False, "error": "permission denied"}
+            else:
+                try:
+                    reply = self.answer(json.loads(_read_line(connection)))
+                except (AttributeError, KeyError, TypeError):
+                    reply = {"ok": False, "error": "malformed request"}
+            connection.sendall(json.dumps(reply).encode() + b"\n")
+        except (OSError, ValueError):
+            pass  # the client went away or sent garbage; it gets no answer
+
+    def answer(self, message):
+        """Return the reply to one request dict."""
+        op = message.get("op")
+        if op == "get":
+            config = self.configs.get(message.get("id"))
+            if config is None:
+                return {"ok": False, "error": "config not unlocked"}
+            return {"ok": True, "config": config}
+        if op == "add":
+            self.configs[message["id"]] = message["config"]
+            return {"ok": True}
+        if op == "list":
+            return {"ok": True, "configs": [{"id": config_id, "ws_name": config["ws_name"],
+                                             "user_name": config["user_name"]}
+                                            for config_id, config in self.configs.items()],
+                    "idle_timeout": self.idle_timeout}
+        if op == "remove":
+            removed = self.configs.pop(message.get("id"), None) is not None
+            return {"ok": True, "removed": removed}
+        if op == "stop":
+            self._running = False
+            return {"ok": True}
+        return {"ok": False, "error": f"unknown request {op!r}"}
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="mydre-agent",
+        description="Keep unlocked myDRE configs in memory so mydre-upload needs no PIN.",
+        epilog=f"The PIN is read from ${PIN_ENV_VAR}, or from stdin when it is not set.")
+    parser.add_argument("--socket", help=f"socket path (default: ${SOCKET_ENV_VAR} or ~/.mydre/agent.sock)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    add = commands.add_parser("add", help="unlock configs with the PIN, starting the agent if needed")
+    add.add_argument("-c", "--config", required=True, action="append",
+                     help="encrypted configuration file; repeat for several (same PIN)")
+    add.add_argument("--idle-timeout", type=int, default=DEFAULT_IDLE_TIMEOUT, metavar="SECONDS",
+                     help="a newly started agent quits after this long without requests "
+                          "(default: %(default)s)")
+    remove = commands.add_parser("remove", help="forget configs")
+    remove.add_argument("-c", "--config", required=True, action="append")
+    commands.add_parser("list", help="show the unlocked configs")
+    commands.add_parser("stop", help="stop the agent, forgetting all configs")
+    serve = commands.add_parser("serve", help="run the agent in the foreground")
+    serve.add_argument("--idle-timeout", type=int, default=DEFAULT_IDLE_TIMEOUT, metavar="SECONDS")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if not agent_supported():
+        print("Error: the credential agent needs Unix sockets, which this system does not have",
+              file=sys.stderr)
+        return 2
+
+    if args.command == "serve":
+        try:
+            CredentialAgent(args.socket, args.idle_timeout).serve()
+        except (OSError, RuntimeError) as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 2
+        return 0
+
+    if args.command in ("add", "remove"):
+        # Imported here, so that the agent process itself does not load cryptography
+        try:
+            from .config import decrypt_config, load_config
+        except ImportError:
+            from config import decrypt_config, load_config
+        try:
+            keys_data = [load_config(path) for path in args.config]
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Error: failed to load config file: {e}", file=sys.stderr)
+            return 2
+
+    try:
+        if args.command == "add":
+            pin = os.environ.get(PIN_ENV_VAR) or (getpass.getpass("PIN: ") if sys.stdin.isatty()
+                                                  else sys.stdin.readline().rstrip("\r\n"))
+            configs = []
+            for path, data in zip(args.config, keys_data):
+                try:
+                    configs.append(decrypt_config(data, pin))
+                except Exception:
+                    print(f"Error: could not decrypt {path}, probably wrong PIN", file=sys.stderr)
+                    return 2
+            start_agent(args.socket, args.idle_timeout)
+            for data, config in zip(keys_data, configs):
+                request({"op": "add", "id": config_id(data), "config": config}, args.socket)
+                print(f"Unlocked {config['ws_name']} ({config['user_name']})")
+        elif args.command == "remove":
+            for path, data in zip(args.config, keys_data):
+                removed = request({"op": "remove", "id": config_id(data)}, args.socket)["removed"]
+                print(f"{'Forgot' if removed else 'Not unlocked:'} {path}")
+        elif args.command == "list":
+            reply = request({"op": "list"}, args.socket)
+            for config in reply["configs"]:
+                print(f"{config['ws_name']} ({config['user_name']})")
+            print(f"{len(reply['configs'])} config(s) unlocked; the agent quits after "
+                  f"{reply['idle_timeout']} s without requests")
+        elif args.command == "stop":
+            request({"op": "stop"}, args.socket)
+            print("Agent stopped")
+    except OSError:
+        print("Error: no agent is running", file=sys.stderr)
+        return 1
+    except RuntimeError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Asyncio upload functionality for myDRE workspace.
+
+``AsyncUpload`` mirrors ``Upload`` for callers that run an event loop. It
+uses aiohttp for the myDRE API and the async Azure blob SDK, so many
+transfers share one loop and one connection pool instead of a thread each.
+Install the extra dependency with ``pip install mydre-tools[async]``.
+"""
+
+import asyncio
+import functools
+import hashlib
+import os
+import sqlite3
+import time
+import uuid
+from datetime import datetime
+from urllib.parse import urlparse
+
+try:
+    import aiohttp
+except ImportError as e:
+    raise ImportError("AsyncUpload requires aiohttp; install it with "
+                      "'pip install mydre-tools[async]'") from e
+from azure.core.pipeline.transport import AioHttpTransport
+from azure.storage.blob import BlobBlock
+from azure.storage.blob.aio import ContainerClient
+
+# Handle both package import and direct script execution
+try:
+    from .uploader import (API_BASE_URL, DEFAULT_MAX_WORKERS, LARGE_FILE_THRESHOLD,
+                           MAX_BLOCK_CONCURRENCY, SHA256_METADATA_KEY, auto_block_concurrency,
+                           auto_block_size, check_block_size, make_block_id)
+    from .history import UploadHistory
+except ImportError:
+    from uploader import (API_BASE_URL, DEFAULT_MAX_WORKERS, LARGE_FILE_THRESHOLD,
+                          MAX_BLOCK_CONCURRENCY, SHA256_METADATA_KEY, auto_block_concurrency,
+                          auto_block_size, check_block_size, make_block_id)
+    from history import UploadHistory
+
+
+class AsyncUpload:
+    """Handles secure file uploads to myDRE workspace from asyncio code.
+
+    Use it as an async context manager, or call ``close()`` when done::
+
+        async with AsyncUpload(ws_name, ws_description, ws_key, tenant_key, user_name) as uploader:
+            await uploader.create_workspace_container()
+            await uploader.upload_many(paths)
+            await uploader.commit_workspace_container()
+    """
+
+    def __init__(self, ws_name, ws_description, ws_key, tenant_key, user_name,
+                 max_concurrency=DEFAULT_MAX_WORKERS, block_size=None, max_block_concurrency=None,
+                 history=None):
+        self.workspace_name = ws_name
+        self.workspace_description = ws_description
+        self.workspace_key = ws_key
+        self.tenant_key = tenant_key
+        self.uploader = user_name
+        self.BASE_URL = API_BASE_URL
+        self.container_location = ''
+        self.uploaded_files = []
+        self.max_concurrency = max_concurrency
+        self.block_size = block_size  # None picks a size per file
+        self.max_block_concurrency = max_block_concurrency  # None picks a value per file
+        self.session = None
+        self._container_client = None
+        # Same upload history as Upload; the default store is closed with this session
+        self._owns_history = history is None
+        self.history = UploadHistory() if history is None else history
+        self.session_id = uuid.uuid4().hex
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    def _get_session(self):
+        """Return the aiohttp session, created on first use inside the running loop."""
+        if self.session is None:
+            pool_size = self.max_concurrency * (self.max_block_concurrency or MAX_BLOCK_CONCURRENCY)
+            self.session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=pool_size))
+        return self.session
+
+    def _get_container_client(self):
+        """Return the blob container client of this session, shared by all uploads."""
+        if self._container_client is None:
+            transport = AioHttpTransport(session=self._get_session(), session_owner=False)
+            self._container_client = ContainerClient.from_container_url(
+                self.container_location, transport=transport)
+        return self._container_client
+
+    async def _reset_container_client(self):
+        if self._container_client is not None:
+            await self._container_client.close()
+            self._container_client = None
+
+    async def close(self):
+        """Release the pooled connections held by this session."""
+        await self._reset_container_client()
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+        # SQLite writes block, so they run in the loop's default executor
+        loop = asyncio.get_running_loop()
+        try:
+            if self._owns_history:
+                await loop.run_in_executor(None, self.history.close)
+            else:
+                await loop.run_in_executor(None, self.history.flush)
+        except sqlite3.Error as e:
+            print(f"Warning: Could not write to upload history: {e}")
+
+    def getHeaders(self):
+        return {
+            'Api-Key': self.workspace_key,
+            'Ocp-Apim-Subscription-Key': self.tenant_key
+        }
+
+    async def create_workspace_container(self):
+        timestamp = f'{datetime.now():%Y%m%d %H%M%S}'
+        title = f'{timestamp} {self.workspace_name}'
+        url = f"{self.BASE_URL}/api/workspace/{self.workspace_name}/files/containers"
+
+        async with self._get_session().post(url, headers=self.getHeaders(),
+                                            params={'title': title}) as response:
+            response.raise_for_status()
+            location = response.headers['Location']
+        await self._reset_container_client()
+        self.container_location = location
+        self.uploaded_files = []
+
+    async def commit_workspace_container(self):
+        container_identifier = self.container_location.rsplit('/', 1)[-1]
+        url = (f"{self.BASE_URL}/api/workspace/{self.workspace_name}"
+               f"/files/containers/{container_identifier}")
+
+        async with self._get_session().patch(url, headers=self.getHeaders()) as response:
+            response.raise_for_status()
+            return response.status
+
+    async def file2(self, local_file_path):
+        """Upload one file and return a dict describing it, with the keys of ``Upload.file2``.
+
+        The outcome is recorded in the upload history, also when the upload fails.
+        """
+        file_name = os.path.basename(local_file_path)
+        started_at, started = datetime.now(), time.monotonic()
+        try:
+            info = await self._upload_file(local_file_path, file_name)
+        except Exception as e:
+            await self._record(local_file_path, file_name, started_at, time.monotonic() - started,
+                               status="failed", error=str(e))
+            raise
+        await self._record(local_file_path, file_name, started_at, time.monotonic() - started,
+                           size=info["size"], sha256=info["sha256"], status=info["status"])
+        return info
+
+    async def _upload_file(self, local_file_path, file_name):
+        if not os.path.exists(local_file_path):
+            raise FileNotFoundError(f"File not found: {local_file_path}")
+
+        file_size = os.path.getsize(local_file_path)
+        container_client = self._get_container_client()
+        if file_size >= LARGE_FILE_THRESHOLD:
+            sha256 = await self._upload_blocks(container_client.get_blob_client(file_name),
+                                               local_file_path, file_size)
+        else:
+            data, sha256 = await asyncio.get_running_loop().run_in_executor(
+                None, _read_file, local_file_path)
+            await container_client.upload_blob(file_name, data, overwrite=True,
+                                               metadata={SHA256_METADATA_KEY: sha256})
+        self.uploaded_files.append(file_name)
+        return {"blob_name": file_name, "size": file_size, "sha256": sha256,
+                "duplicate_of": None, "status": "uploaded", "encoding": None}
+
+    async def _record(self, local_file_path, blob_name, started_at, duration, size=None,
+                      sha256=None, status="uploaded", error=None):
+        """Record the outcome of one file in the upload history; a failing history only warns."""
+        try:
+            # A record may flush a batch to SQLite, which must not block the loop
+            await asyncio.get_running_loop().run_in_executor(None, functools.partial(
+                self.history.record, self.session_id, self.workspace_name,
+                urlparse(self.container_location).path.rsplit('/', 1)[-1],
+                os.path.abspath(local_file_path), blob_name, size, sha256, started_at,
+                duration, status, error))
+        except Exception as e:
+            print(f"Warning: Could not write to upload history: {e}")
+
+    async def _upload_blocks(self, blob_client, local_file_path, file_size):
+        """Stage the blocks of a large file concurrently, then commit the block list.
+
+        Reads and hashing run in the loop's default executor so the loop never
+        blocks on them; at most ``concurrency`` blocks are in flight at a time.
+        Returns the SHA-256 of the content.
+        """
+        block_size = self.block_size or auto_block_size(file_size)
+        check_block_size(file_size, block_size)
+        concurrency = self.max_block_concurrency or auto_block_concurrency(file_size)
+        loop = asyncio.get_running_loop()
+        block_ids = []
+        pending = set()
+        digest = hashlib.sha256()
+        with open(local_file_path, "rb") as file_to_upload:
+            try:
+                while True:
+                    data = await loop.run_in_executor(None, _read_block, file_to_upload,
+                                                      block_size, digest)
+                    if not data:
+                        break
+                    block_id = make_block_id(len(block_ids))
+                    block_ids.append(block_id)
+                    pending.add(asyncio.ensure_future(
+                        blob_client.stage_block(block_id, data, length=len(data))))
+                    if len(pending) >= concurrency:
+                        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                        for task in done:
+                            task.result()
+                if pending:
+                    await asyncio.gather(*pending)
+            except BaseException:
+                for task in pending:
+                    task.cancel()
+                raise
+        sha256 = digest.hexdigest()
+        await blob_client.commit_block_list([BlobBlock(block_id=block_id) for block_id in block_ids],
+                                            metadata={SHA256_METADATA_KEY: sha256})
+        return sha256
+
+    async def upload_many(self, paths, max_concurrency=None, callback=None):
+        """Upload several files concurrently on the running event loop.
+
+        Returns one result dict per path, in the order the paths were given,
+        with the same keys as ``Upload.upload_many``: ``path``, ``success``
+        and ``error`` plus those returned by ``file2``; failed files have the
+        status ``"failed"``. ``callback`` is called with each result as soon
+        as that file finishes.
+        """
+        paths = list(paths)
+        semaphore = asyncio.Semaphore(max_concurrency or self.max_concurrency)
+
+        async def upload_one(path):
+            async with semaphore:
+                try:
+                    info = await self.file2(path)
+                    error = None
+                except Exception as e:
+                    info, error = None, e
+            result = {
+                "path": path,
+                "blob_name": os.path.basename(path),
+                "success": error is None,
+                "error": None if error is None else str(error),
+                "status": "failed",
+            }
+            if info is not None:
+                result.update(info)
+            if callback is not None:
+                callback(result)
+            return result
+
+        return list(await asyncio.gather(*(upload_one(path) for path in paths)))
+
+    def get_uploaded_files(self):
+        """Return the list of uploaded files."""
+        return list(self.uploaded_files)
+
+
+def _read_file(path):
+    """Return the content of a file and its SHA-256."""
+    with open(path, "rb") as file_to_read:
+        data = file_to_read.read()
+    return data, hashlib.sha256(data).hexdigest()
+
+
+def _read_block(file_to_read, size, digest):
+    data = file_to_read.read(size)
+    digest.update(data)
+    return data
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Bandwidth limiting for myDRE uploads.
+
+A ``BandwidthLimiter`` holds one token bucket for a whole upload session:
+every request body is sent in small chunks, and each chunk waits for
+tokens, so all parallel transfers together stay at the configured rate
+without bursts. An optional schedule gives different rates for different
+times of day, e.g. a low cap during office hours and none at night::
+
+    BandwidthLimiter("2M", schedule="07:00-19:00=2M,19:00-07:00=off")
+"""
+
+import io
+import threading
+import time
+from datetime import datetime
+
+SEND_CHUNK_SIZE = 16 * 1024
+# The bucket holds at most this much time's worth of tokens
+MAX_BURST_SECONDS = 0.1
+_SUFFIXES = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+_UNLIMITED = ("", "off", "none", "unlimited", "0")
+
+
+def parse_rate(text):
+    """Parse a rate in bytes per second such as ``'500K'`` or ``'10M'``; None means unlimited."""
+    if text is None or str(text).strip().lower() in _UNLIMITED:
+        return None
+    if isinstance(text, (int, float)):
+        return float(text)
+    text = text.strip().upper()
+    for suffix in ("/S", "B"):
+        if text.endswith(suffix):
+            text = text[:-len(suffix)]
+    if text and text[-1] in _SUFFIXES:
+        return float(text[:-1]) * _SUFFIXES[text[-1]]
+    return float(text)
+
+
+def parse_schedule(text):
+    """Parse ``'HH:MM-HH:MM=RATE,...'`` into ``[(start_minute, end_minute, rate)]``.
+
+    A range may wrap around midnight, e.g. ``19:00-07:00``.
+    """
+    rules = []
+    for rule in filter(None, (part.strip() for part in text.split(","))):
+        try:
+            times, rate = rule.split("=", 1)
+            start, end = (_minute_of_day(part) for part in times.split("-"))
+        except ValueError:
+            raise ValueError(f"invalid schedule entry {rule!r}, expected HH:MM-HH:MM=RATE")
+        rules.append((start, end, parse_rate(rate)))
+    return rules
+
+
+def _minute_of_day(text):
+    hours, minutes = (int(part) for part in text.strip().split(":"))
+    if not (0 <= hours <= 24 and 0 <= minutes < 60):
+        raise ValueError(text)
+    return hours * 60 + minutes
+
+
+class TokenBucket:
+    """Token bucket that makes callers wait so that the long-run rate is ``rate`` bytes/s.
+
+    Callers may take more than the bucket holds; they then wait for the
+    debt to be paid off, so large and small chunks are treated alike.
+    """
+
+    def __init__(self, rate):
+        self._lock = threading.Lock()
+        self._tokens = 0.0
+        self._updated = time.monotonic()
+        self.set_rate(rate)
+
+    def set_rate(self, rate):
+        with self._lock:
+            self.rate = rate
+            self.burst = max(rate * MAX_BURST_SECONDS, SEND_CHUNK_SIZE)
+            self._tokens = min(self._tokens, self.burst)
+
+    def consume(self, count):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= count
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait:
+            time.sleep(wait)
+
+
+class BandwidthLimiter:
+    """Session-wide upload rate limit, optionally varying with the time of day.
+
+    ``rate`` applies whenever no ``schedule`` entry matches; either may be
+    None (or ``"off"``) for no limit.
+    """
+
+    def __init__(self, rate=None, schedule=None):
+        self.rate = parse_rate(rate)
+        self.schedule = parse_schedule(schedule) if isinstance(schedule, str) else (schedule or [])
+        self._bucket = None
+        self._checked_at = None
+        self._lock = threading.Lock()
+
+    def current_rate(self, now=None):
+        """Return the rate in bytes/s that applies at ``now`` (default: the current time), or None."""
+        now = now or datetime.now()
+        minute = now.hour * 60 + now.minute
+        for start, end, rate in self.schedule:
+            if start <= minute < end or (end < start and (minute >= start or minute < end)):
+                return rate
+        return self.rate
+
+    def _get_bucket(self):
+        """Return the token bucket for the current rate, or None while unlimited."""
+        now = time.monotonic()
+        with self._lock:
+            # The schedule is looked at once a second at most
+            if self._checked_at is None or now - self._checked_at >= 1.0:
+                self._checked_at = now
+                rate = self.current_rate()
+                if rate is None:
+                    self._bucket = None
+                elif self._bucket is None:
+                    self._bucket = TokenBucket(rate)
+                elif self._bucket.rate != rate:
+                    self._bucket.set_rate(rate)
+            return self._bucket
+
+    def throttle(self, count):
+        """Wait until ``count`` more bytes may be sent."""
+        bucket = self._get_bucket()
+        if bucket is not None:
+            bucket.consume(count)
+
+    def wrap(self, body):
+        """Return a request body that is read at the limited rate."""
+        if body is None:
+            return None
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        if isinstance(body, (bytes, bytearray, memoryview)):
+            body = io.BytesIO(body)
+        return ThrottledBody(body, self)
+
+
+class ThrottledBody:
+    """File-like request body that hands out at most ``SEND_CHUNK_SIZE`` bytes per read."""
+
+    def __init__(self, source, limiter):
+        self._source = source
+        self._limiter = limiter
+
+    def read(self, size=-1):
+        if size is None or size < 0 or size > SEND_CHUNK_SIZE:
+            size = SEND_CHUNK_SIZE
+        data = self._source.read(size)
+        if data:
+            self._limiter.throttle(len(data))
+        return data
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Bundling of small files into tar blobs for myDRE uploads.
+
+Uploading tens of thousands of tiny files one blob each is dominated by
+request overhead. In bundling mode small files are packed, in upload order,
+into tar streams of a target size. The tar is written straight into staged
+blocks of the bundle blob, so no archive is written to disk. A JSON index
+listing the members and their SHA-256 is uploaded next to each bundle; the
+hashes are taken from the same read that fills the tar.
+"""
+
+import hashlib
+import json
+import os
+import tarfile
+
+DEFAULT_BUNDLE_THRESHOLD = 1024 * 1024
+DEFAULT_BUNDLE_SIZE = 64 * 1024 * 1024
+BUNDLE_BLOCK_SIZE = 4 * 1024 * 1024
+INDEX_SUFFIX = ".index.json"
+
+
+class HashingReader:
+    """Read-only file wrapper that keeps the SHA-256 of what was read."""
+
+    def __init__(self, source):
+        self._source = source
+        self.digest = hashlib.sha256()
+
+    def read(self, size=-1):
+        data = self._source.read(size)
+        self.digest.update(data)
+        return data
+
+
+class BlockStager:
+    """Write-only file object that stages everything written to it as blocks of one blob.
+
+    ``make_block_id`` turns a block index into a block id. Blocks are sent
+    with a Content-MD5, and ``digest`` is the SHA-256 of everything written.
+    """
+
+    def __init__(self, blob_client, make_block_id, block_size=BUNDLE_BLOCK_SIZE):
+        self.blob_client = blob_client
+        self.make_block_id = make_block_id
+        self.block_size = block_size
+        self.block_ids = []
+        self.digest = hashlib.sha256()
+        self._buffer = bytearray()
+
+    def write(self, data):
+        self.digest.update(data)
+        self._buffer += data
+        while len(self._buffer) >= self.block_size:
+            self._stage(bytes(self._buffer[:self.block_size]))
+            del self._buffer[:self.block_size]
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def _stage(self, data):
+        block_id = self.make_block_id(len(self.block_ids))
+        self.blob_client.stage_block(block_id, data, length=len(data), validate_content=True)
+        self.block_ids.append(block_id)
+
+    def commit(self, **kwargs):
+        """Stage what is left in the buffer and commit the blob."""
+        if self._buffer:
+            self._stage(bytes(self._buffer))
+            self._buffer = bytearray()
+        self.blob_client.commit_block_list(self.block_ids, **kwargs)
+
+
+def write_bundle(stager, members):
+    """Write files into a tar stream on ``stager``; returns the index entries.
+
+    ``members`` is a list of ``(path, arcname)``. Directory structure is kept
+    through the arcnames, which use ``/`` as separator.
+    """
+    entries = []
+    with tarfile.open(fileobj=stager, mode="w|", format=tarfile.PAX_FORMAT) as tar:
+        for path, arcname in members:
+            with open(path, "rb") as member_file:
+                # From the open file, so a symlink is stored as the file it points to
+                tarinfo = tar.gettarinfo(arcname=arcname, fileobj=member_file)
+                # Owner names of the uploading machine mean nothing in the workspace
+                tarinfo.uid = tarinfo.gid = 0
+                tarinfo.uname = tarinfo.gname = ""
+                offset = tar.offset
+                reader = HashingReader(member_file)
+                tar.addfile(tarinfo, reader)
+            entries.append({
+                "name": arcname,
+                "size": tarinfo.size,
+                "mtime": tarinfo.mtime,
+                "sha256": reader.digest.hexdigest(),
+                "header_offset": offset,
+            })
+    return entries
+
+
+def bundle_index(bundle_name, entries):
+    """Return the JSON index uploaded next to a bundle."""
+    return json.dumps({
+        "bundle": bundle_name,
+        "format": "tar",
+        "file_count": len(entries),
+        "total_size": sum(entry["size"] for entry in entries),
+        "files": entries,
+    }, indent=2).encode("utf-8")
+
+
+def small_file_size(path, threshold):
+    """Return the size of a regular file below ``threshold`` bytes, otherwise None."""
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        return None
+    return size if size < threshold and os.path.isfile(path) else None
@@ -0,0 +1,391 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Command line interface for myDRE Uploader.
+
+Uploads files and whole directory trees without a GUI, for scheduled jobs on
+headless machines. The PIN is read from the ``MYDRE_PIN`` environment
+variable, or from standard input when that variable is not set, unless
+every config is unlocked in the credential agent (``mydre-agent``)::
+
+    MYDRE_PIN=... mydre-upload --config keys.json /data/study1 "/data/extra/*.csv"
+
+Exits with 0 when every file was uploaded, 1 when any file failed and 2 on
+usage or configuration errors. This module does not import tkinter.
+"""
+
+import argparse
+import getpass
+import glob
+import os
+import sys
+import time
+
+# Handle both package import and direct script execution
+try:
+    from .uploader import (DEFAULT_MAX_WORKERS, MAX_BLOCK_SIZE, KeyCache, MiB, Upload, decrypt_config,
+                           load_config)
+    from .agent import get_config
+    from .journal import default_journal_path
+    from .dedup import DedupIndex
+    from .bundler import DEFAULT_BUNDLE_THRESHOLD
+    from .metrics import UploadMetrics
+    from .concurrency import AIMDController
+    from .bandwidth import BandwidthLimiter, parse_rate, parse_schedule
+    from .fanout import FanOutUpload
+    from .scan import PreflightScanner, recent_throughput
+    from .progress import format_bytes, format_duration
+except ImportError:
+    from uploader import (DEFAULT_MAX_WORKERS, MAX_BLOCK_SIZE, KeyCache, MiB, Upload, decrypt_config,
+                          load_config)
+    from agent import get_config
+    from journal import default_journal_path
+    from dedup import DedupIndex
+    from bundler import DEFAULT_BUNDLE_THRESHOLD
+    from metrics import UploadMetrics
+    from concurrency import AIMDController
+    from bandwidth import BandwidthLimiter, parse_rate, parse_schedule
+    from fanout import FanOutUpload
+    from scan import PreflightScanner, recent_throughput
+    from progress import format_bytes, format_duration
+
+PIN_ENV_VAR = "MYDRE_PIN"
+# Collisions, unreadable files and largest files listed by the pre-flight scan
+SCAN_LIST_LIMIT = 10
+
+
+def iter_files(patterns, keep_paths=False):
+    """Yield ``(path, blob_name)`` for every file named by the given paths, globs or directories.
+
+    Directories are walked recursively. Blob names are the file's base name,
+    or with ``keep_paths`` its path relative to the parent of the directory
+    or glob match it was found under. A pattern that matches nothing is
+    yielded as is, so it is reported as a failed file.
+    """
+    for pattern in patterns:
+        if any(char in pattern for char in "*?["):
+            matches = sorted(glob.glob(pattern, recursive=True)) or [pattern]
+        else:
+            matches = [pattern]
+        for match in matches:
+            if not os.path.isdir(match):
+                yield match, os.path.basename(match)
+                continue
+            root = os.path.dirname(os.path.abspath(match))
+            for dirpath, dirnames, filenames in os.walk(match):
+                dirnames.sort()
+                for filename in sorted(filenames):
+                    path = os.path.join(dirpath, filename)
+                    if keep_paths:
+                        blob_name = os.path.relpath(os.path.abspath(path), root).replace(os.sep, "/")
+                    else:
+                        blob_name = filename
+                    yield path, blob_name
+
+
+def read_pin():
+    """Return the PIN from the environment, a terminal prompt or the first line of stdin."""
+    pin = os.environ.get(PIN_ENV_VAR)
+    if pin:
+        return pin
+    if sys.stdin.isatty():
+        return getpass.getpass("PIN: ")
+    return sys.stdin.readline().rstrip("\r\n")
+
+
+def stream_limits(text):
+    """Parse ``MIN:MAX`` for ``--adaptive``."""
+    try:
+        low, high = (int(part) for part in text.split(":"))
+    except ValueError:
+        raise argparse.ArgumentTypeError("expected MIN:MAX, e.g. 2:64")
+    if not 1 <= low <= high:
+        raise argparse.ArgumentTypeError("expected 1 <= MIN <= MAX")
+    return low, high
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="mydre-upload",
+        description="Upload files and directories to a myDRE workspace.",
+        epilog=f"The PIN is read from ${PIN_ENV_VAR}, or from stdin when it is not set; configs "
+               "unlocked with mydre-agent need no PIN.")
+    parser.add_argument("paths", nargs="+", metavar="PATH",
+                        help="file, directory (uploaded recursively) or glob pattern")
+    parser.add_argument("-c", "--config", required=True, action="append",
+                        help="encrypted configuration file made with mydre-config-encrypter; "
+                             "repeat to upload the same files to several workspaces, reading "
+                             "each file once (all configs must share the PIN)")
+    parser.add_argument("-j", "--workers", type=int, default=DEFAULT_MAX_WORKERS,
+                        help="number of files uploaded in parallel (default: %(default)s)")
+    parser.add_argument("--adaptive", type=stream_limits, nargs="?", const=(2, 64), metavar="MIN:MAX",
+                        help="adapt the number of parallel requests to throttling and latency, "
+                             "between MIN and MAX (default: 2:64)")
+    parser.add_argument("--limit-rate", type=parse_rate, metavar="RATE",
+                        help="cap the total upload rate, in bytes per second with an optional "
+                             "K/M/G suffix, e.g. 5M")
+    parser.add_argument("--rate-schedule", type=parse_schedule, metavar="SCHEDULE",
+                        help="rates by time of day, e.g. '07:00-19:00=2M,19:00-07:00=off'; "
+                             "--limit-rate applies outside the listed times")
+    parser.add_argument("--block-size", type=int, metavar="MIB",
+                        help="block size in MiB for large files (default: based on file size)")
+    parser.add_argument("--compress", action="store_true",
+                        help="gzip files that compress well while uploading (stored as NAME.gz)")
+    parser.add_argument("--bundle-small", type=int, nargs="?", metavar="KIB",
+                        const=DEFAULT_BUNDLE_THRESHOLD // 1024,
+                        help="pack files smaller than KIB KiB into tar bundles with a JSON index "
+                             "(default: %(const)s KiB)")
+    parser.add_argument("--keep-paths", action="store_true",
+                        help="keep directory structure in blob names instead of base names only")
+    parser.add_argument("--duplicates", choices=("skip", "flag", "upload"),
+                        help="what to do with files whose content was uploaded to this workspace "
+                             "before (default: skip)")
+    parser.add_argument("--resume", action="store_true",
+                        help="continue the last unfinished upload to this workspace")
+    parser.add_argument("--commit-partial", action="store_true",
+                        help="commit the container even if some files failed")
+    parser.add_argument("--manifest", action="store_true",
+                        help="add a list of the uploaded files with sizes and SHA-256, as "
+                             "<user>.txt and <user>.json, to the container on commit")
+    parser.add_argument("--metrics-json", metavar="FILE",
+                        help="write timings per phase and per file of this session to FILE")
+    parser.add_argument("--prometheus-textfile", metavar="FILE",
+                        help="write session metrics for the node exporter textfile collector "
+                             "(e.g. /var/lib/node_exporter/mydre_upload.prom)")
+    scan = parser.add_mutually_exclusive_group()
+    scan.add_argument("--scan-only", action="store_true",
+                      help="only scan the inputs and report totals, ETA, name collisions and "
+                           "unreadable files; no PIN needed")
+    scan.add_argument("--no-scan", action="store_true",
+                      help="start uploading while the inputs are still being walked, without the "
+                           "pre-flight scan")
+    parser.add_argument("--no-agent", action="store_true",
+                        help="always ask for the PIN, even for configs unlocked in mydre-agent")
+    parser.add_argument("-q", "--quiet", action="store_true",
+                        help="only print the summary and errors")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.block_size is not None and not 0 < args.block_size <= MAX_BLOCK_SIZE // MiB:
+        print(f"Error: --block-size must be between 1 and {MAX_BLOCK_SIZE // MiB} MiB", file=sys.stderr)
+        return 2
+
+    try:
+        keys_data = [load_config(path) for path in args.config]
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Error: failed to load config file: {e}", file=sys.stderr)
+        return 2
+    if len(keys_data) > 1:
+        unsupported = [option for option, used in (("--resume", args.resume), ("--compress", args.compress),
+                                                   ("--bundle-small", args.bundle_small),
+                                                   ("--adaptive", args.adaptive),
+                                                   ("--duplicates", args.duplicates)) if used]
+        if unsupported:
+            print(f"Error: {', '.join(unsupported)} cannot be used with several configs", file=sys.stderr)
+            return 2
+    if args.no_scan:
+        entries = iter_files(args.paths, keep_paths=args.keep_paths)
+    else:
+        entries = preflight(args, [data["WORKSPACE_NAME"] for data in keys_data])
+        if args.scan_only:
+            return 0
+    # Per-file records are only kept when they are written out
+    metrics = UploadMetrics(keep_files=bool(args.metrics_json))
+    configs = []
+    with metrics.phase("decrypt"):
+        # Configs unlocked in the credential agent need neither the PIN nor a key derivation
+        if not args.no_agent:
+            configs = [get_config(data) for data in keys_data]
+    if not configs or None in configs:
+        pin = read_pin()
+        key_cache = KeyCache()
+        configs = []
+        for path, data in zip(args.config, keys_data):
+            try:
+                with metrics.phase("decrypt"):
+                    configs.append(decrypt_config(data, pin, key_cache))
+            except Exception:
+                print(f"Error: could not decrypt {path}, probably wrong PIN", file=sys.stderr)
+                return 2
+        key_cache.clear()
+    if len(configs) > 1:
+        return run_fanout(configs, args, metrics, entries)
+    config = configs[0]
+
+    ws_name = config["ws_name"]
+    block_size = args.block_size * MiB if args.block_size else None
+    totals = {"files": 0, "bytes": 0, "skipped": 0, "failed": 0}
+
+    def report(result):
+        if result["status"] == "skipped":
+            totals["skipped"] += 1
+            if not args.quiet:
+                print(f"skip    {result['path']} (uploaded before on "
+                      f"{result['duplicate_of']['uploaded_at']})", file=sys.stderr)
+        elif result["success"]:
+            totals["files"] += 1
+            totals["bytes"] += result["size"]
+            if result["duplicate_of"] is not None:
+                print(f"dup     {result['path']} -> {result['blob_name']} (uploaded before as "
+                      f"{result['duplicate_of']['blob_name']} on "
+                      f"{result['duplicate_of']['uploaded_at']})", file=sys.stderr)
+            elif not args.quiet:
+                target = result["blob_name"]
+                if result.get("bundle"):
+                    target = f"{result['bundle']}:{target}"
+                print(f"ok      {result['path']} -> {target}", file=sys.stderr)
+        else:
+            totals["failed"] += 1
+            print(f"FAILED  {result['path']}: {result['error']}", file=sys.stderr)
+
+    dedup_index = DedupIndex()
+    try:
+        with Upload(**config, max_workers=args.workers, block_size=block_size,
+                    journal_path=default_journal_path(ws_name),
+                    dedup_index=dedup_index, dedup_policy=args.duplicates or "skip",
+                    compression="auto" if args.compress else None,
+                    bundle_threshold=args.bundle_small * 1024 if args.bundle_small else None,
+                    metrics=metrics, manifest=args.manifest,
+                    concurrency_controller=AIMDController(*args.adaptive) if args.adaptive else None,
+                    bandwidth_limiter=BandwidthLimiter(args.limit_rate, args.rate_schedule)
+                    if args.limit_rate or args.rate_schedule else None) as uploader:
+            return run_session(uploader, args, totals, report, entries)
+    finally:
+        dedup_index.close()
+        write_metrics(metrics, args, ws_name)
+
+
+def preflight(args, ws_names):
+    """Scan the inputs, print what is about to be uploaded and return the upload entries."""
+    started = time.monotonic()
+    report, entries = PreflightScanner(keep_paths=args.keep_paths).scan(args.paths, keep_entries=True)
+    print(f"Found {report.files} file(s), {format_bytes(report.bytes)} in {report.directories} "
+          f"directories ({time.monotonic() - started:.1f}s)", file=sys.stderr)
+    throughput = recent_throughput(ws_names)
+    eta = report.eta(throughput)
+    if eta is not None:
+        print(f"Estimated upload time {format_duration(eta)} at {format_bytes(throughput)}/s, "
+              "the rate of recent uploads", file=sys.stderr)
+    if not args.quiet and report.files:
+        print("Largest files:", file=sys.stderr)
+        for size, path in report.largest_files()[:SCAN_LIST_LIMIT]:
+            print(f"  {format_bytes(size):>10}  {path}", file=sys.stderr)
+
+    def warn(items, heading):
+        print(f"Warning: {len(items)} {heading}", file=sys.stderr)
+        for line in items[:SCAN_LIST_LIMIT]:
+            print(f"  {line}", file=sys.stderr)
+        if len(items) > SCAN_LIST_LIMIT:
+            print(f"  ... and {len(items) - SCAN_LIST_LIMIT} more", file=sys.stderr)
+
+    if report.collisions:
+        warn([f"{name}: {', '.join(paths)}" for name, paths in sorted(report.collisions.items())],
+             "blob name(s) would be used by more than one file, and later uploads overwrite "
+             "earlier ones" + ("" if args.keep_paths else "; --keep-paths avoids this"))
+    if report.unreadable:
+        warn([f"{path}: {error}" for path, error in sorted(report.unreadable)],
+             "path(s) cannot be read and will fail")
+    return entries
+
+
+def run_fanout(configs, args, metrics, entries):
+    """Upload the same files to the workspace of every config and commit each; returns the exit code."""
+    ws_names = ",".join(config["ws_name"] for config in configs)
+    totals = {"files": 0, "bytes": 0, "failed": 0}
+
+    def report(result):
+        if result["success"]:
+            totals["files"] += 1
+            totals["bytes"] += result["size"]
+            if not args.quiet:
+                print(f"ok      {result['path']} -> {result['blob_name']}", file=sys.stderr)
+        else:
+            totals["failed"] += 1
+            print(f"FAILED  {result['path']}: {result['error']}", file=sys.stderr)
+
+    try:
+        with FanOutUpload(configs, max_workers=args.workers,
+                          block_size=args.block_size * MiB if args.block_size else None,
+                          metrics=metrics, manifest=args.manifest,
+                          bandwidth_limiter=BandwidthLimiter(args.limit_rate, args.rate_schedule)
+                          if args.limit_rate or args.rate_schedule else None) as fanout:
+            if not fanout.create_containers():
+                for workspace_report in fanout.reports:
+                    print(f"Error: {workspace_report['workspace']}: {workspace_report['error']}",
+                          file=sys.stderr)
+                return 1
+            started = time.monotonic()
+            fanout.upload_many(entries, callback=report)
+            elapsed = time.monotonic() - started
+            rate = totals["bytes"] / MiB / elapsed if elapsed > 0 else 0.0
+            print(f"Read {totals['files']} file(s), {totals['bytes'] / MiB:.1f} MiB once for "
+                  f"{len(configs)} workspaces in {elapsed:.1f}s ({rate:.1f} MiB/s); "
+                  f"{totals['failed']} failed in at least one workspace", file=sys.stderr)
+            workspace_reports = fanout.commit(commit_partial=args.commit_partial)
+    finally:
+        write_metrics(metrics, args, ws_names)
+
+    exit_code = 0
+    for workspace_report in workspace_reports:
+        status = "committed" if workspace_report["committed"] else workspace_report["error"]
+        print(f"{workspace_report['workspace']}: {workspace_report['uploaded']} file(s), "
+              f"{workspace_report['bytes'] / MiB:.1f} MiB, {len(workspace_report['failed'])} failed; "
+              f"{status}", file=sys.stderr)
+        if workspace_report["failed"] or not workspace_report["committed"]:
+            exit_code = 1
+    return exit_code
+
+
+def write_metrics(metrics, args, ws_name):
+    """Write the metrics files asked for on the command line; failures only warn."""
+    metrics.finish()
+    try:
+        if args.metrics_json:
+            metrics.write_json(args.metrics_json)
+        if args.prometheus_textfile:
+            metrics.write_prometheus(args.prometheus_textfile, {"workspace": ws_name})
+    except OSError as e:
+        print(f"Warning: could not write metrics: {e}", file=sys.stderr)
+
+
+def run_session(uploader, args, totals, report, entries):
+    """Create a container, upload everything and commit; returns the exit code."""
+    ws_name = uploader.workspace_name
+    started = time.monotonic()
+    try:
+        uploader.create_workspace_container(resume=args.resume)
+    except Exception as e:
+        print(f"Error: could not create an upload container in {ws_name}: {e}", file=sys.stderr)
+        return 1
+    uploader.upload_many(entries, callback=report)
+
+    elapsed = time.monotonic() - started
+    rate = totals["bytes"] / MiB / elapsed if elapsed > 0 else 0.0
+    if uploader.concurrency_controller is not None and not args.quiet:
+        state = uploader.concurrency_controller.snapshot()
+        print(f"Adaptive concurrency ended at {state['limit']} parallel requests "
+              f"({state['throttled']} throttled, {state['decreases']} decreases)", file=sys.stderr)
+    print(f"Uploaded {totals['files']} file(s), {totals['bytes'] / MiB:.1f} MiB "
+          f"in {elapsed:.1f}s ({rate:.1f} MiB/s); {totals['skipped']} skipped as already uploaded, "
+          f"{totals['failed']} failed", file=sys.stderr)
+
+    if totals["failed"] and not args.commit_partial:
+        print("Not committed. Fix the failures and rerun with --resume to upload the rest, "
+              "or use --commit-partial.", file=sys.stderr)
+        return 1
+    if not uploader.get_uploaded_files():
+        uploader.discard_workspace_container()
+        print(f"Nothing was uploaded, so the container in {ws_name} was not committed", file=sys.stderr)
+        return 1 if totals["failed"] else 0
+    try:
+        uploader.commit_workspace_container()
+    except Exception as e:
+        print(f"Error: could not commit the upload to {ws_name}: {e}", file=sys.stderr)
+        return 1
+    print(f"Committed upload to {ws_name}", file=sys.stderr)
+    return 1 if totals["failed"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+On-the-fly gzip compression for myDRE uploads.
+
+A file is compressed only if samples of it shrink well, so data that is
+already compressed (images, archives) is sent as is. Compression streams
+the file in chunks: each chunk becomes an independent gzip member,
+compressed on a thread pool (zlib releases the GIL, so this uses several
+cores) and emitted in order. Concatenated gzip members form a valid gzip
+file, so ``gunzip`` restores the original bytes exactly; no temporary copy
+is written.
+"""
+
+import gzip
+import os
+import zlib
+from collections import deque
+from urllib.parse import quote
+
+COMPRESSION_CHUNK_SIZE = 1024 * 1024
+COMPRESSION_LEVEL = 6
+SAMPLE_SIZE = 256 * 1024
+# Compress when samples shrink to at most this fraction of their size
+COMPRESSIBLE_RATIO = 0.8
+# Files smaller than this are not worth the extra work
+MIN_COMPRESS_SIZE = 4096
+GZIP_ENCODING = "gzip"
+GZIP_SUFFIX = ".gz"
+
+
+def should_compress(path, size):
+    """Return True if samples from the start, middle and end of a file compress well."""
+    if size < MIN_COMPRESS_SIZE:
+        return False
+    offsets = sorted({0, max(size // 2 - SAMPLE_SIZE // 2, 0), max(size - SAMPLE_SIZE, 0)})
+    raw = compressed = 0
+    with open(path, "rb") as file_to_sample:
+        for offset in offsets:
+            file_to_sample.seek(offset)
+            sample = file_to_sample.read(SAMPLE_SIZE)
+            raw += len(sample)
+            compressed += len(zlib.compress(sample, 1))
+    return raw > 0 and compressed <= raw * COMPRESSIBLE_RATIO
+
+
+def _compress_chunk(chunk):
+    return gzip.compress(chunk, compresslevel=COMPRESSION_LEVEL, mtime=0), len(chunk)
+
+
+def iter_gzip_members(file_to_compress, executor, max_pending=8, digest=None):
+    """Yield ``(gzip_member, raw_size)`` for each chunk of an open file, in order.
+
+    Chunks are compressed in parallel on ``executor``; at most
+    ``max_pending`` chunks are read ahead of the consumer. A hashlib
+    ``digest`` is updated with the uncompressed bytes as they are read.
+    """
+    pending = deque()
+    while True:
+        chunk = file_to_compress.read(COMPRESSION_CHUNK_SIZE)
+        if digest is not None:
+            digest.update(chunk)
+        if chunk:
+            pending.append(executor.submit(_compress_chunk, chunk))
+        if pending and (not chunk or len(pending) >= max_pending):
+            yield pending.popleft().result()
+        if not chunk and not pending:
+            return
+
+
+def iter_compressed_blocks(file_to_compress, executor, block_size, max_pending=8, digest=None):
+    """Yield ``(block, raw_size)``: compressed output regrouped into blocks of at least ``block_size``.
+
+    ``raw_size`` is the number of uncompressed bytes the block stands for.
+    The last block may be smaller. ``digest`` is passed to ``iter_gzip_members``.
+    """
+    buffer = []
+    buffered = raw = 0
+    for member, raw_size in iter_gzip_members(file_to_compress, executor, max_pending, digest):
+        buffer.append(member)
+        buffered += len(member)
+        raw += raw_size
+        if buffered >= block_size:
+            yield b"".join(buffer), raw
+            buffer, buffered, raw = [], 0, 0
+    if buffer:
+        yield b"".join(buffer), raw
+
+
+def compression_metadata(original_name, original_size):
+    """Blob metadata that records how to get the original file back.
+
+    Metadata travels in HTTP headers, so the name is percent-encoded.
+    """
+    return {
+        "mydre_encoding": GZIP_ENCODING,
+        "mydre_original_name": quote(original_name),
+        "mydre_original_size": str(original_size),
+    }
+
+
+def default_compression_workers():
+    return max(1, min(os.cpu_count() or 1, 8))
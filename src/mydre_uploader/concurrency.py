@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Adaptive concurrency for myDRE uploads.
+
+``AIMDController`` decides how many HTTP requests of an upload session may
+be in flight, the way TCP congestion control sizes its window: the limit
+grows by about one request per round of successful requests (additive
+increase) and is cut when the service throttles (429, 503 ServerBusy), a
+request fails to connect or latency climbs well above the best seen
+(multiplicative decrease). ``ControlledAdapter`` applies the limit, and
+optionally a bandwidth limit, to every request sent through a ``requests``
+session, so it covers file uploads and blocks of large files alike.
+"""
+
+import threading
+import time
+
+from requests.adapters import HTTPAdapter
+from requests.exceptions import ConnectionError as RequestsConnectionError, Timeout
+
+THROTTLE_STATUS_CODES = (429, 503)
+# x-ms-error-code values of 500 responses that also mean "slow down"
+THROTTLE_ERROR_CODES = ("ServerBusy", "OperationTimedOut")
+# Latency is compared per this many bytes sent, so large blocks are not
+# mistaken for congestion
+LATENCY_UNIT = 4 * 1024 * 1024
+# Cut applied when latency, not the service, signals congestion
+LATENCY_BACKOFF = 0.8
+
+
+class AIMDController:
+    """Additive-increase/multiplicative-decrease limit on requests in flight.
+
+    The limit stays within ``min_limit`` and ``max_limit``. It drops to
+    ``decrease`` times its value on throttling, and to ``LATENCY_BACKOFF``
+    times its value when smoothed latency exceeds ``latency_factor`` times
+    the baseline. After a cut, further signals are ignored for about one
+    request latency so that requests sent at the old limit can drain.
+    Safe to use from many threads.
+    """
+
+    def __init__(self, min_limit=2, max_limit=64, initial=None, increase=1.0, decrease=0.5,
+                 latency_factor=3.0, smoothing=0.2):
+        if not 1 <= min_limit <= max_limit:
+            raise ValueError("need 1 <= min_limit <= max_limit")
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.limit = float(initial if initial is not None else min(max(min_limit, 8), max_limit))
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_factor = latency_factor
+        self.smoothing = smoothing
+        self.in_flight = 0
+        self.throttled = 0  # throttling responses and connection failures seen
+        self.decreases = 0
+        self._latency = None  # smoothed seconds per LATENCY_UNIT
+        self._base_latency = None
+        self._hold_until = 0.0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        """Wait until a request may be sent."""
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+
+    def release(self, elapsed=None, size=0, throttled=False):
+        """Report a finished request: its duration in seconds and bytes sent, or throttling."""
+        with self._condition:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if throttled:
+                self.throttled += 1
+                self._cut(now, self.decrease)
+            elif elapsed is not None:
+                self._observe_latency(elapsed / max(1.0, size / LATENCY_UNIT))
+                if self._latency > self._base_latency * self.latency_factor:
+                    self._cut(now, LATENCY_BACKOFF)
+                elif self.in_flight + 1 >= int(self.limit):
+                    # About +increase per round of `limit` successful requests; like
+                    # TCP, only grow while the current limit is actually used
+                    self.limit = min(self.max_limit, self.limit + self.increase / self.limit)
+            self._condition.notify_all()
+
+    def _observe_latency(self, sample):
+        if self._latency is None:
+            self._latency = self._base_latency = sample
+            return
+        self._latency += self.smoothing * (sample - self._latency)
+        # The baseline follows improvements at once and slowly drifts up, so a
+        # lasting change of network path does not keep the limit down forever
+        if self._latency < self._base_latency:
+            self._base_latency = self._latency
+        else:
+            self._base_latency += 0.01 * (self._latency - self._base_latency)
+
+    def _cut(self, now, factor):
+        if now < self._hold_until:
+            return
+        self.limit = max(float(self.min_limit), self.limit * factor)
+        self.decreases += 1
+        self._hold_until = now + (self._latency or 1.0)
+
+    def snapshot(self):
+        """Return the current limit and counters as a dict."""
+        with self._condition:
+            return {
+                "limit": int(self.limit),
+                "in_flight": self.in_flight,
+                "throttled": self.throttled,
+                "decreases": self.decreases,
+                "latency": self._latency,
+                "base_latency": self._base_latency,
+            }
+
+
+def is_throttled(response):
+    """Return True if a response asks the client to slow down."""
+    return (response.status_code in THROTTLE_STATUS_CODES
+            or (response.status_code == 500
+                and response.headers.get("x-ms-error-code") in THROTTLE_ERROR_CODES))
+
+
+class ControlledAdapter(HTTPAdapter):
+    """HTTP adapter that sends requests only when an ``AIMDController`` allows it.
+
+    With a ``bandwidth_limiter`` (see ``bandwidth.BandwidthLimiter``) request
+    bodies are also sent at the limited rate. Either may be None.
+    """
+
+    def __init__(self, controller=None, bandwidth_limiter=None, **kwargs):
+        self.controller = controller
+        self.bandwidth_limiter = bandwidth_limiter
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        if self.bandwidth_limiter is not None:
+            request.body = self.bandwidth_limiter.wrap(request.body)
+        if self.controller is None:
+            return super().send(request, **kwargs)
+
+        size = int(request.headers.get("Content-Length") or 0)
+        self.controller.acquire()
+        started = time.monotonic()
+        try:
+            response = super().send(request, **kwargs)
+        except (RequestsConnectionError, Timeout):
+            self.controller.release(throttled=True)
+            raise
+        except BaseException:
+            self.controller.release()
+            raise
+        if is_throttled(response):
+            self.controller.release(throttled=True)
+        else:
+            self.controller.release(time.monotonic() - started, size)
+        return response
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Encrypted configuration files of the myDRE Uploader.
+
+Loading a config, deriving the key from a PIN and decrypting the workspace
+credentials. Version 1 files encrypt each field separately with a key
+derived with a fixed salt and cost; version 2 files name their own salt and
+derivation parameters in a ``KDF`` header and hold all fields in one
+encrypted ``PAYLOAD``.
+
+This module only imports ``cryptography`` when a key is first derived or
+data decrypted, so the GUI can import it before its window is drawn; the
+upload machinery lives in ``uploader``, which re-exports these names.
+"""
+
+import base64
+import hashlib
+import hmac
+import json
+import os
+import threading
+
+REQUIRED_KEYS = [
+    "WORKSPACE_NAME",
+    "WORKSPACE_DESCRIPTION",
+    "WORKSPACE_KEY",
+    "SUBSCRIPTION_KEY",
+    "USER_NAME"
+]
+# Version 2 files keep the workspace name readable and everything else in one payload
+REQUIRED_KEYS_V2 = ["FORMAT_VERSION", "WORKSPACE_NAME", "KDF", "PAYLOAD"]
+SUPPORTED_FORMAT_VERSIONS = (1, 2)
+KDF_ALGORITHM = "pbkdf2-sha256"
+# Version 1 files all use the same salt and cost
+V1_KDF = {"algorithm": KDF_ALGORITHM, "salt": base64.b64encode(b'static_salt').decode(),
+          "iterations": 100000, "length": 32}
+# Refuse costs no encrypter would pick, so a damaged file cannot hang the tool
+MAX_KDF_ITERATIONS = 100_000_000
+
+def format_version(keys_data):
+    """Return the format version of a loaded configuration; files without one are version 1."""
+    return keys_data.get("FORMAT_VERSION", 1)
+
+def kdf_params(keys_data):
+    """Return the key derivation parameters of a loaded configuration."""
+    return keys_data["KDF"] if format_version(keys_data) >= 2 else V1_KDF
+
+def derive_key(pin, kdf=None):
+    """Derive the Fernet key for ``pin`` with the parameters ``kdf`` (default: version 1)."""
+    kdf = V1_KDF if kdf is None else kdf
+    if kdf.get("algorithm") != KDF_ALGORITHM:
+        raise ValueError(f"Unsupported key derivation: {kdf.get('algorithm')}")
+    iterations = int(kdf["iterations"])
+    if not 1 <= iterations <= MAX_KDF_ITERATIONS:
+        raise ValueError(f"Unsupported key derivation cost: {iterations} iterations")
+    # cryptography is imported on first use, so the GUI window appears without waiting for it
+    from cryptography.hazmat.primitives import hashes
+    from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+
+    kdf = PBKDF2HMAC(
+        algorithm=hashes.SHA256(),
+        length=int(kdf.get("length", 32)),
+        salt=base64.b64decode(kdf["salt"]),
+        iterations=iterations,
+    )
+    key = base64.urlsafe_b64encode(kdf.derive(pin.encode()))
+    return key
+
+def decrypt_data(encrypted_data, key):
+    from cryptography.fernet import Fernet
+
+    f = Fernet(key)
+    return f.decrypt(encrypted_data.encode()).decode()
+
+def load_config(file_path):
+    """Read an encrypted configuration file and check that all required keys are present."""
+    with open(file_path, "r") as f:
+        keys_data = json.load(f)
+    version = format_version(keys_data)
+    if version not in SUPPORTED_FORMAT_VERSIONS:
+        raise ValueError(f"Configuration format version {version} is not supported; "
+                         f"update the myDRE Uploader")
+    required = REQUIRED_KEYS_V2 if version >= 2 else REQUIRED_KEYS
+    missing_keys = [key for key in required if key not in keys_data]
+    if missing_keys:
+        raise KeyError(f"Missing required keys in configuration file: {', '.join(missing_keys)}")
+    return keys_data
+
+def decrypt_config(keys_data, pin, key_cache=None):
+    """Decrypt a loaded configuration with a PIN.
+
+    Returns the ``Upload`` constructor arguments as a dict, so a session can
+    be created with ``Upload(**decrypt_config(keys_data, pin))``. Pass a
+    ``KeyCache`` to avoid deriving the key again for a PIN seen before.
+    Reads both format versions; version 2 has a single payload to decrypt.
+    """
+    kdf = kdf_params(keys_data)
+    decryption_key = key_cache.get(pin, kdf) if key_cache is not None else derive_key(pin, kdf)
+    if format_version(keys_data) >= 2:
+        fields = json.loads(decrypt_data(keys_data["PAYLOAD"], decryption_key))
+        # The readable name must be the one that was encrypted with the keys
+        if fields.get("WORKSPACE_NAME") != keys_data["WORKSPACE_NAME"]:
+            raise ValueError("Workspace name does not match the encrypted configuration")
+    else:
+        fields = {name: decrypt_data(keys_data[name], decryption_key)
+                  for name in REQUIRED_KEYS if name != "WORKSPACE_NAME"}
+    return {
+        "ws_name": keys_data["WORKSPACE_NAME"],
+        "ws_description": fields["WORKSPACE_DESCRIPTION"],
+        "ws_key": fields["WORKSPACE_KEY"],
+        "tenant_key": fields["SUBSCRIPTION_KEY"],
+        "user_name": fields["USER_NAME"],
+    }
+
+class KeyCache:
+    """Keeps keys derived from PINs in memory so that each PIN is derived only once.
+
+    PINs themselves are not stored; entries are looked up by an HMAC of the
+    PIN and the derivation parameters under a random per-cache secret. ``clear()`` overwrites the cached
+    keys, which is best effort: Python may still hold copies elsewhere.
+    """
+
+    def __init__(self):
+        self._secret = os.urandom(32)
+        self._keys = {}
+        self._locks = {}
+        self._generation = 0  # bumped by clear() so late derivations are not cached
+        self._lock = threading.Lock()
+
+    def get(self, pin, kdf=None):
+        """Return the key for ``pin`` and ``kdf``, deriving it on first use. Safe to call from any thread."""
+        # Files with their own salt or cost need their own key for the same PIN
+        params = json.dumps(kdf, sort_keys=True).encode() if kdf is not None else b""
+        token = hmac.new(self._secret, pin.encode() + b"\0" + params, hashlib.sha256).digest()
+        with self._lock:
+            pin_lock = self._locks.setdefault(token, threading.Lock())
+        # Concurrent requests for the same PIN wait for one derivation
+        with pin_lock:
+            with self._lock:
+                key = self._keys.get(token)
+                generation = self._generation
+            if key is None:
+                key = bytearray(derive_key(pin, kdf))
+                with self._lock:
+                    if generation == self._generation:
+                        self._keys[token] = key
+            return bytes(key)
+
+    def clear(self):
+        """Forget and overwrite all cached keys."""
+        with self._lock:
+            for key in self._keys.values():
+                key[:] = bytes(len(key))
+            self._keys.clear()
+            self._locks.clear()
+            self._generation += 1
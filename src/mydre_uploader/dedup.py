@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Content-hash index of files uploaded to myDRE workspaces.
+
+The index remembers the SHA-256 of every local file it has hashed, keyed by
+path, size and modification time, so unchanged files are never read twice.
+It also records which content went to which workspace and container, so a
+later session can skip or flag files whose content is already there.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+try:
+    from .paths import get_data_dir
+except ImportError:
+    from paths import get_data_dir
+
+HASH_CHUNK_SIZE = 1024 * 1024
+# Every empty file has this content hash, so it says nothing about an earlier upload
+EMPTY_SHA256 = hashlib.sha256(b"").hexdigest()
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS file_hashes (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    sha256 TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS uploads (
+    sha256 TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    workspace TEXT NOT NULL,
+    container TEXT NOT NULL,
+    blob_name TEXT NOT NULL,
+    uploaded_at TEXT NOT NULL,
+    committed INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (sha256, workspace, container, blob_name)
+);
+CREATE INDEX IF NOT EXISTS uploads_by_content ON uploads (sha256, workspace, committed);
+CREATE INDEX IF NOT EXISTS uploads_by_name ON uploads (workspace, blob_name);
+"""
+
+
+def default_index_path():
+    """Return the location of the shared dedup index."""
+    return os.path.join(get_data_dir(), "dedup.sqlite3")
+
+
+def hash_file(path):
+    """Return the SHA-256 hex digest of a file's content."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as file_to_hash:
+        for chunk in iter(lambda: file_to_hash.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DedupIndex:
+    """Remembers file hashes and where each content hash was uploaded to."""
+
+    def __init__(self, path=None):
+        self.path = path or default_index_path()
+        # One connection shared by upload worker threads, serialized by the lock
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        self._connection.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    def cached_hash(self, path, stat=None):
+        """Return the stored SHA-256 of a file if its size and mtime still match, otherwise None."""
+        path = os.path.abspath(path)
+        stat = stat or os.stat(path)
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT sha256 FROM file_hashes WHERE path = ? AND size = ? AND mtime_ns = ?",
+                (path, stat.st_size, stat.st_mtime_ns)).fetchone()
+        return None if row is None else row[0]
+
+    def file_hash(self, path, stat=None):
+        """Return the SHA-256 of a file, reusing the stored hash if size and mtime still match."""
+        path = os.path.abspath(path)
+        stat = stat or os.stat(path)
+        sha256 = self.cached_hash(path, stat)
+        if sha256 is not None:
+            return sha256
+        sha256 = hash_file(path)
+        self.remember_hash(path, stat, sha256)
+        return sha256
+
+    def remember_hash(self, path, stat, sha256):
+        """Store a hash computed elsewhere, e.g. while the file was being uploaded."""
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO file_hashes (path, size, mtime_ns, sha256) VALUES (?, ?, ?, ?)",
+                (os.path.abspath(path), stat.st_size, stat.st_mtime_ns, sha256))
+
+    def hash_files(self, paths, max_workers=4):
+        """Hash many files in parallel; returns ``{path: sha256}``, leaving out unreadable files."""
+        def hash_one(path):
+            try:
+                return path, self.file_hash(path)
+            except OSError:
+                return path, None
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return {path: sha256 for path, sha256 in executor.map(hash_one, paths)
+                    if sha256 is not None}
+
+    def find_upload(self, sha256, workspace, blob_name=None):
+        """Return the most recent committed upload of this content to a workspace, or None.
+
+        An upload under ``blob_name`` is preferred over newer ones under other
+        names. Empty content never matches.
+        """
+        if sha256 == EMPTY_SHA256:
+            return None
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT container, blob_name, uploaded_at FROM uploads "
+                "WHERE sha256 = ? AND workspace = ? AND committed = 1 "
+                "ORDER BY blob_name = ? DESC, uploaded_at DESC LIMIT 1",
+                (sha256, workspace, blob_name)).fetchone()
+        if row is None:
+            return None
+        return {"container": row[0], "blob_name": row[1], "uploaded_at": row[2]}
+
+    def has_upload(self, size, workspace, blob_name):
+        """Return True if a file of this size was committed to a workspace under ``blob_name``.
+
+        A cheap check, without the content hash, of whether a file could be a
+        duplicate that is skipped.
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT 1 FROM uploads WHERE workspace = ? AND blob_name = ? AND size = ? "
+                "AND committed = 1 LIMIT 1",
+                (workspace, blob_name, size)).fetchone()
+        return row is not None
+
+    def record_upload(self, sha256, size, workspace, container, blob_name):
+        """Record content sent to a container; it counts once the container is committed."""
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO uploads "
+                "(sha256, size, workspace, container, blob_name, uploaded_at, committed) "
+                "VALUES (?, ?, ?, ?, ?, ?, 0)",
+                (sha256, size, workspace, container, blob_name,
+                 datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+
+    def mark_committed(self, workspace, container):
+        with self._lock, self._connection:
+            self._connection.execute(
+                "UPDATE uploads SET committed = 1 WHERE workspace = ? AND container = ?",
+                (workspace, container))
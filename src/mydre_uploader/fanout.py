@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Upload the same files to several myDRE workspaces in one session.
+
+``FanOutUpload`` holds one ``Upload`` per decrypted config, each with its
+own container. Every file is read from disk once: small files in one read,
+large files block by block, and each block is sent to all workspaces at the
+same time. Containers are committed one by one, and a failure only affects
+the workspace it happened in, so a session reports per workspace what was
+uploaded, what failed and whether the container was committed.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+
+from azure.storage.blob import BlobBlock
+
+# Handle both package import and direct script execution
+try:
+    from .uploader import (DEFAULT_MAX_BUFFERED_BYTES, DEFAULT_MAX_WORKERS, LARGE_FILE_THRESHOLD,
+                           SHA256_METADATA_KEY, BufferBudget, Upload, auto_block_concurrency,
+                           auto_block_size, check_block_size, make_block_id)
+    from .history import UploadHistory
+except ImportError:
+    from uploader import (DEFAULT_MAX_BUFFERED_BYTES, DEFAULT_MAX_WORKERS, LARGE_FILE_THRESHOLD,
+                          SHA256_METADATA_KEY, BufferBudget, Upload, auto_block_concurrency,
+                          auto_block_size, check_block_size, make_block_id)
+    from history import UploadHistory
+
+
+class FanOutUpload:
+    """Uploads files to the workspaces of several configs, reading each file once.
+
+    ``upload_options`` are passed on to every ``Upload``; journals, dedup
+    indexes, compression and bundling are not used when fanning out. A
+    ``bandwidth_limiter`` is shared by all workspaces. ``progress_callback``
+    is called with the bytes of a block once every workspace has it.
+    Data read for all workspaces counts once against ``max_buffered_bytes``.
+    """
+
+    def __init__(self, configs, max_workers=DEFAULT_MAX_WORKERS, block_size=None,
+                 max_block_concurrency=None, progress_callback=None, history=None,
+                 max_buffered_bytes=DEFAULT_MAX_BUFFERED_BYTES, **upload_options):
+        if not configs:
+            raise ValueError("need at least one config")
+        self.max_workers = max_workers
+        self.block_size = block_size
+        self.max_block_concurrency = max_block_concurrency
+        self.progress_callback = progress_callback
+        # Each file or block is held once for all workspaces until every one has it
+        self.buffer_budget = BufferBudget(max_buffered_bytes)
+        # One history store for all workspaces, so their batches do not compete for the file
+        self._owns_history = history is None
+        self.history = UploadHistory() if history is None else history
+        self.targets = [Upload(**config, max_workers=max_workers, block_size=block_size,
+                               max_block_concurrency=max_block_concurrency, history=self.history,
+                               **upload_options)
+                        for config in configs]
+        # One report per config, in order; two configs may name the same workspace
+        self.reports = [{"target": index, "workspace": target.workspace_name, "container_id": None,
+                         "uploaded": 0, "bytes": 0, "failed": [], "error": None, "committed": False}
+                        for index, target in enumerate(self.targets)]
+        self._active = []
+        self._lock = threading.Lock()
+        # Requests to the workspaces run here; file reads stay in the caller's threads
+        self._executor = ThreadPoolExecutor(max_workers=max_workers * len(self.targets))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self._executor.shutdown()
+        for target in self.targets:
+            target.close()
+        if self._owns_history:
+            try:
+                self.history.close()
+            except sqlite3.Error as e:
+                print(f"Warning: Could not write to upload history: {e}")
+
+    def create_containers(self):
+        """Create a container in every workspace; returns the workspaces that have one.
+
+        A workspace whose container could not be created gets its ``error`` set
+        and is left out of the rest of the session.
+        """
+        self._active = []
+        for target in self.targets:
+            report = self._report(target)
+            try:
+                target.create_workspace_container()
+            except Exception as e:
+                report["error"] = f"could not create an upload container: {e}"
+                continue
+            report["container_id"] = target.container_id
+            self._active.append(target)
+        return [target.workspace_name for target in self._active]
+
+    def file(self, local_file_path, blob_name=None):
+        """Upload one file to every workspace with a container.
+
+        Returns a dict with ``blob_name``, ``size``, ``sha256`` and
+        ``failed_workspaces``, mapping the index in ``targets`` of each
+        workspace the file failed in to the error. Raises only if the file
+        itself cannot be read.
+        """
+        blob_name = blob_name or os.path.basename(local_file_path)
+        targets = list(self._active)
+        failed = {}
+        started_at, started = datetime.now(), time.monotonic()
+        try:
+            size = os.path.getsize(local_file_path)
+            if size < LARGE_FILE_THRESHOLD:
+                sha256 = self._send_whole(local_file_path, blob_name, targets, failed)
+            else:
+                sha256 = self._send_blocks(local_file_path, blob_name, size, targets, failed)
+        except Exception as e:
+            # Reading the file failed, so it failed everywhere
+            for target in targets:
+                self._record(target, local_file_path, blob_name, started_at, started, error=e)
+            raise
+
+        for target in targets:
+            self._record(target, local_file_path, blob_name, started_at, started,
+                         size, sha256, failed.get(target))
+        return {"blob_name": blob_name, "size": size, "sha256": sha256,
+                "failed_workspaces": {self.targets.index(target): str(error)
+                                      for target, error in failed.items()}}
+
+    def _send_whole(self, local_file_path, blob_name, targets, failed):
+        size = os.path.getsize(local_file_path)
+        self.buffer_budget.acquire(size)
+        try:
+            with open(local_file_path, "rb") as file_to_upload:
+                data = file_to_upload.read()
+            sha256 = hashlib.sha256(data).hexdigest()
+            pending = {self._executor.submit(self._put, target, blob_name, data, sha256): target
+                       for target in targets}
+            self._collect(pending, failed, 1)
+        finally:
+            self.buffer_budget.release(size)
+        self._report_bytes(len(data))
+        return sha256
+
+    def _send_blocks(self, local_file_path, blob_name, size, targets, failed):
+        """Read a large file block by block and stage every block in all workspaces.
+
+        At most twice the block concurrency in blocks, and no more than the
+        buffer budget allows, is held in memory. A file that changes size
+        while it is read fails everywhere.
+        """
+        block_size = self.block_size or auto_block_size(size)
+        check_block_size(size, block_size)
+        concurrency = self.max_block_concurrency or auto_block_concurrency(size)
+        block_ids = []
+        digest = hashlib.sha256()
+        pending = {}
+        # Bytes of each block in flight and how many workspaces still have to receive it
+        in_flight = {}
+        with open(local_file_path, "rb") as file_to_upload:
+            for index in range(-(-size // block_size)):
+                reserved = min(block_size, size - index * block_size)
+                self.buffer_budget.acquire(reserved)
+                try:
+                    data = file_to_upload.read(reserved)
+                    if len(data) != reserved:
+                        raise OSError(f"{local_file_path} shrank while it was being uploaded")
+                except BaseException:
+                    self.buffer_budget.release(reserved)
+                    raise
+                digest.update(data)
+                block_id = make_block_id(index)
+                block_ids.append(block_id)
+                receivers = [target for target in targets if target not in failed]
+                if not receivers:
+                    self.buffer_budget.release(len(data))
+                    break
+                in_flight[block_id] = [len(data), len(receivers)]
+                futures = []
+                try:
+                    for target in receivers:
+                        future = self._executor.submit(self._stage, target, blob_name, block_id, data)
+                        futures.append(future)
+                        pending[future] = (target, block_id)
+                finally:
+                    # Released from the workers, since this thread may be waiting for room
+                    self.buffer_budget.release_when_done(futures, len(data))
+                pending = self._collect(pending, failed, concurrency * 2 * len(targets), in_flight)
+            else:
+                if file_to_upload.read(1):
+                    raise OSError(f"{local_file_path} grew while it was being uploaded")
+            self._collect(pending, failed, 1, in_flight)
+
+        sha256 = digest.hexdigest()
+        pending = {self._executor.submit(self._commit_blocks, target, blob_name, block_ids, sha256): target
+                   for target in targets if target not in failed}
+        self._collect(pending, failed, 1)
+        return sha256
+
+    def _collect(self, pending, failed, limit, in_flight=None):
+        """Wait until fewer than ``limit`` requests are pending; failures go into ``failed``.
+
+        Runs in the thread reading the file. Returns the requests still pending.
+        """
+        while len(pending) >= limit:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                target = pending.pop(future)
+                if in_flight is not None:
+                    target, block_id = target
+                    block = in_flight[block_id]
+                    block[1] -= 1
+                    if not block[1]:
+                        self._report_bytes(in_flight.pop(block_id)[0])
+                error = future.exception()
+                if error is not None and target not in failed:
+                    failed[target] = error
+        return pending
+
+    def _put(self, target, blob_name, data, sha256):
+        blob_client = target._get_container_client().get_blob_client(blob_name)
+        with target.metrics.phase("put", len(data)):
+            blob_client.upload_blob(data, overwrite=True, validate_content=True,
+                                    metadata={SHA256_METADATA_KEY: sha256})
+
+    def _stage(self, target, blob_name, block_id, data):
+        blob_client = target._get_container_client().get_blob_client(blob_name)
+        with target.metrics.phase("put", len(data)):
+            blob_client.stage_block(block_id, data, length=len(data), validate_content=True)
+
+    def _commit_blocks(self, target, blob_name, block_ids, sha256):
+        blob_client = target._get_container_client().get_blob_client(blob_name)
+        with target.metrics.phase("put"):
+            blob_client.commit_block_list([BlobBlock(block_id=block_id) for block_id in block_ids],
+                                          metadata={SHA256_METADATA_KEY: sha256})
+
+    def _report(self, target):
+        return self.reports[self.targets.index(target)]
+
+    def _record(self, target, local_file_path, blob_name, started_at, started, size=None,
+                sha256=None, error=None):
+        """Record the outcome of one file in one workspace's report, metrics and history."""
+        duration = time.monotonic() - started
+        report = self._report(target)
+        if error is None:
+            target._record(local_file_path, blob_name, started_at, duration, size, sha256)
+            with self._lock:
+                report["uploaded"] += 1
+                report["bytes"] += size
+            with target._lock:
+                target.uploaded_files.append(blob_name)
+        else:
+            target._record(local_file_path, blob_name, started_at, duration, size,
+                           status="failed", error=str(error))
+            with self._lock:
+                report["failed"].append((local_file_path, str(error)))
+
+    def _report_bytes(self, count):
+        if self.progress_callback is not None and count:
+            self.progress_callback(count)
+
+    def upload_many(self, paths, max_workers=None, callback=None):
+        """Upload several files to every workspace through a bounded worker pool.
+
+        Takes the same entries as ``Upload.upload_many`` and returns one result
+        dict per entry, in order, with ``path``, ``blob_name``, ``success``
+        (True if the file reached every workspace), ``error`` and
+        ``failed_workspaces``. ``callback`` runs in the calling thread with
+        each result as soon as that file finishes.
+        """
+        max_workers = max_workers or self.max_workers
+        results = []
+        pending = {}
+
+        def finish(done):
+            for future in done:
+                index, path, blob_name = pending.pop(future)
+                error = future.exception()
+                if error is not None:
+                    result = {"path": path, "blob_name": blob_name, "success": False,
+                              "error": str(error), "size": None, "sha256": None,
+                              "failed_workspaces": {self.targets.index(target): str(error)
+                                                    for target in self._active}}
+                else:
+                    result = dict(future.result(), path=path)
+                    failures = result["failed_workspaces"]
+                    result["success"] = not failures
+                    result["error"] = ("; ".join(f"{self.targets[target].workspace_name}: {error}"
+                                                 for target, error in failures.items())
+                                       if failures else None)
+                results[index] = result
+                if callback is not None:
+                    callback(result)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for entry in paths:
+                path, blob_name = entry if isinstance(entry, tuple) else (entry, None)
+                blob_name = blob_name or os.path.basename(path)
+                pending[executor.submit(self.file, path, blob_name)] = (len(results), path, blob_name)
+                results.append(None)
+                # Keep the queue short so huge or lazy inputs are not read up front
+                if len(pending) >= max_workers * 2:
+                    finish(wait(pending, return_when=FIRST_COMPLETED)[0])
+            while pending:
+                finish(wait(pending, return_when=FIRST_COMPLETED)[0])
+        return results
+
+    def commit(self, commit_partial=False):
+        """Commit the container of every workspace and return the per-workspace reports.
+
+        A workspace with failed files is only committed with ``commit_partial``.
+        Reports are in the order of the configs. Each holds ``target`` (the
+        index in ``targets``), ``workspace``, ``container_id``, ``uploaded``,
+        ``bytes``, ``failed`` (a list of ``(path, error)``), ``error`` and
+        ``committed``.
+        """
+        for target in self._active:
+            report = self._report(target)
+            if report["failed"] and not commit_partial:
+                report["error"] = f"not committed, {len(report['failed'])} file(s) failed"
+                continue
+            try:
+                target.commit_workspace_container()
+            except Exception as e:
+                report["error"] = f"could not commit the upload: {e}"
+                continue
+            report["committed"] = True
+        return list(self.reports)
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Virtualized file list for the myDRE Uploader GUI.
+
+``FileListModel`` holds the selected files as compact columns (paths, sizes
+in an array, statuses only where set) and may be filled from a background
+thread. ``FileListView`` draws only the rows that fit in its canvas, so a
+selection of a million files costs no more to show than ten. Filtering runs
+in a background thread as well and swaps in the matching rows when done.
+"""
+
+import os
+import threading
+import tkinter as tk
+from array import array
+from tkinter import font as tkfont
+
+# Handle both package import and direct script execution
+try:
+    from .progress import format_bytes
+except ImportError:
+    from progress import format_bytes
+
+REFRESH_INTERVAL_MS = 200
+FILTER_DELAY_MS = 300
+UNKNOWN_SIZE = -1
+
+
+class FileListModel:
+    """Rows of a ``FileListView``; safe to fill from one thread while the Tk thread reads it."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self.paths = []
+            self.sizes = array('q')
+            self.statuses = {}  # path -> status, for rows that have one
+            self.filter_text = ""
+            self.visible = None  # positions of the rows that match the filter, None for all
+            self._filter_generation = getattr(self, "_filter_generation", 0) + 1
+            # Bumped on every change, so the view only redraws when something changed
+            self.version = getattr(self, "version", 0) + 1
+
+    def extend(self, rows):
+        """Append ``(path, size)`` rows; a size of None means unknown."""
+        with self._lock:
+            start = len(self.paths)
+            for path, size in rows:
+                self.paths.append(path)
+                self.sizes.append(UNKNOWN_SIZE if size is None else size)
+            if self.visible is not None:
+                needle = self.filter_text
+                self.visible.extend(position for position in range(start, len(self.paths))
+                                    if _matches(self.paths[position], needle))
+            self.version += 1
+
+    def set_status(self, path, status):
+        with self._lock:
+            self.statuses[path] = status
+            self.version += 1
+
+    def set_filter(self, text, on_done=None):
+        """Show only rows whose file name contains ``text`` (ignoring case).
+
+        The matching runs in a background thread; ``on_done`` is called from
+        it once the rows are swapped in. A newer filter cancels an older one.
+        """
+        needle = text.strip().lower()
+        with self._lock:
+            self._filter_generation += 1
+            generation = self._filter_generation
+            self.filter_text = needle
+            if not needle:
+                self.visible = None
+                self.version += 1
+                paths = None
+            else:
+                paths = list(self.paths)
+        if paths is None:
+            if on_done is not None:
+                on_done()
+            return
+
+        def work():
+            visible = [position for position, path in enumerate(paths) if _matches(path, needle)]
+            with self._lock:
+                if generation != self._filter_generation:
+                    return
+                # Rows added while matching are checked here
+                visible.extend(position for position in range(len(paths), len(self.paths))
+                               if _matches(self.paths[position], needle))
+                self.visible = visible
+                self.version += 1
+            if on_done is not None:
+                on_done()
+
+        threading.Thread(target=work, daemon=True).start()
+
+    def __len__(self):
+        visible = self.visible
+        return len(self.paths) if visible is None else len(visible)
+
+    def row(self, index):
+        """Return ``(name, size, status)`` of the ``index``-th shown row."""
+        visible = self.visible
+        position = index if visible is None else visible[index]
+        path = self.paths[position]
+        size = self.sizes[position]
+        return (os.path.basename(path), None if size == UNKNOWN_SIZE else size,
+                self.statuses.get(path, ""))
+
+
+def _matches(path, needle):
+    return needle in os.path.basename(path).lower()
+
+
+class FileListView(tk.Frame):
+    """Scrollable Name/Size/Status list that renders only its visible rows."""
+
+    def __init__(self, master, model=None, rows=8, **kwargs):
+        kwargs.setdefault('bg', '#f0f0f0')
+        super().__init__(master, **kwargs)
+        self.model = model or FileListModel()
+        self.first = 0  # index of the top row shown
+        self._drawn_version = None
+        self._filter_job = None
+
+        header = tk.Frame(self, bg=kwargs['bg'])
+        header.pack(fill='x')
+        tk.Label(header, text="Filter:", bg=kwargs['bg']).pack(side=tk.LEFT)
+        self.filter_var = tk.StringVar()
+        self.filter_entry = tk.Entry(header, textvariable=self.filter_var, width=30)
+        self.filter_entry.pack(side=tk.LEFT, padx=5)
+        self.filter_entry.bind('<KeyRelease>', self._schedule_filter)
+        self.count_label = tk.Label(header, text="", bg=kwargs['bg'])
+        self.count_label.pack(side=tk.RIGHT)
+
+        body = tk.Frame(self, relief='solid', borderwidth=1)
+        body.pack(fill='both', expand=True)
+        self.scrollbar = tk.Scrollbar(body, orient=tk.VERTICAL, command=self.yview)
+        self.scrollbar.pack(side=tk.RIGHT, fill='y')
+        self.font = ('Helvetica', 9)
+        font = tkfont.Font(font=self.font)
+        self.row_height = font.metrics('linespace') + 2
+        self._char_width = max(1, font.measure('0'))
+        self.canvas = tk.Canvas(body, height=self.row_height * (rows + 1), bg='white',
+                                highlightthickness=0)
+        self.canvas.pack(side=tk.LEFT, fill='both', expand=True)
+        self._header_items = [self.canvas.create_text(0, 0, anchor=anchor, font=self.font + ('bold',),
+                                                      text=text)
+                              for text, anchor in (("Name", 'nw'), ("Size", 'ne'), ("Status", 'nw'))]
+        self._row_items = []  # [name, size, status] canvas items per visible row
+
+        self.canvas.bind('<Configure>', lambda event: self.redraw(force=True))
+        for widget in (self.canvas, self.scrollbar):
+            widget.bind('<MouseWheel>', self._on_mousewheel)
+            widget.bind('<Button-4>', lambda event: self.yview('scroll', -3, 'units'))
+            widget.bind('<Button-5>', lambda event: self.yview('scroll', 3, 'units'))
+        self.after(REFRESH_INTERVAL_MS, self._refresh)
+
+    def visible_rows(self):
+        return max(1, self.canvas.winfo_height() // self.row_height - 1)
+
+    def yview(self, *args):
+        """Scrollbar protocol: ``('moveto', fraction)`` or ``('scroll', count, 'units'|'pages')``."""
+        total, rows = len(self.model), self.visible_rows()
+        if args[0] == 'moveto':
+            first = int(float(args[1]) * total)
+        elif args[0] == 'scroll':
+            step = rows if args[2] == 'pages' else 1
+            first = self.first + int(args[1]) * step
+        else:
+            return
+        self.first = max(0, min(first, total - rows))
+        self.redraw(force=True)
+
+    def _on_mousewheel(self, event):
+        # Windows reports multiples of 120, macOS small deltas
+        steps = -event.delta // 120 if abs(event.delta) >= 120 else -event.delta
+        self.yview('scroll', steps * 3, 'units')
+
+    def _schedule_filter(self, event=None):
+        if self._filter_job is not None:
+            self.after_cancel(self._filter_job)
+        self._filter_job = self.after(FILTER_DELAY_MS, self._apply_filter)
+
+    def _apply_filter(self):
+        self._filter_job = None
+        self.first = 0
+        self.model.set_filter(self.filter_var.get())
+
+    def set_model(self, model):
+        """Show another model, e.g. for a new selection; its filter starts empty."""
+        self.model = model
+        self.filter_var.set("")
+        self.first = 0
+        self.redraw(force=True)
+
+    def _refresh(self):
+        """Redraw a few times per second, only if the model changed."""
+        self.redraw()
+        self.after(REFRESH_INTERVAL_MS, self._refresh)
+
+    def redraw(self, force=False):
+        version = self.model.version
+        if not force and version == self._drawn_version:
+            return
+        self._drawn_version = version
+        width = self.canvas.winfo_width()
+        status_x, size_x = width - 90, width - 100
+        for item, x in zip(self._header_items, (4, size_x, status_x)):
+            self.canvas.coords(item, x, 1)
+
+        rows = self.visible_rows()
+        while len(self._row_items) < rows:
+            y = self.row_height * (len(self._row_items) + 1)
+            self._row_items.append([self.canvas.create_text(x, y, anchor=anchor, font=self.font)
+                                    for x, anchor in ((4, 'nw'), (size_x, 'ne'), (status_x, 'nw'))])
+        while len(self._row_items) > rows:
+            for item in self._row_items.pop():
+                self.canvas.delete(item)
+
+        total = len(self.model)
+        self.first = max(0, min(self.first, total - rows))
+        name_chars = max(4, (size_x - 80) // self._char_width)
+        for offset, (name_item, size_item, status_item) in enumerate(self._row_items):
+            index = self.first + offset
+            try:
+                name, size, status = self.model.row(index)
+            except IndexError:
+                # Past the end, or the filter swapped the rows since len() was taken
+                name, size, status = "", None, ""
+            size_text = "" if size is None else format_bytes(size)
+            if len(name) > name_chars:
+                name = name[:name_chars - 1] + "\u2026"
+            y = self.row_height * (offset + 1)
+            self.canvas.itemconfigure(name_item, text=name)
+            self.canvas.itemconfigure(size_item, text=size_text)
+            self.canvas.itemconfigure(status_item, text=status)
+            self.canvas.coords(size_item, size_x, y)
+            self.canvas.coords(status_item, status_x, y)
+
+        if total:
+            self.scrollbar.set(self.first / total, min(1.0, (self.first + rows) / total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+        count = len(self.model.paths)
+        self.count_label.config(text=f"{total} of {count} shown" if total != count else f"{count} file(s)")
@@ -7,34 +7,75 @@ This tool is specifically designed for use with myDRE (my Data Research Environm
 workspaces and cannot be used with other platforms.
 """
 
+# Imported first, so that the startup timer's clock includes the imports below
+try:
+    from .startup import startup_timer
+except ImportError:
+    from startup import startup_timer
+
 import tkinter as tk
 from tkinter import filedialog, ttk, messagebox
 import os
-import json
-from datetime import datetime
+import queue
+import threading
 import sys
 import webbrowser
 
-# Handle both package import and direct script execution
+# Handle both package import and direct script execution. The upload
+# machinery (requests, azure, cryptography) is imported by load_upload().
 try:
-    from .uploader import Upload, derive_key, decrypt_data
+    from .config import KeyCache, decrypt_config, load_config
+    from .journal import default_journal_path
+    from .progress import ProgressTracker, format_bytes, format_duration
+    from .dedup import DedupIndex
+    from .scan import PreflightScanner, recent_throughput
+    from .filelist import FileListModel, FileListView
 except ImportError:
-    from uploader import Upload, derive_key, decrypt_data
-
-REQUIRED_KEYS = [
-    "WORKSPACE_NAME",
-    "WORKSPACE_DESCRIPTION",
-    "WORKSPACE_KEY",
-    "SUBSCRIPTION_KEY",
-    "USER_NAME"
-]
+    from config import KeyCache, decrypt_config, load_config
+    from journal import default_journal_path
+    from progress import ProgressTracker, format_bytes, format_duration
+    from dedup import DedupIndex
+    from scan import PreflightScanner, recent_throughput
+    from filelist import FileListModel, FileListView
+
+PROGRESS_INTERVAL_MS = 200
+# Collisions and unreadable files listed before an upload starts
+SCAN_LIST_LIMIT = 10
+# Scanned files are added to the file list in batches of this many
+FILE_LIST_BATCH = 1000
+PIN_DEBOUNCE_MS = 400
+# The upload modules are imported this long after the window is drawn
+PRELOAD_DELAY_MS = 500
+
+def load_upload():
+    """Import and return the ``Upload`` class; slow the first time, so not done at startup."""
+    try:
+        from .uploader import Upload
+    except ImportError:
+        from uploader import Upload
+    return Upload
+
+def preload_upload():
+    """Import the upload modules in a background thread while the user fills in the form."""
+    threading.Thread(target=load_upload, daemon=True).start()
+
+def _file_size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
 
 class UploadForm:
     def __init__(self, master):
         self.master = master
         self.keys_data = None
+        self.upload_session = None
+        self.scanner = None  # Pre-flight scan of the selected files
+        self.scan_throughput = None
+        self.key_cache = KeyCache()  # Derived keys for this session, wiped on close or config change
+        self.pin_check_job = None
         master.title("Upload Data to myDRE Workspace")
-        master.geometry("800x650")
+        master.geometry("800x760")
         master.configure(bg='#f0f0f0')
 
         # Set the icon
@@ -119,10 +160,19 @@ class UploadForm:
         self.file_label = tk.Label(file_section, text="No files selected")
         self.file_label.pack(side=tk.LEFT, padx=10)
 
-        # Files list section
-        self.files_listbox = tk.Listbox(main_container, width=50, height=3,
-                                      relief='solid', borderwidth=1)
-        self.files_listbox.pack(pady=(0, 10), fill='x')
+        self.skip_duplicates_var = tk.BooleanVar(value=True)
+        self.skip_duplicates_checkbox = tk.Checkbutton(file_section,
+                                                       text="Skip files already uploaded to this workspace",
+                                                       variable=self.skip_duplicates_var)
+        self.skip_duplicates_checkbox.pack(side=tk.RIGHT)
+
+        # Totals, ETA and warnings of the pre-flight scan
+        self.scan_label = tk.Label(main_container, text="", anchor='w', justify=tk.LEFT, bg='#f0f0f0')
+        self.scan_label.pack(fill='x', pady=(0, 5))
+
+        # Files list section; only the rows in view are drawn, so large selections stay fast
+        self.file_list = FileListView(main_container, rows=8)
+        self.file_list.pack(pady=(0, 10), fill='both', expand=True)
 
         # Bottom container for confirmation, buttons, and powered by
         bottom_container = tk.Frame(main_container, bg='#f0f0f0')
@@ -190,13 +240,11 @@ class UploadForm:
             if not file_path:  # User cancelled the file selection
                 return
                 
-            with open(file_path, "r") as f:
-                self.keys_data = json.load(f)
-                
-            # Validate all required keys are present
-            missing_keys = [key for key in REQUIRED_KEYS if key not in self.keys_data]
-            if missing_keys:
-                raise KeyError(f"Missing required keys in configuration file: {', '.join(missing_keys)}")
+            # Load and validate that all required keys are present
+            keys_data = load_config(file_path)
+            # Keys derived for the previous config must not outlive it
+            self.key_cache.clear()
+            self.keys_data = keys_data
             
             # Show the filename instead of generic message
             config_filename = os.path.basename(file_path)
@@ -220,153 +268,381 @@ class UploadForm:
             messagebox.showerror("Error", f"Failed to load config file: {str(e)}")
 
     def update_description(self, event=None):
-        """Update the workspace description and uploader name when PIN is entered."""
+        """Schedule a PIN check once typing pauses, instead of on every keystroke."""
+        if self.pin_check_job is not None:
+            self.master.after_cancel(self.pin_check_job)
+        self.pin_check_job = self.master.after(PIN_DEBOUNCE_MS, self.check_pin)
+        self.toggle_upload_button()
+
+    def check_pin(self):
+        """Update the workspace description and uploader name when PIN is entered.
+
+        The key derivation runs in a background thread; results for a PIN
+        that has since been changed are ignored.
+        """
+        self.pin_check_job = None
         pin = self.pin_entry.get()
-        if pin and self.keys_data:
-            try:
-                decryption_key = derive_key(pin)
-                ws_description = decrypt_data(self.keys_data["WORKSPACE_DESCRIPTION"], decryption_key)
-                user_name = decrypt_data(self.keys_data["USER_NAME"], decryption_key)
+        keys_data = self.keys_data
+        if not (pin and keys_data):
+            return
+
+        def work():
+            config = decrypt_config(keys_data, pin, self.key_cache)
+            return config["ws_description"], config["user_name"]
+
+        def show(result, error):
+            if self.pin_entry.get() != pin or self.keys_data is not keys_data:
+                return
+            if error is None:
+                ws_description, user_name = result
                 self.description_label.config(text=ws_description)
                 self.uploader_label.config(text=user_name)
-            except Exception:
+            else:
                 # If decryption fails (wrong PIN), show generic message
                 self.description_label.config(text="Enter correct PIN to see workspace description")
                 self.uploader_label.config(text="Enter correct PIN to see uploader name")
 
+        self.run_in_background(work, show)
+
     def select_files(self):
         """Handle file selection."""
         self.selected_files = filedialog.askopenfilenames()
         if self.selected_files:
             self.file_label.config(text=f"{len(self.selected_files)} file(s) selected")
-            self.update_files_listbox()
             self.checkbox.config(state=tk.NORMAL)
+            self.start_scan()
         else:
+            self.scanner = None
+            self.scan_label.config(text="")
+            self.file_list.set_model(FileListModel())
             self.file_label.config(text="No files selected")
             self.checkbox.config(state=tk.DISABLED)
             self.upload_button.config(state=tk.DISABLED)
         self.toggle_upload_button()
 
-    def update_files_listbox(self):
-        """Update the listbox with selected files."""
-        self.files_listbox.delete(0, tk.END)
-        for file in self.selected_files:
-            self.files_listbox.insert(tk.END, os.path.basename(file))
+    def start_scan(self):
+        """Scan the selected files in the background for totals, ETA, name collisions and unreadable files.
+
+        The file list is filled as the scan goes.
+        """
+        # The dialog returns real paths, which may contain glob characters
+        scanner = self.scanner = PreflightScanner(expand_globs=False)
+        model = FileListModel()
+        self.file_list.set_model(model)
+        files = list(self.selected_files)
+        ws_name = self.keys_data["WORKSPACE_NAME"]
+
+        def work():
+            batch = []
+            for path, _, size in scanner.iter_scan(files):
+                batch.append((path, size))
+                if len(batch) >= FILE_LIST_BATCH:
+                    model.extend(batch)
+                    batch = []
+            model.extend(batch)
+            for path, error in scanner.report.unreadable:
+                model.extend([(path, None)])
+                model.set_status(path, "unreadable")
+            return recent_throughput([ws_name])
+
+        def scanned(throughput, error):
+            if self.scanner is not scanner:
+                return
+            if error is not None:
+                self.scan_label.config(text=f"Could not scan the selected files: {error}")
+                return
+            self.scan_throughput = throughput
+            self.refresh_scan()
+
+        self.run_in_background(work, scanned)
+        self.refresh_scan()
+
+    def refresh_scan(self):
+        """Show the scan totals; repeats a few times per second while the scan runs."""
+        if self.scanner is None:
+            return
+        report = self.scanner.report
+        progress = report.snapshot()
+        text = f"{progress['files']} file(s), {format_bytes(progress['bytes'])}"
+        if not progress["done"]:
+            self.scan_label.config(text=f"Scanning... {text}")
+            self.master.after(PROGRESS_INTERVAL_MS, self.refresh_scan)
+            return
+        eta = report.eta(self.scan_throughput)
+        if eta is not None:
+            text += f", about {format_duration(eta)} at {format_bytes(self.scan_throughput)}/s"
+        largest = report.largest_files()
+        if largest:
+            size, path = largest[0]
+            text += f"\nLargest: {os.path.basename(path)} ({format_bytes(size)})"
+        if progress["collisions"]:
+            text += f"\nWarning: {progress['collisions']} file name(s) selected more than once"
+        if progress["unreadable"]:
+            text += f"\nWarning: {progress['unreadable']} file(s) cannot be read"
+        self.scan_label.config(text=text)
+
+    def confirm_scan_warnings(self):
+        """Ask before uploading files the scan found problems with; True means go ahead."""
+        report = self.scanner.report if self.scanner is not None else None
+        if report is None or not report.done or not (report.collisions or report.unreadable):
+            return True
+        lines = []
+        if report.collisions:
+            lines.append("These names are used by more than one file; only the last one uploaded "
+                         "will be kept in the workspace:")
+            lines.extend(f"  {name} ({len(paths)} files)"
+                         for name, paths in sorted(report.collisions.items())[:SCAN_LIST_LIMIT])
+        if report.unreadable:
+            lines.append("These files cannot be read and will fail:")
+            lines.extend(f"  {path}: {error}" for path, error in sorted(report.unreadable)[:SCAN_LIST_LIMIT])
+        lines.append("\nUpload anyway?")
+        return messagebox.askyesno("Check Selected Files", "\n".join(lines))
 
     def toggle_upload_button(self):
         """Enable/disable upload button based on conditions."""
-        if self.selected_files and self.checkbox_var.get() and self.pin_entry.get():
+        if (self.selected_files and self.checkbox_var.get() and self.pin_entry.get()
+                and self.upload_session is None):
             self.upload_button.config(state=tk.NORMAL)
         else:
             self.upload_button.config(state=tk.DISABLED)
 
     def uploading(self):
-        """Handle the file upload process."""
+        """Start the file upload process; key derivation and transfer run in background threads."""
         pin = self.pin_entry.get()
         if not pin:
             messagebox.showerror("Error", "Please enter a PIN")
             return
+        if self.upload_session is not None:
+            return
+        if not self.confirm_scan_warnings():
+            return
 
+        # Claim the session now so the button cannot start a second upload meanwhile
+        self.upload_session = {}
+        self.upload_button.config(state=tk.DISABLED)
+        keys_data = self.keys_data
+
+        def unlocked(config, error):
+            if error is not None:
+                self.upload_session = None
+                self.toggle_upload_button()
+                messagebox.showerror("Error", f"An error occurred, probably wrong PIN: {str(error)}")
+                return
+            self.start_upload(config)
+
+        self.run_in_background(lambda: decrypt_config(keys_data, pin, self.key_cache), unlocked)
+
+    def start_upload(self, config):
+        """Create the upload session for a decrypted config and start the transfer."""
+        ws_name = config["ws_name"]
+        files = list(self.selected_files)
+        tracker = ProgressTracker()
+        # Files whose content is already in the workspace are skipped or, if the
+        # user unticked the option, uploaded again and only flagged in the index
+        uploader = dedup_index = None
         try:
-            ws_name = self.keys_data["WORKSPACE_NAME"]
-            decryption_key = derive_key(pin)
-            ws_description = decrypt_data(self.keys_data["WORKSPACE_DESCRIPTION"], decryption_key)
-            ws_key = decrypt_data(self.keys_data["WORKSPACE_KEY"], decryption_key)
-            tenant_key = decrypt_data(self.keys_data["SUBSCRIPTION_KEY"], decryption_key)
-            user_name = decrypt_data(self.keys_data["USER_NAME"], decryption_key)
-
-            # Sanitize user_name for filename
-            sanitized_user_name = self.sanitize_filename(user_name)
-
-            # Create progress window
-            progress_window = tk.Toplevel(self.master)
-            progress_window.title("Upload Progress")
-            progress_window.geometry("300x150")
-            
-            # Set the icon for the progress window
-            icon_path = os.path.join(os.path.dirname(__file__), '..', '..', 'assets', 'favicon.ico')
-            if os.path.exists(icon_path):
-                progress_window.iconbitmap(icon_path)
-
-            label = tk.Label(progress_window, text="Uploading files...")
-            label.pack(pady=10)
-
-            progress_bar = ttk.Progressbar(progress_window, length=200, mode='determinate')
-            progress_bar.pack(pady=10)
-
-            file_label = tk.Label(progress_window, text="")
-            file_label.pack(pady=5)
-
-            uploader = Upload(ws_name, ws_description, ws_key, tenant_key, user_name)
-            uploader.create_workspace_container()
-
-            # Create and upload the user name file
-            user_file_path = f"{sanitized_user_name}.txt"
-            with open(user_file_path, "w") as f:
-                # Write the uploader information and upload timestamp
-                upload_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                f.write(f"Uploaded by: {user_name}\n")
-                f.write(f"Uploaded on: {upload_time}\n\n")
-                f.write("List of all the uploaded files:\n")
-                # Write all filenames to the txt file first
-                for file in self.selected_files:
-                    f.write(f"{os.path.basename(file)}\n")
-
-            # Calculate total files including the user name file
-            total_files = len(self.selected_files) + 1
-            
-            # Upload user name file first
-            progress = (1 / total_files) * 100
-            progress_bar['value'] = progress
-            file_label.config(text=f"Uploading: {user_file_path}")
-            self.master.update_idletasks()
-            uploader.file2(user_file_path)
-            
-            # Upload selected files
-            for i, file in enumerate(self.selected_files, start=2):
-                progress = (i / total_files) * 100
-                progress_bar['value'] = progress
-                filename = os.path.basename(file)
-                file_label.config(text=f"Uploading: {filename}")
-                self.master.update_idletasks()
-                uploader.file2(file)
+            Upload = load_upload()
+            dedup_index = DedupIndex()
+            uploader = Upload(**config, journal_path=default_journal_path(ws_name),
+                              progress_callback=tracker.add_bytes, dedup_index=dedup_index,
+                              dedup_policy="skip" if self.skip_duplicates_var.get() else "flag",
+                              manifest=True)
+            pending = uploader.journal.pending()
+        except Exception as e:
+            # e.g. a journal or index that cannot be opened; release the claimed session
+            if uploader is not None:
+                uploader.close()
+            if dedup_index is not None:
+                dedup_index.close()
+            self.upload_session = None
+            self.toggle_upload_button()
+            messagebox.showerror("Error", f"Could not start the upload: {str(e)}")
+            return
+        resume = False
+        if pending is not None:
+            resume = messagebox.askyesno(
+                "Resume Upload",
+                f"An upload to {ws_name} started on {pending[1]} did not finish.\n\n"
+                "Resume it and skip the files that were already uploaded?\n"
+                "Choose No to start a new upload.")
+
+        self.upload_session = {
+            "uploader": uploader,
+            "tracker": tracker,
+            "ws_name": ws_name,
+        }
+        self.create_progress_window()
+        self.refresh_progress()
+
+        # Results arrive on the worker thread; the file list model is thread-safe
+        file_model = self.file_list.model
+
+        def file_done(result):
+            tracker.file_done(result)
+            file_model.set_status(result["path"], result["status"])
+
+        def work():
+            # Totals are gathered here so that stat-ing many files does not block the UI
+            report = self.scanner.report if self.scanner is not None else None
+            if report is not None and report.done:
+                tracker.add_total(report.bytes, len(files))
+            else:
+                tracker.add_total(sum(_file_size(file) for file in files), len(files))
+            uploader.create_workspace_container(resume=resume)
+            return uploader.upload_many(files, callback=file_done)
+
+        self.run_in_background(work, self.files_uploaded)
+
+    def create_progress_window(self):
+        """Create the progress window with a byte-based bar, throughput and ETA."""
+        progress_window = tk.Toplevel(self.master)
+        progress_window.title("Upload Progress")
+        progress_window.geometry("400x170")
+        # Closing the window would not stop the transfer; keep it until the upload ends
+        progress_window.protocol("WM_DELETE_WINDOW", lambda: None)
+
+        # Set the icon for the progress window
+        icon_path = os.path.join(os.path.dirname(__file__), '..', '..', 'assets', 'favicon.ico')
+        if os.path.exists(icon_path):
+            progress_window.iconbitmap(icon_path)
 
-            uploader.commit_workspace_container()
+        label = tk.Label(progress_window, text="Uploading files...")
+        label.pack(pady=10)
 
-            # Clean up the temporary user name file
-            os.remove(user_file_path)
+        self.progress_bar = ttk.Progressbar(progress_window, length=300, mode='determinate', maximum=100)
+        self.progress_bar.pack(pady=5)
 
-            progress_bar['value'] = 100
-            file_label.config(text="Upload complete!")
-            self.master.update_idletasks()
+        self.progress_file_label = tk.Label(progress_window, text="")
+        self.progress_file_label.pack(pady=5)
 
-            messagebox.showinfo("Upload Complete", f"All files have been uploaded successfully to {ws_name}!")
+        self.progress_rate_label = tk.Label(progress_window, text="")
+        self.progress_rate_label.pack(pady=5)
+
+        self.progress_window = progress_window
+
+    def refresh_progress(self):
+        """Redraw the progress window from the tracker, a few times per second."""
+        if self.upload_session is None:
+            return
+        progress = self.upload_session["tracker"].snapshot()
+        if progress["total_bytes"]:
+            self.progress_bar['value'] = progress["bytes_done"] / progress["total_bytes"] * 100
+        self.progress_file_label.config(
+            text=f"{progress['files_done']} of {progress['total_files']} file(s) done"
+                 + (f" - last: {progress['current_file']}" if progress["current_file"] else ""))
+        rate_text = (f"{format_bytes(progress['bytes_done'])} of {format_bytes(progress['total_bytes'])}"
+                     f"  |  {format_bytes(progress['rate'])}/s")
+        if progress["eta"] is not None:
+            rate_text += f"  |  ETA {format_duration(progress['eta'])}"
+        self.progress_rate_label.config(text=rate_text)
+        self.master.after(PROGRESS_INTERVAL_MS, self.refresh_progress)
+
+    def run_in_background(self, work, on_done):
+        """Run ``work()`` in a worker thread, then call ``on_done(result, error)`` on the Tk thread."""
+        outcome = queue.Queue()
+
+        def target():
+            try:
+                outcome.put((work(), None))
+            except Exception as e:
+                outcome.put((None, e))
+
+        def check():
+            try:
+                result, error = outcome.get_nowait()
+            except queue.Empty:
+                self.master.after(PROGRESS_INTERVAL_MS, check)
+                return
+            on_done(result, error)
+
+        threading.Thread(target=target, daemon=True).start()
+        self.master.after(PROGRESS_INTERVAL_MS, check)
+
+    def files_uploaded(self, results, error):
+        """Decide whether to commit once all files have been transferred."""
+        ws_name = self.upload_session["ws_name"]
+        if error is not None:
+            self.end_upload()
+            messagebox.showerror("Error", f"An error occurred: {str(error)}")
+            return
+
+        failed = [result for result in results if not result["success"]]
+        if failed:
+            details = "\n".join(f"{os.path.basename(result['path'])}: {result['error']}"
+                                for result in failed[:10])
+            if len(failed) > 10:
+                details += f"\n... and {len(failed) - 10} more"
+            if not messagebox.askyesno(
+                    "Upload Incomplete",
+                    f"{len(failed)} of {len(results)} file(s) failed to upload:\n\n{details}\n\n"
+                    f"Commit the files that did upload to {ws_name}?"):
+                self.end_upload()
+                return
+
+        uploader = self.upload_session["uploader"]
+        if not uploader.get_uploaded_files():
+            # An empty container is left uncommitted rather than delivered
+            uploader.discard_workspace_container()
+            self.end_upload()
+            messagebox.showinfo("Nothing Uploaded",
+                                f"No files were uploaded to {ws_name}, so nothing was committed.")
+            return
+
+        def committed(_, commit_error):
+            self.end_upload()
+            if commit_error is not None:
+                messagebox.showerror("Error", f"An error occurred: {str(commit_error)}")
+                return
+            skipped = sum(1 for result in results if result["status"] == "skipped")
+            if failed:
+                message = (f"{len(results) - len(failed)} of {len(results)} file(s) "
+                           f"have been uploaded to {ws_name}.")
+            else:
+                message = f"All files have been uploaded successfully to {ws_name}!"
+            if skipped:
+                message += f"\n\n{skipped} file(s) were skipped because their content was uploaded before."
+            messagebox.showinfo("Upload Complete", message)
 
-            progress_window.destroy()
-            
             # Reset UI elements
-            self.files_listbox.delete(0, tk.END)
+            self.file_list.set_model(FileListModel())
             self.selected_files = []
+            self.scanner = None
+            self.scan_label.config(text="")
             self.file_label.config(text="No files selected")
             self.checkbox.config(state=tk.DISABLED)
             self.upload_button.config(state=tk.DISABLED)
             self.checkbox_var.set(False)
             self.pin_entry.delete(0, tk.END)
 
-        except Exception as e:
-            messagebox.showerror("Error", f"An error occurred, probably wrong PIN: {str(e)}")
+        self.progress_file_label.config(text="Committing upload...")
+        self.run_in_background(self.upload_session["uploader"].commit_workspace_container, committed)
 
-    def sanitize_filename(self, name):
-        """Sanitize the user name to create a valid filename."""
-        # Replace invalid characters with underscores
-        return ''.join(c if c.isalnum() or c in (' ', '_') else '_' for c in name)
+    def end_upload(self):
+        """Close the progress window and release the upload session."""
+        session, self.upload_session = self.upload_session, None
+        session["uploader"].close()
+        session["uploader"].dedup_index.close()
+        self.progress_window.destroy()
+        self.toggle_upload_button()
 
     def close_application(self):
         """Close the application."""
+        self.key_cache.clear()
         self.master.quit()
         self.master.destroy()
         sys.exit()
 
+def main(argv=None):
+    """Start the uploader GUI; ``--startup-time[=FILE]`` reports the startup time and quits."""
+    timer = startup_timer("mydre-uploader", argv)
+    root = tk.Tk()
+    app = UploadForm(root)
+    if timer is not None:
+        timer.watch(root)
+    else:
+        root.after(PRELOAD_DELAY_MS, preload_upload)
+    root.mainloop()
+
 if __name__ == "__main__":
     # For development/testing in Spyder or direct execution
     import sys
@@ -376,6 +652,4 @@ if __name__ == "__main__":
     if os.path.dirname(__file__) not in sys.path:
         sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
     
-    root = tk.Tk()
-    app = UploadForm(root)
-    root.mainloop()
\ No newline at end of file
+    main()
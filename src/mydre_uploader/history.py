@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Local history of files uploaded to myDRE workspaces.
+
+Every file an upload session handles gets one record: the session and
+container, local path and blob name, size, hash, how long it took and how
+it ended. Records are buffered and written to an indexed SQLite database in
+batches, so logging does not add a disk write per file. Queries by
+workspace, date range or name use the indexes and return pages of results.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+try:
+    from .paths import get_data_dir
+except ImportError:
+    from paths import get_data_dir
+
+HISTORY_BATCH_SIZE = 200
+HISTORY_FLUSH_INTERVAL = 2.0  # seconds a record may wait in the buffer
+DEFAULT_PAGE_SIZE = 100
+
+_COLUMNS = ("session", "workspace", "container", "path", "blob_name", "size",
+            "sha256", "started_at", "duration", "status", "error", "bundle")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS uploads (
+    id INTEGER PRIMARY KEY,
+    session TEXT NOT NULL,
+    workspace TEXT NOT NULL,
+    container TEXT NOT NULL,
+    path TEXT NOT NULL,
+    blob_name TEXT NOT NULL,
+    size INTEGER,
+    sha256 TEXT,
+    started_at TEXT NOT NULL,
+    duration REAL,
+    status TEXT NOT NULL,
+    error TEXT,
+    bundle TEXT
+);
+CREATE INDEX IF NOT EXISTS uploads_by_workspace ON uploads (workspace);
+CREATE INDEX IF NOT EXISTS uploads_by_date ON uploads (started_at);
+CREATE INDEX IF NOT EXISTS uploads_by_name ON uploads (blob_name);
+"""
+
+
+def default_history_path():
+    """Return the location of the shared upload history."""
+    return os.path.join(get_data_dir(), "history.sqlite3")
+
+
+class UploadHistory:
+    """Indexed, batch-written store of upload records."""
+
+    def __init__(self, path=None, batch_size=HISTORY_BATCH_SIZE,
+                 flush_interval=HISTORY_FLUSH_INTERVAL):
+        self.path = path or default_history_path()
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        # One connection shared by upload worker threads, serialized by the lock
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        self._connection.executescript(_SCHEMA)
+        self._buffer = []
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+
+    def record(self, session, workspace, container, path, blob_name, size=None, sha256=None,
+               started_at=None, duration=None, status="uploaded", error=None, bundle=None):
+        """Add one record; it is written with the next batch.
+
+        ``started_at`` is a ``datetime`` and defaults to now. ``bundle`` names
+        the tar blob a bundled file was packed into.
+        """
+        started_at = (started_at or datetime.now()).strftime('%Y-%m-%d %H:%M:%S')
+        row = (session, workspace, container, path, blob_name, size, sha256,
+               started_at, duration, status, error, bundle)
+        with self._lock:
+            self._buffer.append(row)
+            if (len(self._buffer) >= self.batch_size
+                    or time.monotonic() - self._last_flush >= self.flush_interval):
+                self._flush()
+
+    def flush(self):
+        """Write all buffered records."""
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        """Write the buffer in one transaction. Caller holds the lock."""
+        if self._buffer:
+            with self._connection:
+                self._connection.executemany(
+                    f"INSERT INTO uploads ({', '.join(_COLUMNS)}) "
+                    f"VALUES ({', '.join('?' * len(_COLUMNS))})", self._buffer)
+            self._buffer = []
+        self._last_flush = time.monotonic()
+
+    def close(self):
+        """Write the buffered records and close the database, even if the write fails."""
+        with self._lock:
+            try:
+                self._flush()
+            finally:
+                self._connection.close()
+
+    def recent_throughput(self, workspace=None, sessions=5):
+        """Return the average upload rate in bytes/s of the last ``sessions`` sessions, or None.
+
+        A session's rate is the bytes it sent over the time from its first
+        file's start to its last file's end, so parallel uploads count once.
+        """
+        condition, parameters = ("AND workspace = ? ", [workspace]) if workspace is not None else ("", [])
+        with self._lock:
+            self._flush()
+            rows = self._connection.execute(
+                "SELECT SUM(size), (MAX(julianday(started_at) + duration / 86400.0)"
+                " - MIN(julianday(started_at))) * 86400.0 FROM uploads "
+                f"WHERE status IN ('uploaded', 'bundled') {condition}"
+                "GROUP BY session ORDER BY MAX(id) DESC LIMIT ?", parameters + [sessions]).fetchall()
+        # Sessions shorter than a second say little about the link
+        rows = [(size, seconds) for size, seconds in rows if size and seconds and seconds >= 1.0]
+        if not rows:
+            return None
+        return sum(size for size, _ in rows) / sum(seconds for _, seconds in rows)
+
+    def query(self, workspace=None, since=None, until=None, name=None,
+              limit=DEFAULT_PAGE_SIZE, before=None):
+        """Return up to ``limit`` records, newest first, as dicts.
+
+        ``since`` and ``until`` are datetimes bounding the start time (``until``
+        is exclusive). ``name`` is a blob name or a glob pattern such as
+        ``"scans/*.nii"``. For the next page pass ``before`` set to the ``id``
+        of the last record returned.
+        """
+        conditions, parameters = [], []
+        if workspace is not None:
+            conditions.append("workspace = ?")
+            parameters.append(workspace)
+        if since is not None:
+            conditions.append("started_at >= ?")
+            parameters.append(since.strftime('%Y-%m-%d %H:%M:%S'))
+        if until is not None:
+            conditions.append("started_at < ?")
+            parameters.append(until.strftime('%Y-%m-%d %H:%M:%S'))
+        if name is not None:
+            conditions.append("blob_name GLOB ?")
+            parameters.append(name)
+        if before is not None:
+            conditions.append("id < ?")
+            parameters.append(before)
+        where = f"WHERE {' AND '.join(conditions)} " if conditions else ""
+        with self._lock:
+            self._flush()
+            rows = self._connection.execute(
+                f"SELECT id, {', '.join(_COLUMNS)} FROM uploads {where}"
+                "ORDER BY id DESC LIMIT ?", parameters + [limit]).fetchall()
+        return [dict(zip(("id",) + _COLUMNS, row)) for row in rows]
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Checkpoint journal for resumable uploads to a myDRE workspace.
+
+The journal is an append-only JSON-lines file. It records the container
+of the current session, every file that finished uploading and every block
+staged for a large file that has not finished yet. After an interruption a
+new session replays the journal, reuses the container and uploads only
+what is missing. The journal is removed once the container is committed.
+"""
+
+import json
+import os
+import threading
+from datetime import datetime
+
+try:
+    from .paths import get_data_dir, safe_name
+except ImportError:
+    from paths import get_data_dir, safe_name
+
+
+def default_journal_path(workspace_name):
+    """Return the journal location used for a workspace."""
+    return os.path.join(get_data_dir("journals"), f"{safe_name(workspace_name)}.jsonl")
+
+
+class UploadJournal:
+    """Records upload progress on disk so an interrupted session can be resumed."""
+
+    def __init__(self, path):
+        self.path = path
+        self.workspace_name = None
+        self.container_location = None
+        self.created = None
+        self._files = {}   # absolute path -> {"blob_name", "size", "mtime"}
+        self._blocks = {}  # absolute path -> {"size", "mtime", "block_size", "ids"}
+        self._lock = threading.Lock()
+        self._handle = None
+        self._load()
+
+    def _load(self):
+        """Replay the journal file, cutting off a torn last line."""
+        if not os.path.exists(self.path):
+            return
+        good_length = 0
+        with open(self.path, "rb") as journal_file:
+            for line in journal_file:
+                try:
+                    entry = json.loads(line.decode("utf-8"))
+                except ValueError:
+                    break
+                if not line.endswith(b"\n"):
+                    break
+                self._apply(entry)
+                good_length += len(line)
+        if good_length != os.path.getsize(self.path):
+            with open(self.path, "r+b") as journal_file:
+                journal_file.truncate(good_length)
+
+    def _apply(self, entry):
+        event = entry.get("event")
+        if event == "container":
+            self.workspace_name = entry["workspace"]
+            self.container_location = entry["location"]
+            self.created = entry.get("created")
+            self._files = {}
+            self._blocks = {}
+        elif event == "blocks":
+            self._blocks[entry["path"]] = {
+                "size": entry["size"],
+                "mtime": entry["mtime"],
+                "block_size": entry["block_size"],
+                "ids": set(),
+            }
+        elif event == "block":
+            if entry["path"] in self._blocks:
+                self._blocks[entry["path"]]["ids"].add(entry["id"])
+        elif event == "file":
+            self._blocks.pop(entry["path"], None)
+            self._files[entry["path"]] = {
+                "blob_name": entry["blob_name"],
+                "size": entry["size"],
+                "mtime": entry["mtime"],
+            }
+
+    def _write(self, entry, truncate=False):
+        """Apply an entry and append it to the journal file. Caller holds the lock."""
+        self._apply(entry)
+        if truncate and self._handle is not None:
+            self._handle.close()
+            self._handle = None
+        if self._handle is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # The container location is a credential: keep the journal private
+            flags = os.O_WRONLY | os.O_CREAT | (os.O_TRUNC if truncate else os.O_APPEND)
+            self._handle = open(os.open(self.path, flags, 0o600), "w", encoding="utf-8")
+        self._handle.write(json.dumps(entry) + "\n")
+        self._handle.flush()
+
+    def pending(self):
+        """Return ``(workspace_name, created)`` of an uncommitted session, or None."""
+        with self._lock:
+            if not self.container_location:
+                return None
+            return self.workspace_name, self.created
+
+    def completed_files(self):
+        """Return the blob names of all files that finished in the journaled session."""
+        with self._lock:
+            return [info["blob_name"] for info in self._files.values()]
+
+    def start_container(self, workspace_name, location):
+        """Start a new journal for a freshly created container."""
+        with self._lock:
+            self._write({
+                "event": "container",
+                "workspace": workspace_name,
+                "location": location,
+                "created": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            }, truncate=True)
+
+    def is_file_done(self, path, blob_name, size, mtime):
+        """Return True if this exact file version was already uploaded under ``blob_name``."""
+        with self._lock:
+            info = self._files.get(path)
+            return (info is not None and info["blob_name"] == blob_name
+                    and info["size"] == size and info["mtime"] == mtime)
+
+    def mark_file_done(self, path, blob_name, size, mtime):
+        with self._lock:
+            self._write({"event": "file", "path": path, "blob_name": blob_name,
+                         "size": size, "mtime": mtime})
+
+    def resume_blocks(self, path, size, mtime, block_size):
+        """Return ``(block_size, staged_block_ids)`` for a large file.
+
+        If blocks of this file version were staged before, their block size is
+        returned so the same block ids line up; otherwise ``block_size`` is
+        recorded and no blocks are reported as staged.
+        """
+        with self._lock:
+            info = self._blocks.get(path)
+            if info is not None and info["size"] == size and info["mtime"] == mtime:
+                return info["block_size"], set(info["ids"])
+            self._write({"event": "blocks", "path": path, "size": size,
+                         "mtime": mtime, "block_size": block_size})
+            return block_size, set()
+
+    def mark_block_staged(self, path, block_id):
+        with self._lock:
+            self._write({"event": "block", "path": path, "id": block_id})
+
+    def mark_committed(self):
+        """Forget the session; its container has been committed or given up."""
+        with self._lock:
+            self.close()
+            self.workspace_name = None
+            self.container_location = None
+            self.created = None
+            self._files = {}
+            self._blocks = {}
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+    def close(self):
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Upload manifest for myDRE uploads.
+
+The manifest tells the people working in a workspace who uploaded what:
+one entry per file with its name, path in the container, size, SHA-256
+and how long it took. ``Upload`` fills it in memory as files finish and
+sends it as a text file for people and a JSON file for scripts, right
+before the container is committed.
+"""
+
+import json
+import threading
+from datetime import datetime
+
+try:
+    from .progress import format_bytes, format_duration
+except ImportError:
+    from progress import format_bytes, format_duration
+
+# Statuses of files that end up in the container
+INCLUDED_STATUSES = ("uploaded", "bundled", "resumed")
+
+
+def manifest_base_name(user_name):
+    """Return the blob name, without extension, of a user's manifest."""
+    return ''.join(c if c.isalnum() or c in (' ', '_') else '_' for c in user_name)
+
+
+class UploadManifest:
+    """Thread-safe list of the files of one upload, rendered as text and JSON."""
+
+    def __init__(self, user_name, workspace_name):
+        self.user_name = user_name
+        self.workspace_name = workspace_name
+        self.created = datetime.now()
+        self.entries = []
+        self._lock = threading.Lock()
+
+    def add(self, blob_name, size, sha256=None, duration=None, status="uploaded", bundle=None):
+        """Add a finished file; ``blob_name`` is its path in the container."""
+        entry = {
+            "name": blob_name.rsplit("/", 1)[-1],
+            "path": blob_name,
+            "size": size,
+            "sha256": sha256,
+            "duration": None if duration is None else round(duration, 3),
+            "status": status,
+        }
+        if bundle is not None:
+            entry["bundle"] = bundle
+        with self._lock:
+            self.entries.append(entry)
+
+    def _sorted_entries(self):
+        with self._lock:
+            return sorted(self.entries, key=lambda entry: entry["path"])
+
+    def to_text(self):
+        entries = self._sorted_entries()
+        lines = [
+            f"Uploaded by: {self.user_name}",
+            f"Uploaded on: {self.created:%Y-%m-%d %H:%M:%S}",
+            f"Workspace: {self.workspace_name}",
+            f"Files: {len(entries)}, {format_bytes(sum(entry['size'] or 0 for entry in entries))}",
+            "",
+            "List of all the uploaded files:",
+        ]
+        for entry in entries:
+            details = [format_bytes(entry["size"] or 0)]
+            if entry["duration"] is not None:
+                details.append(format_duration(entry["duration"]))
+            if entry.get("bundle"):
+                details.append(f"in {entry['bundle']}")
+            if entry["sha256"]:
+                details.append(f"sha256 {entry['sha256']}")
+            lines.append(f"{entry['path']}  ({', '.join(details)})")
+        return "\n".join(lines) + "\n"
+
+    def to_json(self, container_id=None):
+        entries = self._sorted_entries()
+        return json.dumps({
+            "uploaded_by": self.user_name,
+            "uploaded_on": self.created.isoformat(timespec="seconds"),
+            "workspace": self.workspace_name,
+            "container": container_id,
+            "file_count": len(entries),
+            "total_size": sum(entry["size"] or 0 for entry in entries),
+            "files": entries,
+        }, indent=2) + "\n"
+
+
+def manifest_blob_names(user_name):
+    """Return the blob names of the text and the JSON manifest."""
+    base_name = manifest_base_name(user_name)
+    return f"{base_name}.txt", f"{base_name}.json"
+
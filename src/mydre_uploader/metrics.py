@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Timing and byte counters for myDRE upload sessions.
+
+``UploadMetrics`` collects how long each phase of a session took (container
+creation, key derivation, hashing, reading, blob requests, commit) and one
+record per file. Observers are called with every measurement as it happens.
+At the end of a session the summary can be written as JSON, or as a
+Prometheus textfile for the node exporter's textfile collector.
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+PROMETHEUS_PREFIX = "mydre_upload"
+
+
+def _write_atomically(path, text):
+    """Write a file through a temporary name so readers never see half of it."""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+    with open(temporary_path, "w", encoding="utf-8") as output_file:
+        output_file.write(text)
+    os.replace(temporary_path, path)
+
+
+def _label_text(labels):
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+               for value in labels.values())
+    return ",".join(f'{name}="{value}"' for name, value in zip(labels, escaped))
+
+
+class UploadMetrics:
+    """Thread-safe per-phase and per-file counters of one upload session.
+
+    Phase times are summed over all threads, so with parallel uploads they
+    can add up to more than the session's wall clock time. Only totals are
+    kept unless ``keep_files``, which keeps one record per file for
+    ``summary(include_files=True)``; observers see every file either way.
+    """
+
+    def __init__(self, keep_files=False):
+        self.keep_files = keep_files
+        self.phases = {}  # name -> {"count", "seconds", "bytes"}
+        self.files = []
+        self.file_counts = {}  # status -> number of files
+        self.bytes_uploaded = 0
+        self.started = time.time()
+        self.finished = None
+        self._observers = []
+        self._lock = threading.Lock()
+
+    def add_observer(self, observer):
+        """Call ``observer(event)`` with a dict for every phase and file measured.
+
+        Observers run in the thread that did the work and must be quick.
+        """
+        self._observers.append(observer)
+
+    def _notify(self, event):
+        for observer in self._observers:
+            try:
+                observer(event)
+            except Exception as e:
+                print(f"Warning: metrics observer failed: {e}")
+
+    @contextmanager
+    def phase(self, name, size=0):
+        """Time the ``with`` block as one occurrence of ``name`` that handled ``size`` bytes."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_phase(name, time.perf_counter() - started, size)
+
+    def add_phase(self, name, seconds, size=0):
+        with self._lock:
+            phase = self.phases.setdefault(name, {"count": 0, "seconds": 0.0, "bytes": 0})
+            phase["count"] += 1
+            phase["seconds"] += seconds
+            phase["bytes"] += size
+        self._notify({"event": "phase", "phase": name, "seconds": seconds, "bytes": size})
+
+    def file_done(self, path, blob_name, size, seconds, status):
+        """Count a file that finished with ``status`` (``"uploaded"``, ``"failed"``, ...)."""
+        record = {"path": path, "blob_name": blob_name, "size": size,
+                  "seconds": seconds, "status": status}
+        with self._lock:
+            self.file_counts[status] = self.file_counts.get(status, 0) + 1
+            if status in ("uploaded", "bundled") and size:
+                self.bytes_uploaded += size
+            if self.keep_files:
+                self.files.append(record)
+        self._notify(dict(record, event="file"))
+
+    def finish(self):
+        """Mark the end of the session; ``summary()`` uses it for the duration."""
+        if self.finished is None:
+            self.finished = time.time()
+
+    def summary(self, include_files=False):
+        """Return the session totals as a dict, optionally with the per-file records."""
+        with self._lock:
+            duration = (self.finished or time.time()) - self.started
+            summary = {
+                "started": self.started,
+                "duration": duration,
+                "bytes_uploaded": self.bytes_uploaded,
+                "throughput": self.bytes_uploaded / duration if duration > 0 else 0.0,
+                "files": dict(self.file_counts),
+                "phases": {name: dict(phase) for name, phase in self.phases.items()},
+            }
+            if include_files:
+                summary["file_records"] = list(self.files)
+        return summary
+
+    def write_json(self, path, include_files=True):
+        _write_atomically(path, json.dumps(self.summary(include_files), indent=2) + "\n")
+
+    def prometheus_text(self, labels=None):
+        """Return the summary in the Prometheus text exposition format.
+
+        Values describe the last session, so they are gauges. ``labels`` (e.g.
+        the workspace) are added to every sample.
+        """
+        labels = dict(labels or {})
+        summary = self.summary()
+        lines = []
+
+        def gauge(name, help_text, samples):
+            lines.append(f"# HELP {PROMETHEUS_PREFIX}_{name} {help_text}")
+            lines.append(f"# TYPE {PROMETHEUS_PREFIX}_{name} gauge")
+            for extra_labels, value in samples:
+                label_text = _label_text({**labels, **extra_labels})
+                lines.append(f"{PROMETHEUS_PREFIX}_{name}{{{label_text}}} {value}" if label_text
+                             else f"{PROMETHEUS_PREFIX}_{name} {value}")
+
+        gauge("last_session_start_timestamp_seconds", "Start of the last upload session.",
+              [({}, summary["started"])])
+        gauge("last_session_duration_seconds", "Wall clock time of the last upload session.",
+              [({}, summary["duration"])])
+        gauge("last_session_bytes", "Bytes uploaded in the last session.",
+              [({}, summary["bytes_uploaded"])])
+        gauge("last_session_throughput_bytes_per_second", "Average throughput of the last session.",
+              [({}, summary["throughput"])])
+        gauge("last_session_files", "Files handled in the last session, by outcome.",
+              [({"status": status}, count) for status, count in sorted(summary["files"].items())])
+        phases = sorted(summary["phases"].items())
+        gauge("last_session_phase_seconds", "Time spent per phase, summed over threads.",
+              [({"phase": name}, phase["seconds"]) for name, phase in phases])
+        gauge("last_session_phase_bytes", "Bytes handled per phase.",
+              [({"phase": name}, phase["bytes"]) for name, phase in phases])
+        gauge("last_session_phase_count", "Number of times each phase ran.",
+              [({"phase": name}, phase["count"]) for name, phase in phases])
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path, labels=None):
+        """Write a textfile for the node exporter's textfile collector (``*.prom``)."""
+        _write_atomically(path, self.prometheus_text(labels))
@@ -0,0 +1,23 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Local storage locations for myDRE Uploader.
+
+State kept between sessions (journals, indexes) lives in a per-user data
+directory, ``~/.mydre`` by default. Set ``MYDRE_HOME`` to use another one.
+"""
+
+import os
+
+
+def get_data_dir(*parts):
+    """Return a path inside the user's data directory, creating the directory if needed."""
+    base = os.environ.get("MYDRE_HOME") or os.path.join(os.path.expanduser("~"), ".mydre")
+    directory = os.path.join(base, *parts)
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
+
+def safe_name(name):
+    """Turn a workspace or user name into something usable as a file name."""
+    return ''.join(c if c.isalnum() or c in ('-', '_') else '_' for c in name)
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Progress tracking for myDRE uploads.
+
+Upload workers report every chunk of bytes sent to a ``ProgressTracker``
+from their own threads. A display (the GUI or the command line) reads a
+``snapshot()`` at its own pace, so updates are coalesced no matter how
+often bytes arrive.
+"""
+
+import threading
+import time
+from collections import deque
+
+
+def format_bytes(count):
+    """Return a byte count as a short human readable string, e.g. ``'1.5 GB'``."""
+    for unit in ("B", "KB", "MB", "GB", "TB"):
+        if abs(count) < 1024 or unit == "TB":
+            return f"{count:.0f} {unit}" if unit == "B" else f"{count:.1f} {unit}"
+        count /= 1024
+
+
+def format_duration(seconds):
+    """Return a duration in seconds as ``'1h 02m'``, ``'3m 05s'`` or ``'12s'``."""
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}h {seconds % 3600 // 60:02d}m"
+    if seconds >= 60:
+        return f"{seconds // 60}m {seconds % 60:02d}s"
+    return f"{seconds}s"
+
+
+class ProgressTracker:
+    """Thread-safe byte and file counters with throughput and ETA estimates."""
+
+    def __init__(self, total_bytes=0, total_files=0, window=5.0):
+        self.total_bytes = total_bytes
+        self.total_files = total_files
+        self.bytes_done = 0
+        self.files_done = 0
+        self.files_failed = 0
+        self.current_file = ""
+        self._window = window  # seconds of history used for the throughput
+        self._samples = deque()
+        self._started = time.monotonic()
+        self._lock = threading.Lock()
+
+    def add_total(self, total_bytes=0, total_files=0):
+        """Grow the totals, e.g. while the files to upload are still being listed."""
+        with self._lock:
+            self.total_bytes += total_bytes
+            self.total_files += total_files
+
+    def add_bytes(self, count):
+        with self._lock:
+            self.bytes_done += count
+
+    def file_done(self, result):
+        """Count a finished file; takes an ``Upload.upload_many`` result dict."""
+        with self._lock:
+            self.files_done += 1
+            if not result["success"]:
+                self.files_failed += 1
+            self.current_file = result["blob_name"]
+
+    def snapshot(self):
+        """Return the current counters plus throughput in bytes per second and ETA in seconds.
+
+        ``eta`` is None while the throughput is still unknown.
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._samples.append((now, self.bytes_done))
+            while len(self._samples) > 2 and now - self._samples[0][0] > self._window:
+                self._samples.popleft()
+            first_time, first_bytes = self._samples[0]
+            rate = (self.bytes_done - first_bytes) / (now - first_time) if now > first_time else 0.0
+            remaining = max(self.total_bytes - self.bytes_done, 0)
+            return {
+                "bytes_done": min(self.bytes_done, self.total_bytes) if self.total_bytes else self.bytes_done,
+                "total_bytes": self.total_bytes,
+                "files_done": self.files_done,
+                "files_failed": self.files_failed,
+                "total_files": self.total_files,
+                "current_file": self.current_file,
+                "rate": rate,
+                "eta": remaining / rate if rate > 0 else None,
+                "elapsed": now - self._started,
+            }
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Pre-flight scan of the files an upload session is about to send.
+
+``PreflightScanner`` walks files, directories and glob patterns with a pool
+of threads, one directory listing per task, and fills a ``ScanReport`` as
+results come in: file count and total size, the largest files, blob names
+that more than one file would get (the later upload overwrites the earlier
+one) and files that cannot be read. The report can be looked at while the
+scan is still running, and gives an ETA from the throughput of earlier
+uploads in the upload history.
+"""
+
+import glob
+import heapq
+import os
+import queue
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Handle both package import and direct script execution
+try:
+    from .history import UploadHistory
+except ImportError:
+    from history import UploadHistory
+
+LARGEST_FILES = 10
+
+
+def default_scan_workers():
+    """Listing directories waits on the disk, not the CPU, so use a few threads per core."""
+    return min(32, (os.cpu_count() or 1) * 4)
+
+
+def recent_throughput(workspaces):
+    """Return the upload rate to expect from the history, or None without earlier uploads.
+
+    With several workspaces the slowest one counts.
+    """
+    try:
+        history = UploadHistory()
+        try:
+            rates = [history.recent_throughput(workspace) for workspace in workspaces]
+        finally:
+            history.close()
+    except sqlite3.Error as e:
+        print(f"Warning: Could not read upload history: {e}")
+        return None
+    rates = [rate for rate in rates if rate]
+    return min(rates) if rates else None
+
+
+class ScanReport:
+    """Totals of a scan; safe to read from one thread while another scan fills it."""
+
+    def __init__(self, largest_count=LARGEST_FILES):
+        self.largest_count = largest_count
+        self.files = 0
+        self.bytes = 0
+        self.directories = 0
+        self.unreadable = []  # (path, error)
+        self.collisions = {}  # blob name -> paths of all files that would get it
+        self.done = False
+        self._largest = []  # min-heap of (size, path)
+        self._path_by_name = {}
+        self._lock = threading.Lock()
+
+    def add_files(self, found, directories=0):
+        """Add ``(path, blob_name, size, error)`` tuples; files with an error count as unreadable."""
+        with self._lock:
+            self.directories += directories
+            for path, blob_name, size, error in found:
+                if error is not None:
+                    self.unreadable.append((path, error))
+                    continue
+                self.files += 1
+                self.bytes += size
+                if len(self._largest) < self.largest_count:
+                    heapq.heappush(self._largest, (size, path))
+                elif size > self._largest[0][0]:
+                    heapq.heapreplace(self._largest, (size, path))
+                first_path = self._path_by_name.setdefault(blob_name, path)
+                if first_path != path:
+                    self.collisions.setdefault(blob_name, [first_path]).append(path)
+
+    def largest_files(self):
+        """Return ``[(size, path)]`` of the largest files, largest first."""
+        with self._lock:
+            return sorted(self._largest, reverse=True)
+
+    def eta(self, throughput):
+        """Return the seconds needed to upload everything at ``throughput`` bytes/s, or None."""
+        if not throughput:
+            return None
+        return self.bytes / throughput
+
+    def snapshot(self):
+        """Return the totals so far as a dict; collisions and unreadable files are counted."""
+        with self._lock:
+            return {
+                "files": self.files,
+                "bytes": self.bytes,
+                "directories": self.directories,
+                "collisions": len(self.collisions),
+                "unreadable": len(self.unreadable),
+                "done": self.done,
+            }
+
+
+class PreflightScanner:
+    """Parallel walker that produces the upload entries and a ``ScanReport`` for them.
+
+    Blob names follow ``file2`` and ``mydre-upload``: the base name, or with
+    ``keep_paths`` the path relative to the parent of the directory or glob
+    match the file was found under. Paths containing ``*``, ``?`` or ``[``
+    are glob patterns when ``expand_globs`` is true (command line arguments);
+    paths picked in a file dialog, such as ``data[1].csv``, need it false.
+    """
+
+    def __init__(self, max_workers=None, keep_paths=False, largest_count=LARGEST_FILES,
+                 expand_globs=True):
+        self.max_workers = max_workers or default_scan_workers()
+        self.keep_paths = keep_paths
+        self.expand_globs = expand_globs
+        self.report = ScanReport(largest_count)
+
+    def scan(self, patterns, keep_entries=False):
+        """Scan everything and return the report, with the sorted entries if ``keep_entries``.
+
+        The entries are ``(path, blob_name)`` pairs as taken by ``upload_many``.
+        Unreadable files and directories are included, so that the upload
+        reports them as failed.
+        """
+        entries = []
+        for path, blob_name, _ in self.iter_scan(patterns):
+            if keep_entries:
+                entries.append((path, blob_name))
+        if keep_entries:
+            entries.extend((path, os.path.basename(path)) for path, _ in self.report.unreadable)
+            entries.sort()
+            return self.report, entries
+        return self.report
+
+    def iter_scan(self, patterns):
+        """Yield ``(path, blob_name, size)`` for each readable file as soon as it is found.
+
+        Files come in no particular order. ``self.report`` is updated as the
+        generator is consumed and marked ``done`` when it is exhausted.
+        """
+        results = queue.Queue()
+        outstanding = 0
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+
+            def submit(directory, root):
+                nonlocal outstanding
+                outstanding += 1
+                executor.submit(_list_directory, results, directory, root, self.keep_paths)
+
+            for pattern in patterns:
+                if self.expand_globs and any(char in pattern for char in "*?["):
+                    matches = sorted(glob.glob(pattern, recursive=True)) or [pattern]
+                else:
+                    matches = [pattern]
+                for match in matches:
+                    if os.path.isdir(match):
+                        submit(match, os.path.dirname(os.path.abspath(match)))
+                    else:
+                        yield from self._add([_check_file(match, os.path.basename(match))])
+
+            # Listings come back through a queue in the order they finish
+            while outstanding:
+                found, subdirectories = results.get()
+                outstanding -= 1
+                for directory, root in subdirectories:
+                    submit(directory, root)
+                yield from self._add(found, 1)
+        self.report.done = True
+
+    def _add(self, found, directories=0):
+        self.report.add_files(found, directories)
+        for path, blob_name, size, error in found:
+            if error is None:
+                yield path, blob_name, size
+
+
+def _check_file(path, blob_name, entry=None):
+    """Return ``(path, blob_name, size, error)`` for one file; ``error`` is None if it can be read.
+
+    A ``DirEntry`` from the listing saves a system call on Windows.
+    """
+    try:
+        size = (os.stat(path) if entry is None else entry.stat()).st_size
+    except OSError as e:
+        return path, blob_name, None, e.strerror or str(e)
+    if not os.access(path, os.R_OK):
+        return path, blob_name, size, "permission denied"
+    return path, blob_name, size, None
+
+
+def _list_directory(results, directory, root, keep_paths):
+    """List one directory and put ``(files, subdirectories)`` on ``results``.
+
+    Something is always put, so the scan never waits for a listing that failed;
+    a directory that cannot be listed is reported as an unreadable file.
+    """
+    found, subdirectories = [], []
+    try:
+        with os.scandir(directory) as entries:
+            entries = list(entries)
+    except Exception as e:
+        results.put(([(directory, os.path.basename(directory), None,
+                       getattr(e, "strerror", None) or str(e))], []))
+        return
+    for entry in entries:
+        try:
+            is_directory = entry.is_dir()
+        except OSError:
+            is_directory = False
+        if is_directory:
+            # Like os.walk, links to directories are not followed
+            if not entry.is_symlink():
+                subdirectories.append((entry.path, root))
+            continue
+        if keep_paths:
+            blob_name = os.path.relpath(os.path.abspath(entry.path), root).replace(os.sep, "/")
+        else:
+            blob_name = entry.name
+        found.append(_check_file(entry.path, blob_name, entry))
+    results.put((found, subdirectories))
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Startup time measurement for the myDRE desktop tools.
+
+Start a tool with ``--startup-time`` (or ``--startup-time=FILE``) and it
+reports how long it took until its window was drawn, and which heavy
+libraries were imported by then, as one JSON line on standard output or
+appended to FILE, and quits. ``benchmarks/bench_startup.py`` runs this
+repeatedly to catch regressions. Import this module first, so that its
+clock starts before the tool's own imports.
+"""
+
+import json
+import sys
+import time
+
+STARTED = time.perf_counter()
+STARTUP_OPTION = "--startup-time"
+# Libraries that the window must not wait for; they are loaded on first use
+HEAVY_MODULES = ("requests", "urllib3", "azure", "cryptography", "aiohttp")
+
+
+def startup_timer(tool, argv=None):
+    """Return a ``StartupTimer`` if ``argv`` (default: ``sys.argv``) asks for one, else None."""
+    argv = sys.argv[1:] if argv is None else argv
+    for argument in argv:
+        if argument == STARTUP_OPTION:
+            return StartupTimer(tool)
+        if argument.startswith(STARTUP_OPTION + "="):
+            return StartupTimer(tool, argument.split("=", 1)[1])
+    return None
+
+
+def heavy_modules_loaded():
+    """Return the names in ``HEAVY_MODULES`` that are already imported."""
+    return [name for name in HEAVY_MODULES if name in sys.modules]
+
+
+class StartupTimer:
+    """Records when a tool's window was first drawn and reports it."""
+
+    def __init__(self, tool, output_path=None):
+        self.tool = tool
+        self.output_path = output_path
+        self.marks = {"imports": time.perf_counter() - STARTED}
+
+    def mark(self, name):
+        self.marks[name] = time.perf_counter() - STARTED
+
+    def watch(self, root):
+        """Report once ``root`` has been drawn by the event loop, then close it."""
+
+        def shown():
+            root.update()
+            self.mark("window")
+            self.report()
+            root.destroy()
+
+        root.after(0, shown)
+
+    def report(self):
+        record = {
+            "tool": self.tool,
+            "seconds": {name: round(seconds, 4) for name, seconds in self.marks.items()},
+            "heavy_modules": heavy_modules_loaded(),
+            "frozen": bool(getattr(sys, "frozen", False)),
+            "python": sys.version.split()[0],
+        }
+        line = json.dumps(record)
+        if self.output_path:
+            with open(self.output_path, "a", encoding="utf-8") as output_file:
+                output_file.write(line + "\n")
+        else:
+            print(line, flush=True)
+        return record
@@ -7,44 +7,279 @@ This module handles the secure file upload process to myDRE workspaces.
 """
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from datetime import datetime
-from azure.storage.blob import ContainerClient
-from cryptography.fernet import Fernet
-from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+from azure.core.exceptions import ResourceNotFoundError
+from azure.core.pipeline.transport import RequestsTransport
+from azure.storage.blob import BlobBlock, ContainerClient, ContentSettings, LinearRetry
 import base64
+import hashlib
+import itertools
 import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import urlparse
 
-def derive_key(pin):
-    kdf = PBKDF2HMAC(
-        algorithm=hashes.SHA256(),
-        length=32,
-        salt=b'static_salt',
-        iterations=100000,
-    )
-    key = base64.urlsafe_b64encode(kdf.derive(pin.encode()))
-    return key
+# Handle both package import and direct script execution
+try:
+    from .config import REQUIRED_KEYS, KeyCache, decrypt_config, decrypt_data, derive_key, load_config
+    from .journal import UploadJournal
+    from .history import UploadHistory
+    from .metrics import UploadMetrics
+    from .manifest import INCLUDED_STATUSES, UploadManifest, manifest_blob_names
+    from .concurrency import ControlledAdapter
+    from .compression import (GZIP_ENCODING, GZIP_SUFFIX, compression_metadata,
+                              default_compression_workers, iter_compressed_blocks, should_compress)
+    from .bundler import (DEFAULT_BUNDLE_SIZE, INDEX_SUFFIX, BlockStager, bundle_index,
+                          small_file_size, write_bundle)
+except ImportError:
+    from config import REQUIRED_KEYS, KeyCache, decrypt_config, decrypt_data, derive_key, load_config
+    from journal import UploadJournal
+    from history import UploadHistory
+    from metrics import UploadMetrics
+    from manifest import INCLUDED_STATUSES, UploadManifest, manifest_blob_names
+    from concurrency import ControlledAdapter
+    from compression import (GZIP_ENCODING, GZIP_SUFFIX, compression_metadata,
+                             default_compression_workers, iter_compressed_blocks, should_compress)
+    from bundler import (DEFAULT_BUNDLE_SIZE, INDEX_SUFFIX, BlockStager, bundle_index,
+                         small_file_size, write_bundle)
 
-def decrypt_data(encrypted_data, key):
-    f = Fernet(key)
-    return f.decrypt(encrypted_data.encode()).decode()
+API_BASE_URL = 'https://andreanl-api-management.azure-api.net/v1'
+DEFAULT_MAX_WORKERS = 8
+
+MiB = 1024 * 1024
+# Files at or above this size are split into blocks and staged in parallel
+LARGE_FILE_THRESHOLD = 64 * MiB
+MIN_BLOCK_SIZE = 4 * MiB
+MAX_AUTO_BLOCK_SIZE = 32 * MiB
+MAX_BLOCKS_PER_BLOB = 50000  # Azure limit on committed blocks per blob
+MAX_BLOCK_SIZE = 4000 * MiB  # Azure limit on the size of one block
+MAX_BLOCK_CONCURRENCY = 16
+# File data one session may hold in memory at once, over all files and blocks in flight
+DEFAULT_MAX_BUFFERED_BYTES = 512 * MiB
+# Blob metadata key holding the SHA-256 of the original file content
+SHA256_METADATA_KEY = "mydre_sha256"
+# With a concurrency controller, throttled requests are retried after this many seconds
+# (plus up to as much jitter) instead of the SDK's default of about 15: the controller
+# already cuts the requests in flight, so a long back-off would only stall the upload
+CONTROLLED_RETRY_BACKOFF = 0.5
+CONTROLLED_RETRY_TOTAL = 10
+
+def auto_block_size(file_size):
+    """Pick a block size for a file: about 2000 blocks, in whole MiB, within Azure's limits."""
+    block_size = -(-file_size // 2000)
+    block_size = min(max(block_size, MIN_BLOCK_SIZE), MAX_AUTO_BLOCK_SIZE)
+    # Very large files must still fit in the maximum number of blocks
+    block_size = max(block_size, -(-file_size // MAX_BLOCKS_PER_BLOB))
+    return -(-block_size // MiB) * MiB
+
+def check_block_size(file_size, block_size):
+    """Raise ``ValueError`` if a file cannot be uploaded in blocks of ``block_size`` bytes."""
+    if not 0 < block_size <= MAX_BLOCK_SIZE:
+        raise ValueError(f"block size must be between 1 byte and {MAX_BLOCK_SIZE // MiB} MiB")
+    if -(-file_size // block_size) > MAX_BLOCKS_PER_BLOB:
+        raise ValueError(f"a {file_size}-byte file needs more than {MAX_BLOCKS_PER_BLOB} blocks "
+                         f"of {block_size} bytes; use a block size of at least "
+                         f"{-(-file_size // MAX_BLOCKS_PER_BLOB)} bytes")
+
+def auto_block_concurrency(file_size):
+    """Pick how many blocks of one file are staged at the same time."""
+    return min(MAX_BLOCK_CONCURRENCY, max(2, file_size // (64 * MiB)))
+
+def make_block_id(index):
+    """Return the block id for the block at ``index``; all ids of a blob have the same length."""
+    return base64.b64encode(f"{index:08d}".encode()).decode()
+
+def _wait_for_room(pending, limit):
+    """Wait until fewer than ``limit`` futures are pending, re-raising any failure."""
+    while len(pending) >= limit:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            future.result()
+    return pending
+
+class BufferBudget:
+    """Limit on the bytes of file data held in memory by all transfers of a session.
+
+    ``acquire`` waits until ``count`` more bytes fit. A request larger than
+    the whole budget is let through once nothing else is held, so it cannot
+    wait forever. Safe to use from many threads.
+    """
+
+    def __init__(self, limit=DEFAULT_MAX_BUFFERED_BYTES):
+        self.limit = limit
+        self.used = 0
+        self._condition = threading.Condition()
+
+    def acquire(self, count):
+        with self._condition:
+            while self.used and self.used + count > self.limit:
+                self._condition.wait()
+            self.used += count
+
+    def release(self, count):
+        with self._condition:
+            self.used -= count
+            self._condition.notify_all()
+
+    def release_when_done(self, futures, count):
+        """Release ``count`` bytes once all ``futures`` have finished, whether they failed or not."""
+        if not futures:
+            self.release(count)
+            return
+        remaining = [len(futures)]
+
+        def finished(_):
+            with self._condition:
+                remaining[0] -= 1
+                if remaining[0]:
+                    return
+                self.used -= count
+                self._condition.notify_all()
+
+        for future in futures:
+            future.add_done_callback(finished)
 
 class Upload:
     """Handles secure file uploads to myDRE workspace."""
-    def __init__(self, ws_name, ws_description, ws_key, tenant_key, user_name):
+    def __init__(self, ws_name, ws_description, ws_key, tenant_key, user_name,
+                 max_workers=DEFAULT_MAX_WORKERS, block_size=None, max_block_concurrency=None,
+                 journal_path=None, progress_callback=None, dedup_index=None, dedup_policy="skip",
+                 compression=None, bundle_threshold=None, bundle_size=DEFAULT_BUNDLE_SIZE,
+                 history=None, metrics=None, concurrency_controller=None, bandwidth_limiter=None,
+                 manifest=False, max_buffered_bytes=DEFAULT_MAX_BUFFERED_BYTES):
         self.workspace_name = ws_name
         self.workspace_description = ws_description
         self.workspace_key = ws_key
         self.tenant_key = tenant_key
         self.uploader = user_name 
-        self.BASE_URL = 'https://andreanl-api-management.azure-api.net/v1'
+        self.BASE_URL = API_BASE_URL
         self.container_location = ''
         self.uploaded_files = []  # Keep track of uploaded files
-        self.log_file_path = os.path.join(os.path.dirname(__file__), 'upload_log.txt')
-        
+        self.max_workers = max_workers
+        if block_size is not None:
+            check_block_size(0, block_size)
+        self.block_size = block_size  # None picks a size per file
+        self.max_block_concurrency = max_block_concurrency  # None picks a value per file
+        self._lock = threading.Lock()
+        # Read-ahead of every file in flight comes out of one budget, so parallel
+        # large files cannot add up to gigabytes of buffered blocks
+        self.buffer_budget = BufferBudget(max_buffered_bytes)
+        # Optional checkpoint journal that lets an interrupted session resume
+        self.journal = UploadJournal(journal_path) if journal_path else None
+        # Called from worker threads with the number of bytes just sent
+        self.progress_callback = progress_callback
+        # Optional DedupIndex; files whose content was already committed to this
+        # workspace are skipped ("skip"), uploaded but flagged ("flag") or just
+        # uploaded ("upload"). All uploads are recorded in the index.
+        self.dedup_index = dedup_index
+        self.dedup_policy = dedup_policy
+        # "auto" gzips files whose samples compress well; None sends raw bytes
+        self.compression = compression
+        self._compression_executor = None
+        # Optional AIMDController that adapts how many requests are in flight;
+        # worker counts then only bound it from above
+        self.concurrency_controller = concurrency_controller
+        # Optional BandwidthLimiter shared by all transfers of this session
+        self.bandwidth_limiter = bandwidth_limiter
+        # upload_many packs files smaller than bundle_threshold bytes into tar
+        # bundles of about bundle_size bytes; None uploads every file on its own
+        self.bundle_threshold = bundle_threshold
+        self.bundle_size = bundle_size
+        self._bundle_prefix = f'bundle-{datetime.now():%Y%m%d-%H%M%S}'
+        self._bundle_count = 0
+        # One pooled HTTP session for the API and the blob endpoint, kept for the
+        # lifetime of this instance so connections are reused between files
+        self.session = self._create_session()
+        self._container_client = None
+        # Every file handled is recorded in the upload history; by default the
+        # shared store in the user's data directory, closed with this session
+        self._owns_history = history is None
+        self.history = UploadHistory() if history is None else history
+        self.session_id = uuid.uuid4().hex
+        # Per-phase timings and byte counts; pass an UploadMetrics to observe them
+        self.metrics = UploadMetrics() if metrics is None else metrics
+        # With manifest=True the files that reach the container are listed in
+        # memory and the list is uploaded as <user>.txt and <user>.json on commit
+        self.manifest = UploadManifest(user_name, ws_name) if manifest else None
+
         # Get the path to the favicon
         self.icon_path = os.path.join(os.path.dirname(__file__), '..', '..', 'assets', 'favicon.ico')
 
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _create_session(self):
+        """Create the HTTP session, its pool sized to the most requests in flight at once."""
+        pool_size = self.max_workers * (self.max_block_concurrency or MAX_BLOCK_CONCURRENCY)
+        if self.concurrency_controller is not None:
+            pool_size = max(pool_size, self.concurrency_controller.max_limit)
+        # Retries are left to the Azure SDK's own retry policy
+        adapter_options = dict(pool_connections=4, pool_maxsize=pool_size,
+                               max_retries=Retry(total=False, redirect=False, raise_on_status=False))
+        if self.concurrency_controller is not None or self.bandwidth_limiter is not None:
+            adapter = ControlledAdapter(self.concurrency_controller, self.bandwidth_limiter,
+                                        **adapter_options)
+        else:
+            adapter = HTTPAdapter(**adapter_options)
+        session = requests.Session()
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    def _get_container_client(self):
+        """Return the blob container client of this session, shared by all uploads."""
+        with self._lock:
+            if self._container_client is None:
+                transport = RequestsTransport(session=self.session, session_owner=False)
+                options = {}
+                if self.concurrency_controller is not None:
+                    options["retry_policy"] = LinearRetry(
+                        backoff=CONTROLLED_RETRY_BACKOFF, random_jitter_range=CONTROLLED_RETRY_BACKOFF,
+                        retry_total=CONTROLLED_RETRY_TOTAL)
+                self._container_client = ContainerClient.from_container_url(
+                    self.container_location, transport=transport, **options)
+            return self._container_client
+
+    def _reset_container_client(self):
+        with self._lock:
+            if self._container_client is not None:
+                self._container_client.close()
+                self._container_client = None
+
+    def _get_compression_executor(self):
+        """Return the thread pool shared by all files for compressing chunks."""
+        with self._lock:
+            if self._compression_executor is None:
+                self._compression_executor = ThreadPoolExecutor(
+                    max_workers=default_compression_workers())
+            return self._compression_executor
+
+    def close(self):
+        """Release the pooled connections held by this session."""
+        self._reset_container_client()
+        self.session.close()
+        if self._compression_executor is not None:
+            self._compression_executor.shutdown()
+            self._compression_executor = None
+        if self.journal is not None:
+            self.journal.close()
+        try:
+            if self._owns_history:
+                self.history.close()
+            else:
+                self.history.flush()
+        except sqlite3.Error as e:
+            # e.g. the database is locked by another process; the session itself is done
+            print(f"Warning: Could not write to upload history: {e}")
+
     def getHeaders(self):
         return {
             'Api-Key': self.workspace_key,
@@ -53,65 +288,547 @@ class Upload:
 
     def _make_request(self, method, endpoint, data=None):
         url = f"{self.BASE_URL}{endpoint}"
-        response = requests.request(str(method).upper(), url, headers=self.getHeaders(), json=data) 
+        response = self.session.request(str(method).upper(), url, headers=self.getHeaders(), json=data)
         response.raise_for_status()
         return response
 
-    def create_workspace_container(self):
+    def create_workspace_container(self, resume=False):
+        """Create the upload container for this session.
+
+        With ``resume=True`` and a journal holding an uncommitted container of
+        this workspace, that container is reused instead and files recorded as
+        finished are not uploaded again.
+        """
+        if resume and self.journal is not None:
+            pending = self.journal.pending()
+            if pending is not None and pending[0] == self.workspace_name:
+                self._reset_container_client()
+                self.container_location = self.journal.container_location
+                self.uploaded_files = self.journal.completed_files()
+                return
+
         timestamp = f'{datetime.now():%Y%m%d %H%M%S}'
         title = f'{timestamp} {self.workspace_name}'
         endpoint = f"/api/workspace/{self.workspace_name}/files/containers"
         url = f"{self.BASE_URL}{endpoint}"
     
         params = {'title': title}
-        response = requests.post(url, headers=self.getHeaders(), params=params)
-        response.raise_for_status()  
+        with self.metrics.phase("create_container"):
+            response = self.session.post(url, headers=self.getHeaders(), params=params)
+            response.raise_for_status()
+        self._reset_container_client()
         self.container_location = response.headers['Location']
         self.uploaded_files = []  # Reset uploaded files list
+        if self.journal is not None:
+            self.journal.start_container(self.workspace_name, self.container_location)
         
+    def upload_manifest(self):
+        """Upload the manifest of the files handled so far, as text and as JSON."""
+        container_client = self._get_container_client()
+        text_name, json_name = manifest_blob_names(self.uploader)
+        documents = [
+            (text_name, self.manifest.to_text(), "text/plain; charset=utf-8"),
+            (json_name, self.manifest.to_json(self.container_id), "application/json"),
+        ]
+        for blob_name, document, content_type in documents:
+            data = document.encode("utf-8")
+            with self.metrics.phase("manifest", len(data)):
+                container_client.upload_blob(blob_name, data, overwrite=True, validate_content=True,
+                                             content_settings=ContentSettings(content_type=content_type))
+        with self._lock:
+            self.uploaded_files.extend(name for name, _, _ in documents
+                                       if name not in self.uploaded_files)
+
+    def discard_workspace_container(self):
+        """Leave the current container uncommitted, e.g. because nothing was sent to it.
+
+        The journal forgets it, so it is not offered for resuming.
+        """
+        if self.journal is not None:
+            self.journal.mark_committed()
+
     def commit_workspace_container(self):
         container_identifier = self.container_location.rsplit('/', 1)[-1]
         endpoint = f"/api/workspace/{self.workspace_name}/files/containers/{container_identifier}"
         url = f"{self.BASE_URL}{endpoint}"
     
-        response = requests.patch(url, headers=self.getHeaders())
-        response.raise_for_status()
+        if self.manifest is not None:
+            self.upload_manifest()
+        with self.metrics.phase("commit"):
+            response = self.session.patch(url, headers=self.getHeaders())
+            response.raise_for_status()
+        self.metrics.finish()
+        if self.journal is not None:
+            self.journal.mark_committed()
+        if self.dedup_index is not None:
+            self.dedup_index.mark_committed(self.workspace_name, self.container_id)
         return response
 
-    def file2(self, local_file_path):
+    @property
+    def container_id(self):
+        """Identifier of the current container, taken from its location URL."""
+        return urlparse(self.container_location).path.rsplit('/', 1)[-1]
+
+    def file2(self, local_file_path, blob_name=None):
+        """Upload one file and return a dict describing what happened to it.
+
+        The dict holds ``blob_name``, ``size``, ``sha256`` (when known),
+        ``duplicate_of`` (the earlier upload of the same content, if any) and
+        ``status``: ``"uploaded"``, ``"resumed"`` (finished in an interrupted
+        run of this session) or ``"skipped"`` (content already in the workspace).
+        The outcome, including a failure, is recorded in the upload history.
+        """
+        started_at, started = datetime.now(), time.monotonic()
+        try:
+            info = self._upload_file(local_file_path, blob_name)
+        except Exception as e:
+            self._record(local_file_path, blob_name or os.path.basename(local_file_path),
+                         started_at, time.monotonic() - started, status="failed", error=str(e))
+            raise
+        self._record(local_file_path, info["blob_name"], started_at, time.monotonic() - started,
+                     size=info["size"], sha256=info["sha256"], status=info["status"])
+        return info
+
+    def _upload_file(self, local_file_path, blob_name):
         # Check if file exists before proceeding
         if not os.path.exists(local_file_path):
             raise FileNotFoundError(f"File not found: {local_file_path}")
             
-        file_name = os.path.basename(local_file_path)
-        # Log the file before upload
-        self._log_upload(file_name)
-        
-        container_client = ContainerClient.from_container_url(self.container_location)
-        with open(local_file_path, "rb") as file_to_upload:
-            container_client.upload_blob(file_name, file_to_upload, overwrite=True)
+        file_name = blob_name or os.path.basename(local_file_path)
+        source = os.path.abspath(local_file_path)
+        stat = os.stat(local_file_path)
+        compress = self.compression == "auto" and should_compress(source, stat.st_size)
+        original_name = file_name
+        if compress:
+            file_name += GZIP_SUFFIX
+        info = {"blob_name": file_name, "size": stat.st_size, "sha256": None,
+                "duplicate_of": None, "status": "uploaded",
+                "encoding": GZIP_ENCODING if compress else None}
+        if self.journal is not None and self.journal.is_file_done(
+                source, file_name, stat.st_size, stat.st_mtime):
+            # Finished in an earlier, interrupted run of this session
+            self._report_bytes(stat.st_size)
+            info["status"] = "resumed"
+            return info
+
+        if self.dedup_index is not None and self._check_duplicate(source, stat, file_name, info):
+            self._report_bytes(stat.st_size)
+            info["status"] = "skipped"
+            return info
+
+        container_client = self._get_container_client()
+        blob_client = container_client.get_blob_client(file_name)
+        if compress:
+            sha256 = self._upload_compressed(blob_client, source, original_name, stat.st_size)
+        elif stat.st_size >= LARGE_FILE_THRESHOLD:
+            sha256 = self._upload_blocks(blob_client, source, stat.st_size, stat.st_mtime)
+        else:
+            sha256 = self._upload_single(blob_client, source, stat.st_size)
+        if info["sha256"] is not None and info["sha256"] != sha256:
+            print(f"Warning: {local_file_path} changed while it was being uploaded")
+        info["sha256"] = sha256
+        if self.journal is not None:
+            self.journal.mark_file_done(source, file_name, stat.st_size, stat.st_mtime)
+        if self.dedup_index is not None:
+            self.dedup_index.remember_hash(source, stat, sha256)
+            if info["duplicate_of"] is None:
+                info["duplicate_of"] = self.dedup_index.find_upload(sha256, self.workspace_name,
+                                                                    file_name)
+            self.dedup_index.record_upload(sha256, stat.st_size, self.workspace_name,
+                                           self.container_id, file_name)
+        with self._lock:
             self.uploaded_files.append(file_name)
+        return info
+
+    def _check_duplicate(self, source, stat, blob_name, info):
+        """Look up earlier uploads of a file's content into ``info``; True if it should be skipped.
+
+        Only a committed upload under the same blob name is skipped. The same
+        content under another name, e.g. a renamed copy, is uploaded and
+        flagged through ``duplicate_of``; empty files never match.
+        """
+        info["sha256"] = self.dedup_index.cached_hash(source, stat)
+        if (info["sha256"] is None and self.dedup_policy == "skip" and stat.st_size
+                and self.dedup_index.has_upload(stat.st_size, self.workspace_name, blob_name)):
+            # Skipping must be decided before sending anything, which takes an
+            # extra read, but only for files that match an earlier upload by name
+            # and size; all others use the hash taken while uploading
+            with self.metrics.phase("hash", stat.st_size):
+                info["sha256"] = self.dedup_index.file_hash(source, stat)
+        if info["sha256"] is not None:
+            info["duplicate_of"] = self.dedup_index.find_upload(info["sha256"], self.workspace_name,
+                                                                blob_name)
+        return (self.dedup_policy == "skip" and info["duplicate_of"] is not None
+                and info["duplicate_of"]["blob_name"] == blob_name)
+
+    def _upload_single(self, blob_client, local_file_path, file_size):
+        """Upload a file in one request; returns the SHA-256 of its content.
+
+        The file is read once: that read is hashed and sent. The SDK adds a
+        Content-MD5 header that the service checks.
+        """
+        sent = [0]
+
+        def progress_hook(current, total):
+            self._report_bytes(current - sent[0])
+            sent[0] = current
+
+        self.buffer_budget.acquire(file_size)
+        try:
+            with self.metrics.phase("read", file_size), open(local_file_path, "rb") as file_to_upload:
+                data = file_to_upload.read()
+            sha256 = hashlib.sha256(data).hexdigest()
+            with self.metrics.phase("put", len(data)):
+                blob_client.upload_blob(data, overwrite=True, validate_content=True,
+                                        metadata={SHA256_METADATA_KEY: sha256},
+                                        progress_hook=progress_hook)
+        finally:
+            self.buffer_budget.release(file_size)
+        self._report_bytes(len(data) - sent[0])
+        return sha256
+
+    def _upload_blocks(self, blob_client, local_file_path, file_size, mtime):
+        """Upload a large file as blocks staged in parallel, then commit the block list.
+
+        The file is read sequentially in the calling thread; at most twice the
+        concurrency in blocks is held in memory at any time, and no more than
+        the session's buffer budget allows. Each block is
+        hashed into the file's SHA-256 as it is read and sent with a Content-MD5.
+        Blocks the journal and the service both know as staged are not sent
+        again, but still read for the hash. Returns the SHA-256. A file that
+        changes size while it is read fails instead of being committed short
+        or cut off.
+        """
+        block_size = self.block_size or auto_block_size(file_size)
+        check_block_size(file_size, block_size)
+        concurrency = self.max_block_concurrency or auto_block_concurrency(file_size)
+        staged = set()
+        if self.journal is not None:
+            block_size, staged = self.journal.resume_blocks(local_file_path, file_size, mtime, block_size)
+        if staged:
+            # The service discards uncommitted blocks after a while
+            try:
+                _, uncommitted = blob_client.get_block_list('uncommitted')
+                staged &= {block.id for block in uncommitted}
+            except ResourceNotFoundError:
+                staged = set()
+
+        block_ids = [make_block_id(index) for index in range(-(-file_size // block_size))]
+        digest = hashlib.sha256()
+        pending = set()
+        with open(local_file_path, "rb") as file_to_upload, \
+                ThreadPoolExecutor(max_workers=concurrency) as executor:
+            for index, block_id in enumerate(block_ids):
+                size = min(block_size, file_size - index * block_size)
+                self.buffer_budget.acquire(size)
+                try:
+                    with self.metrics.phase("read", size):
+                        data = file_to_upload.read(size)
+                    if len(data) != size:
+                        raise OSError(f"{local_file_path} shrank while it was being uploaded")
+                except BaseException:
+                    self.buffer_budget.release(size)
+                    raise
+                digest.update(data)
+                if block_id in staged:
+                    self.buffer_budget.release(size)
+                    self._report_bytes(len(data))
+                    continue
+                try:
+                    future = executor.submit(self._stage_block, blob_client, local_file_path,
+                                             block_id, data)
+                except BaseException:
+                    self.buffer_budget.release(size)
+                    raise
+                self.buffer_budget.release_when_done([future], size)
+                pending.add(future)
+                pending = _wait_for_room(pending, concurrency * 2)
+            _wait_for_room(pending, 1)
+            if file_to_upload.read(1):
+                raise OSError(f"{local_file_path} grew while it was being uploaded")
+        sha256 = digest.hexdigest()
+        with self.metrics.phase("put"):
+            blob_client.commit_block_list([BlobBlock(block_id=block_id) for block_id in block_ids],
+                                          metadata={SHA256_METADATA_KEY: sha256})
+        return sha256
+
+    def _upload_compressed(self, blob_client, local_file_path, original_name, file_size):
+        """Upload a file gzip-compressed on the fly.
+
+        Compressed output goes up in a single request if it fits in one block,
+        otherwise as blocks staged in parallel. Blob metadata records the
+        encoding and the original name, size and SHA-256, which is computed
+        from the same read and returned.
+        """
+        block_size = self.block_size or auto_block_size(file_size)
+        # Compressed data is rarely larger, so the original size bounds the block count
+        check_block_size(file_size, block_size)
+        concurrency = self.max_block_concurrency or auto_block_concurrency(file_size)
+        metadata = compression_metadata(original_name, file_size)
+        content_settings = ContentSettings(content_type="application/gzip")
+        digest = hashlib.sha256()
+        with open(local_file_path, "rb") as file_to_upload:
+            blocks = iter_compressed_blocks(file_to_upload, self._get_compression_executor(),
+                                            block_size, max_pending=concurrency * 2, digest=digest)
+            first_blocks = list(itertools.islice(blocks, 2))
+            if len(first_blocks) == 1:
+                data, raw_size = first_blocks[0]
+                metadata[SHA256_METADATA_KEY] = digest.hexdigest()
+                with self.metrics.phase("put", len(data)):
+                    blob_client.upload_blob(data, overwrite=True, metadata=metadata,
+                                            content_settings=content_settings,
+                                            validate_content=True)
+                self._report_bytes(raw_size)
+                return metadata[SHA256_METADATA_KEY]
+
+            block_ids = []
+            pending = set()
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                for data, raw_size in itertools.chain(first_blocks, blocks):
+                    block_id = make_block_id(len(block_ids))
+                    block_ids.append(block_id)
+                    # The block is already in memory; waiting here holds back the next one
+                    self.buffer_budget.acquire(len(data))
+                    try:
+                        future = executor.submit(self._stage_block, blob_client, None,
+                                                 block_id, data, raw_size)
+                    except BaseException:
+                        self.buffer_budget.release(len(data))
+                        raise
+                    self.buffer_budget.release_when_done([future], len(data))
+                    pending.add(future)
+                    pending = _wait_for_room(pending, concurrency * 2)
+                _wait_for_room(pending, 1)
+        metadata[SHA256_METADATA_KEY] = digest.hexdigest()
+        with self.metrics.phase("put"):
+            blob_client.commit_block_list([BlobBlock(block_id=block_id) for block_id in block_ids],
+                                          metadata=metadata, content_settings=content_settings)
+        return metadata[SHA256_METADATA_KEY]
+
+    def _stage_block(self, blob_client, local_file_path, block_id, data, raw_size=None):
+        """Stage one block; ``raw_size`` is the source bytes it stands for if it was compressed."""
+        with self.metrics.phase("put", len(data)):
+            blob_client.stage_block(block_id, data, length=len(data), validate_content=True)
+        if self.journal is not None and local_file_path is not None:
+            self.journal.mark_block_staged(local_file_path, block_id)
+        self._report_bytes(len(data) if raw_size is None else raw_size)
+
+    def _upload_bundle(self, members):
+        """Upload small files packed into one tar blob, with a JSON index next to it.
+
+        ``members`` is a list of ``(path, blob_name)``; the blob names become
+        the names inside the tar. Returns one outcome per member: a dict like
+        the one from ``file2``, with the status ``"bundled"`` and the name of
+        the ``bundle``, or the exception that made that member fail.
+        """
+        started_at, started = datetime.now(), time.monotonic()
+        outcomes = [None] * len(members)
+        to_pack = []
+        for position, (local_file_path, arcname) in enumerate(members):
+            try:
+                source = os.path.abspath(local_file_path)
+                stat = os.stat(local_file_path)
+                info = {"blob_name": arcname, "size": stat.st_size, "sha256": None,
+                        "duplicate_of": None, "status": "bundled", "encoding": None,
+                        "bundle": None}
+                outcomes[position] = info
+                if self.journal is not None and self.journal.is_file_done(
+                        source, arcname, stat.st_size, stat.st_mtime):
+                    self._report_bytes(stat.st_size)
+                    info["status"] = "resumed"
+                    continue
+                if self.dedup_index is not None and self._check_duplicate(source, stat, arcname, info):
+                    self._report_bytes(stat.st_size)
+                    info["status"] = "skipped"
+                    continue
+                to_pack.append((position, source, stat))
+            except OSError as e:
+                outcomes[position] = e
+        if not to_pack:
+            self._record_bundle(members, outcomes, started_at, started)
+            return outcomes
 
-    def _log_upload(self, file_name):
-        """Log uploaded file with timestamp to a text file."""
-        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        log_entry = f"{timestamp} - Preparing to upload: {file_name} to workspace: {self.workspace_name}\n"
+        with self._lock:
+            self._bundle_count += 1
+            bundle_name = f"{self._bundle_prefix}-{self._bundle_count:05d}.tar"
         try:
-            with open(self.log_file_path, 'a', encoding='utf-8') as log_file:
-                log_file.write(log_entry)
+            container_client = self._get_container_client()
+            stager = BlockStager(container_client.get_blob_client(bundle_name), make_block_id)
+            # Reading the members and staging the tar blocks are interleaved
+            with self.metrics.phase("bundle", sum(stat.st_size for _, _, stat in to_pack)):
+                entries = write_bundle(stager, [(source, members[position][1])
+                                                for position, source, _ in to_pack])
+                stager.commit(content_settings=ContentSettings(content_type="application/x-tar"),
+                              metadata={SHA256_METADATA_KEY: stager.digest.hexdigest()})
+            container_client.upload_blob(bundle_name + INDEX_SUFFIX,
+                                         bundle_index(bundle_name, entries), overwrite=True,
+                                         content_settings=ContentSettings(content_type="application/json"))
         except Exception as e:
-            print(f"Warning: Could not write to log file: {e}")
+            for position, _, _ in to_pack:
+                outcomes[position] = e
+            self._record_bundle(members, outcomes, started_at, started)
+            return outcomes
+
+        for (position, source, stat), entry in zip(to_pack, entries):
+            info = outcomes[position]
+            info["bundle"] = bundle_name
+            info["sha256"] = entry["sha256"]
+            if self.journal is not None:
+                self.journal.mark_file_done(source, entry["name"], stat.st_size, stat.st_mtime)
+            if self.dedup_index is not None:
+                self.dedup_index.remember_hash(source, stat, entry["sha256"])
+                if info["duplicate_of"] is None:
+                    info["duplicate_of"] = self.dedup_index.find_upload(entry["sha256"],
+                                                                        self.workspace_name,
+                                                                        entry["name"])
+                self.dedup_index.record_upload(entry["sha256"], entry["size"], self.workspace_name,
+                                               self.container_id, f"{bundle_name}#{entry['name']}")
+            self._report_bytes(entry["size"])
+        with self._lock:
+            self.uploaded_files.extend(entry["name"] for entry in entries)
+        self._record_bundle(members, outcomes, started_at, started)
+        return outcomes
+
+    def _record_bundle(self, members, outcomes, started_at, started):
+        """Record bundle members in the history; each gets the duration of the whole bundle."""
+        duration = time.monotonic() - started
+        for (local_file_path, arcname), outcome in zip(members, outcomes):
+            if isinstance(outcome, Exception):
+                self._record(local_file_path, arcname, started_at, duration,
+                             status="failed", error=str(outcome))
+            else:
+                self._record(local_file_path, arcname, started_at, duration, size=outcome["size"],
+                             sha256=outcome["sha256"], status=outcome["status"],
+                             bundle=outcome["bundle"])
+
+    def _record(self, local_file_path, blob_name, started_at, duration, size=None, sha256=None,
+                status="uploaded", error=None, bundle=None):
+        """Record the outcome of one file in the metrics, the manifest and the upload history."""
+        self.metrics.file_done(local_file_path, blob_name, size, duration, status)
+        if self.manifest is not None and status in INCLUDED_STATUSES:
+            self.manifest.add(blob_name, size, sha256, duration, status, bundle)
+        try:
+            self.history.record(self.session_id, self.workspace_name, self.container_id,
+                                os.path.abspath(local_file_path), blob_name, size, sha256,
+                                started_at, duration, status, error, bundle)
+        except Exception as e:
+            print(f"Warning: Could not write to upload history: {e}")
+
+    def _report_bytes(self, count):
+        if self.progress_callback is not None and count:
+            self.progress_callback(count)
+
+    def upload_many(self, paths, max_workers=None, callback=None):
+        """Upload several files concurrently through a bounded worker pool.
+
+        ``paths`` may be any iterable, including a generator that is still
+        walking a directory tree; it is consumed as workers become free. Each
+        entry is a path, or a ``(path, blob_name)`` pair to choose the name in
+        the container.
+
+        Returns one result dict per entry, in the order the entries were given,
+        with the keys ``path``, ``success`` and ``error`` plus those returned
+        by ``file2``; failed files have the status ``"failed"``.
+        A failing file does not stop the others. ``callback`` is called with
+        each result as soon as that file finishes; it runs in the calling
+        thread, so it may safely update a GUI.
+
+        With a ``bundle_threshold``, smaller files are collected in input order
+        and uploaded together as tar bundles (see ``_upload_bundle``). With a
+        concurrency controller, enough workers are started to reach its
+        maximum and the controller decides how many requests actually run.
+        """
+        max_workers = max_workers or self.max_workers
+        if self.concurrency_controller is not None:
+            max_workers = max(max_workers, self.concurrency_controller.max_limit)
+        results = []
+        entries = iter(paths)
+        pending = {}
+        bundle = []
+        bundle_bytes = 0
+
+        def finish(done):
+            for future in done:
+                members, bundled = pending.pop(future)
+                error = future.exception()
+                if error is not None:
+                    outcomes = [error] * len(members)
+                else:
+                    outcomes = future.result() if bundled else [future.result()]
+                for (index, path, blob_name), outcome in zip(members, outcomes):
+                    failed = isinstance(outcome, Exception)
+                    result = {
+                        "path": path,
+                        "blob_name": blob_name,
+                        "success": not failed,
+                        "error": str(outcome) if failed else None,
+                        "status": "failed",
+                    }
+                    if not failed:
+                        result.update(outcome)
+                    results[index] = result
+                    if callback is not None:
+                        callback(result)
+
+        def submit(function, *args, members, bundled=False):
+            pending[executor.submit(function, *args)] = (members, bundled)
+            # Keep the queue short so huge or lazy inputs are not read up front
+            if len(pending) >= max_workers * 2:
+                finish(wait(pending, return_when=FIRST_COMPLETED)[0])
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for entry in entries:
+                path, blob_name = entry if isinstance(entry, tuple) else (entry, None)
+                blob_name = blob_name or os.path.basename(path)
+                member = (len(results), path, blob_name)
+                results.append(None)
+                size = small_file_size(path, self.bundle_threshold) if self.bundle_threshold else None
+                if size is not None:
+                    bundle.append(member)
+                    bundle_bytes += size
+                    if bundle_bytes >= self.bundle_size:
+                        submit(self._upload_bundle, [member[1:] for member in bundle],
+                               members=bundle, bundled=True)
+                        bundle, bundle_bytes = [], 0
+                    continue
+                submit(self.file2, path, blob_name, members=[member])
+            if bundle:
+                submit(self._upload_bundle, [member[1:] for member in bundle],
+                       members=bundle, bundled=True)
+            while pending:
+                finish(wait(pending, return_when=FIRST_COMPLETED)[0])
+        return results
+
+    def find_duplicates(self, paths, max_workers=None):
+        """Return ``{path: earlier upload}`` for files whose content is already in this workspace.
+
+        Files are hashed in parallel; unchanged files reuse their stored hash.
+        Needs a dedup index.
+        """
+        hashes = self.dedup_index.hash_files(paths, max_workers=max_workers or self.max_workers)
+        duplicates = {}
+        for path, sha256 in hashes.items():
+            previous = self.dedup_index.find_upload(sha256, self.workspace_name,
+                                                    os.path.basename(path))
+            if previous is not None:
+                duplicates[path] = previous
+        return duplicates
 
     def get_uploaded_files(self):
         """Return the list of uploaded files."""
-        return self.uploaded_files 
+        with self._lock:
+            return list(self.uploaded_files)
+
+    def get_upload_log(self, limit=100):
+        """Return the most recent uploads to this workspace as text, newest first.
 
-    def get_upload_log(self):
-        """Read and return the contents of the upload log file."""
+        Use ``self.history.query()`` for filtering and paging.
+        """
         try:
-            if os.path.exists(self.log_file_path):
-                with open(self.log_file_path, 'r', encoding='utf-8') as log_file:
-                    return log_file.read()
-            return "No upload history found."
+            records = self.history.query(workspace=self.workspace_name, limit=limit)
         except Exception as e:
-            return f"Error reading upload log: {e}"
\ No newline at end of file
+            return f"Error reading upload history: {e}"
+        if not records:
+            return "No upload history found."
+        return "\n".join(f"{record['started_at']} - {record['status']}: {record['blob_name']} "
+                         f"to workspace: {record['workspace']}" for record in records)
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Regression checks for uploading large files as blocks."""
+
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from mydre_uploader.history import UploadHistory  # noqa: E402
+from mydre_uploader.uploader import (MAX_BLOCK_SIZE, MAX_BLOCKS_PER_BLOB, MiB, Upload,  # noqa: E402
+                                     check_block_size)
+
+
+class FakeBlobClient:
+    """Records staged and committed blocks instead of sending them."""
+
+    def __init__(self):
+        self.staged = {}
+        self.committed = None
+
+    def stage_block(self, block_id, data, **kwargs):
+        self.staged[block_id] = len(data)
+
+    def commit_block_list(self, blocks, **kwargs):
+        self.committed = [block.id for block in blocks]
+
+
+class BlockSizeTest(unittest.TestCase):
+
+    def test_limits(self):
+        check_block_size(MAX_BLOCKS_PER_BLOB * MiB, MiB)
+        with self.assertRaises(ValueError):
+            check_block_size(MAX_BLOCKS_PER_BLOB * MiB + 1, MiB)
+        with self.assertRaises(ValueError):
+            check_block_size(0, MAX_BLOCK_SIZE + 1)
+        with self.assertRaises(ValueError):
+            check_block_size(0, 0)
+
+    def test_upload_rejects_block_size_above_service_limit(self):
+        with self.assertRaises(ValueError):
+            Upload("ws", "description", "key", "tenant", "user", block_size=MAX_BLOCK_SIZE + 1)
+
+
+class ChangingFileTest(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "data.bin")
+        with open(self.path, "wb") as data_file:
+            data_file.write(os.urandom(10000))
+        history = UploadHistory(os.path.join(directory.name, "history.sqlite3"))
+        self.upload = Upload("ws", "description", "key", "tenant", "user", history=history,
+                             block_size=4096)
+        self.addCleanup(self.upload.close)
+        self.blob_client = FakeBlobClient()
+
+    def upload_blocks(self, stat_size):
+        self.upload._upload_blocks(self.blob_client, self.path, stat_size, os.stat(self.path).st_mtime)
+
+    def test_whole_file_is_committed(self):
+        self.upload_blocks(10000)
+        self.assertEqual(len(self.blob_client.committed), 3)
+        self.assertEqual(sum(self.blob_client.staged.values()), 10000)
+        self.assertEqual(self.upload.buffer_budget.used, 0)
+
+    def test_file_that_shrank_fails(self):
+        with self.assertRaisesRegex(OSError, "shrank"):
+            self.upload_blocks(20000)
+        self.assertIsNone(self.blob_client.committed)
+        self.assertEqual(self.upload.buffer_budget.used, 0)
+
+    def test_file_that_grew_fails(self):
+        with self.assertRaisesRegex(OSError, "grew"):
+            self.upload_blocks(5000)
+        self.assertIsNone(self.blob_client.committed)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Checks for the shared limit on buffered file data."""
+
+import os
+import sys
+import threading
+import unittest
+from concurrent.futures import Future
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from mydre_uploader.uploader import BufferBudget  # noqa: E402
+
+
+class BufferBudgetTest(unittest.TestCase):
+
+    def test_acquire_waits_until_bytes_are_released(self):
+        budget = BufferBudget(100)
+        budget.acquire(60)
+        acquired = threading.Event()
+        waiter = threading.Thread(target=lambda: (budget.acquire(60), acquired.set()))
+        waiter.start()
+        self.assertFalse(acquired.wait(0.1))
+        budget.release(60)
+        self.assertTrue(acquired.wait(5))
+        waiter.join()
+        self.assertEqual(budget.used, 60)
+
+    def test_request_larger_than_budget_passes_when_nothing_is_held(self):
+        budget = BufferBudget(100)
+        budget.acquire(500)
+        self.assertEqual(budget.used, 500)
+
+    def test_release_when_done_waits_for_all_futures(self):
+        budget = BufferBudget(100)
+        budget.acquire(40)
+        futures = [Future(), Future()]
+        budget.release_when_done(futures, 40)
+        futures[0].set_result(None)
+        self.assertEqual(budget.used, 40)
+        futures[1].set_exception(OSError("failed"))
+        self.assertEqual(budget.used, 0)
+
+    def test_release_when_done_without_futures_releases_at_once(self):
+        budget = BufferBudget(100)
+        budget.acquire(40)
+        budget.release_when_done([], 40)
+        self.assertEqual(budget.used, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Regression checks for bundling small files into tar blobs."""
+
+import hashlib
+import io
+import os
+import sys
+import tarfile
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from mydre_uploader.bundler import write_bundle  # noqa: E402
+
+
+@unittest.skipUnless(hasattr(os, "symlink"), "needs symbolic links")
+class SymlinkBundleTest(unittest.TestCase):
+
+    def test_symlink_is_bundled_with_target_content(self):
+        content = b"target bytes\n" * 10
+        with tempfile.TemporaryDirectory() as directory:
+            target = os.path.join(directory, "target.txt")
+            link = os.path.join(directory, "link.txt")
+            with open(target, "wb") as target_file:
+                target_file.write(content)
+            try:
+                os.symlink(target, link)
+            except OSError as e:  # e.g. Windows without the privilege
+                self.skipTest(f"cannot create symlinks: {e}")
+
+            stream = io.BytesIO()
+            entries = write_bundle(stream, [(link, "link.txt")])
+
+        stream.seek(0)
+        with tarfile.open(fileobj=stream, mode="r") as tar:
+            member = tar.getmember("link.txt")
+            self.assertTrue(member.isfile())
+            self.assertEqual(member.linkname, "")
+            self.assertEqual(tar.extractfile(member).read(), content)
+        self.assertEqual(entries[0]["size"], len(content))
+        self.assertEqual(entries[0]["sha256"], hashlib.sha256(content).hexdigest())
+
+
+if __name__ == "__main__":
+    unittest.main()
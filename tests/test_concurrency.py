@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Regression checks for uploading with adaptive concurrency."""
+
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from mydre_uploader.concurrency import AIMDController  # noqa: E402
+from mydre_uploader.history import UploadHistory  # noqa: E402
+from mydre_uploader.uploader import CONTROLLED_RETRY_BACKOFF, Upload  # noqa: E402
+
+CONTAINER_URL = "https://account.blob.core.windows.net/container?sv=token"
+
+
+class RetryPolicyTest(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.history_path = os.path.join(directory.name, "history.sqlite3")
+
+    def retry_policy(self, controller):
+        upload = Upload("ws", "description", "key", "tenant", "user",
+                        history=UploadHistory(self.history_path),
+                        concurrency_controller=controller)
+        self.addCleanup(upload.close)
+        upload.container_location = CONTAINER_URL
+        return upload._get_container_client()._config.retry_policy
+
+    def test_controller_gets_short_backoff(self):
+        policy = self.retry_policy(AIMDController(1, 8))
+        self.assertEqual(policy.backoff, CONTROLLED_RETRY_BACKOFF)
+        self.assertLessEqual(policy.get_backoff_time({"count": 1}), 2 * CONTROLLED_RETRY_BACKOFF)
+
+    def test_sdk_default_without_controller(self):
+        policy = self.retry_policy(None)
+        self.assertGreater(policy.get_backoff_time({"count": 1}), 2 * CONTROLLED_RETRY_BACKOFF)
+
+
+if __name__ == "__main__":
+    unittest.main()
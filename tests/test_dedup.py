@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Regression checks for deciding which files are skipped as uploaded before."""
+
+import hashlib
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from mydre_uploader.dedup import DedupIndex  # noqa: E402
+from mydre_uploader.history import UploadHistory  # noqa: E402
+from mydre_uploader.uploader import Upload  # noqa: E402
+
+
+class DuplicateCheckTest(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.index = DedupIndex(os.path.join(self.directory, "dedup.sqlite3"))
+        self.addCleanup(self.index.close)
+        history = UploadHistory(os.path.join(self.directory, "history.sqlite3"))
+        self.upload = Upload("ws", "description", "key", "tenant", "user", history=history,
+                             dedup_index=self.index)
+        self.addCleanup(self.upload.close)
+
+    def uploaded_before(self, content, blob_name):
+        self.index.record_upload(hashlib.sha256(content).hexdigest(), len(content), "ws",
+                                 "container", blob_name)
+        self.index.mark_committed("ws", "container")
+
+    def check(self, content, blob_name):
+        path = os.path.join(self.directory, blob_name)
+        with open(path, "wb") as data_file:
+            data_file.write(content)
+        info = {"sha256": None, "duplicate_of": None}
+        return self.upload._check_duplicate(path, os.stat(path), blob_name, info), info
+
+    def test_same_content_and_name_is_skipped(self):
+        self.uploaded_before(b"data", "f1.bin")
+        skip, info = self.check(b"data", "f1.bin")
+        self.assertTrue(skip)
+        self.assertEqual(info["duplicate_of"]["blob_name"], "f1.bin")
+
+    def test_renamed_copy_is_not_skipped(self):
+        self.uploaded_before(b"data", "f1.bin")
+        skip, info = self.check(b"data", "copy_of_f1.bin")
+        self.assertFalse(skip)
+        # Not hashed before the upload; the copy is flagged with the hash taken while sending
+        self.assertIsNone(info["sha256"])
+        self.assertEqual(self.index.find_upload(self.index.file_hash(
+            os.path.join(self.directory, "copy_of_f1.bin")), "ws", "copy_of_f1.bin")["blob_name"],
+            "f1.bin")
+
+    def test_same_name_other_size_is_not_hashed_first(self):
+        self.uploaded_before(b"data", "f1.bin")
+        skip, info = self.check(b"new data", "f1.bin")
+        self.assertFalse(skip)
+        self.assertIsNone(info["sha256"])
+
+    def test_empty_file_is_never_a_duplicate(self):
+        self.uploaded_before(b"", "empty")
+        skip, info = self.check(b"", "empty")
+        self.assertFalse(skip)
+        self.assertIsNone(info["duplicate_of"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Regression checks for the upload history when its database is locked."""
+
+import contextlib
+import io
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from mydre_uploader.history import UploadHistory  # noqa: E402
+from mydre_uploader.uploader import Upload  # noqa: E402
+
+
+class LockedHistoryTest(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.history = UploadHistory(os.path.join(directory.name, "history.sqlite3"))
+        # Fail at once instead of waiting for the lock
+        self.history._connection.execute("PRAGMA busy_timeout = 0")
+        self.history.record("session", "ws", "container", "/data/a.csv", "a.csv", 1)
+        self.locker = sqlite3.connect(self.history.path, isolation_level=None)
+        self.locker.execute("BEGIN EXCLUSIVE")
+        self.addCleanup(self.locker.close)
+
+    def test_close_closes_the_database_when_the_write_fails(self):
+        with self.assertRaises(sqlite3.OperationalError):
+            self.history.close()
+        with self.assertRaises(sqlite3.ProgrammingError):
+            self.history._connection.execute("SELECT 1")
+
+    def test_upload_close_only_warns(self):
+        upload = Upload("ws", "description", "key", "tenant", "user", history=self.history)
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            upload.close()
+        self.assertIn("Could not write to upload history", output.getvalue())
+        self.locker.rollback()
+        self.history.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Regression checks for the pre-flight scan."""
+
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from mydre_uploader.scan import PreflightScanner  # noqa: E402
+
+
+class LiteralPathScanTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        for name in ("data[1].csv", "data1.csv"):
+            with open(os.path.join(self.directory.name, name), "wb") as data_file:
+                data_file.write(name.encode())
+        self.path = os.path.join(self.directory.name, "data[1].csv")
+
+    def test_literal_path_with_glob_characters(self):
+        found = list(PreflightScanner(expand_globs=False).iter_scan([self.path]))
+        self.assertEqual(found, [(self.path, "data[1].csv", len("data[1].csv"))])
+
+    def test_pattern_is_expanded_by_default(self):
+        found = list(PreflightScanner().iter_scan([self.path]))
+        self.assertEqual([blob_name for _, blob_name, _ in found], ["data1.csv"])
+
+
+if __name__ == "__main__":
+    unittest.main()
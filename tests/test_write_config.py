@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Regression checks for writing configuration files without replacing existing ones."""
+
+import json
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from mydre_config_encrypter.encrypter import write_config  # noqa: E402
+
+
+class NoHardLinkWriteTest(unittest.TestCase):
+    """``write_config(overwrite=False)`` on file systems such as FAT or SMB, where ``os.link`` fails."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.path = os.path.join(self.directory, "config.json")
+        patcher = mock.patch("os.link", side_effect=PermissionError(1, "Operation not permitted"))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_new_file_is_written(self):
+        write_config(self.path, {"WORKSPACE_NAME": "ws"}, overwrite=False)
+        with open(self.path, encoding="utf-8") as config_file:
+            self.assertEqual(json.load(config_file), {"WORKSPACE_NAME": "ws"})
+        self.assertEqual(os.listdir(self.directory), ["config.json"])
+
+    def test_existing_file_is_kept(self):
+        with open(self.path, "w", encoding="utf-8") as config_file:
+            config_file.write("original")
+        with self.assertRaises(FileExistsError):
+            write_config(self.path, {"WORKSPACE_NAME": "ws"}, overwrite=False)
+        with open(self.path, encoding="utf-8") as config_file:
+            self.assertEqual(config_file.read(), "original")
+        self.assertEqual(os.listdir(self.directory), ["config.json"])
+
+
+if __name__ == "__main__":
+    unittest.main()